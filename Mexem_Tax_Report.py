@@ -1,6 +1,8 @@
+import hashlib
+import os
+
 import streamlit as st
 import pandas as pd
-import os
 
 # Set page config
 dashboard_title = "MEXEM (IBKR) Tax Report Dashboard"
@@ -15,71 +17,109 @@ uploaded_file = st.file_uploader(
     help="Upload the exported MEXEM/IBKR activity report CSV."
 )
 
+# Custom parser for MEXEM multi-section CSV
+TRADES_SECTION = "Dettaglio eseguiti"
+ROW_KINDS = ("Data", "SubTotal", "Total")
+
+
+def _clean_header(header):
+    """Give a name to empty columns and a suffix to duplicated ones."""
+    clean_header = []
+    col_count = {}
+    for i, col in enumerate(header):
+        col = col if col else f"Unnamed_{i+1}"
+        if col in col_count:
+            col_count[col] += 1
+            col = f"{col}_{col_count[col]}"
+        else:
+            col_count[col] = 1
+        clean_header.append(col)
+    return clean_header
+
+
+def _typed_columns(df):
+    """
+    Convert the text columns that are entirely numbers (thousands separated by ",")
+    or dates ("2025-01-02, 10:30:00") to numeric / datetime columns.
+    """
+    for col in df.columns:
+        values = df[col]
+        filled = values.str.len() > 0
+        if not filled.any():
+            continue
+        numbers = pd.to_numeric(values.str.replace(",", "", regex=False), errors="coerce")
+        if numbers[filled].notna().all():
+            df[col] = numbers
+            continue
+        if values[filled].str.match(r"^\d{4}-\d{2}-\d{2}").all():
+            dates = pd.to_datetime(values.str.replace(",", "", regex=False), errors="coerce", format="mixed")
+            if dates[filled].notna().all():
+                df[col] = dates
+    return df
+
+
+def parse_report(text):
+    """
+    Split a MEXEM/IBKR activity report into one DataFrame per section, in a single pass.
+
+    Every record is "section,kind,field,...": a "Header" record starts a block of the
+    section, the following "Data"/"SubTotal"/"Total" records belong to it. The file is
+    read with one `csv.reader`, so quoted fields spanning several lines are kept whole.
+    Blocks of the same section with different headers are concatenated by column name.
+
+    Returns a dict section name -> DataFrame, with a leading "Row" column (Data,
+    SubTotal, Total) and numeric/datetime columns where every value converts.
+    """
+    import csv
+    import io
+
+    blocks = {}
+    header = {}
+    for record in csv.reader(io.StringIO(text)):
+        if len(record) < 2:
+            continue
+        section, kind = record[0].strip(), record[1].strip()
+        fields = [field.strip() for field in record[2:]]
+        if kind == "Header":
+            # Header ripetuto uguale: stesso blocco; header diverso: nuovo blocco della sezione
+            if header.get(section) != fields:
+                header[section] = fields
+                blocks.setdefault(section, []).append((_clean_header(fields), []))
+        elif kind in ROW_KINDS and section in header:
+            columns, rows = blocks[section][-1]
+            rows.append([kind] + fields[: len(columns)] + [""] * (len(columns) - len(fields)))
+
+    sections = {}
+    for section, section_blocks in blocks.items():
+        frames = [pd.DataFrame(rows, columns=["Row"] + columns, dtype=str) for columns, rows in section_blocks if rows]
+        if frames:
+            sections[section] = _typed_columns(pd.concat(frames, ignore_index=True).fillna(""))
+    return sections
+
+
+@st.cache_data(show_spinner="Parsing report...")
+def load_report(file_hash, _file_bytes):
+    """Parse the report once per file content: the cache key is the hash, not the bytes."""
+    return parse_report(_file_bytes.decode("utf-8-sig"))
+
+
 if uploaded_file is not None:
-    # Save uploaded file to a temporary path for parsing
-    import tempfile
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".csv") as tmp:
-        tmp.write(uploaded_file.read())
-        report_path = tmp.name
+    report_bytes = uploaded_file.getvalue()
 else:
     # Optionally, use a default file for local dev/testing
     default_path = r"C:\Users\david\Documents\Data_for_Analysis\MEXEM\[MEXEM]Resoconto_U16517211_20241129_20250613.csv"
     if os.path.exists(default_path):
         st.info("No file uploaded. Using default local file for demonstration.")
-        report_path = default_path
+        with open(default_path, "rb") as f:
+            report_bytes = f.read()
     else:
         st.warning("Please upload a MEXEM report CSV file to continue.")
         st.stop()
 
-# Custom parser for MEXEM multi-section CSV
+report_sections = load_report(hashlib.sha256(report_bytes).hexdigest(), report_bytes)
 
-def extract_section(filepath, section_name):
-    """
-    Extracts a section from the MEXEM CSV by section_name (e.g., 'Dettaglio eseguiti').
-    Returns a DataFrame or None if not found.
-    Handles duplicate/empty column names and repeated headers.
-    """
-    import csv
-    section_lines = []
-    in_section = False
-    header = None
-    with open(filepath, encoding="utf-8") as f:
-        for line in f:
-            if line.startswith(section_name + ",Header"):
-                in_section = True
-                header_candidate = [h.strip() for h in next(csv.reader([line.strip()]))][2:]
-                # Only set header if not already set
-                if header is None:
-                    header = header_candidate
-                continue
-            if in_section:
-                # Skip repeated headers inside the section
-                if line.startswith(section_name + ",Header"):
-                    continue
-                if line.startswith(section_name + ",Data") or line.startswith(section_name + ",SubTotal") or line.startswith(section_name + ",Total"):
-                    row = [h.strip() for h in next(csv.reader([line.strip()]))][2:]
-                    section_lines.append(row)
-                elif not line.strip() or not line.startswith(section_name):
-                    break  # End of section
-    if section_lines and header:
-        # Fix empty and duplicate column names
-        clean_header = []
-        col_count = {}
-        for i, col in enumerate(header):
-            col = col if col else f"Unnamed_{i+1}"
-            if col in col_count:
-                col_count[col] += 1
-                col = f"{col}_{col_count[col]}"
-            else:
-                col_count[col] = 1
-            clean_header.append(col)
-        import pandas as pd
-        df = pd.DataFrame(section_lines, columns=clean_header)
-        return df
-    return None
-
-# Use the custom parser to extract the 'Dettaglio eseguiti' section
-trades_df = extract_section(report_path, "Dettaglio eseguiti")
+# The 'Dettaglio eseguiti' section holds the executed trades
+trades_df = report_sections.get(TRADES_SECTION)
 
 if trades_df is None or trades_df.empty:
     st.error("Could not extract 'Dettaglio eseguiti' (executed trades) section from the report.")
@@ -89,7 +129,7 @@ if trades_df is None or trades_df.empty:
 with st.expander("ℹ️ About this dashboard", expanded=True):
     st.write("""
     - This dashboard helps you analyze your MEXEM/IBKR activity report for tax-relevant information.
-    - It auto-detects and parses the 'Dettaglio eseguiti' (executed trades) section for transactions.
+    - It parses every section of the report in one pass (executed trades in 'Dettaglio eseguiti', dividends, interest, ...), once per uploaded file.
     - Use the tabs below to explore your data and download filtered results for your tax records.
     """)
 
@@ -99,13 +139,26 @@ st.dataframe(trades_df.head(10))
 
 # Tabs for analysis
 # (You can expand this to other sections as needed)
-tabs = st.tabs(["All Trades"])
+other_sections = [name for name in report_sections if name != TRADES_SECTION]
+tabs = st.tabs(["All Trades"] + other_sections)
 
 with tabs[0]:
     st.header("All Executed Trades")
     st.dataframe(trades_df)
     st.download_button("Download Executed Trades as CSV", trades_df.to_csv(index=False), file_name="mexem_executed_trades.csv")
 
+# One tab per other section of the report (dividends, withholding tax, interest, forex...)
+for tab, section in zip(tabs[1:], other_sections):
+    with tab:
+        st.header(section)
+        st.dataframe(report_sections[section])
+        st.download_button(
+            f"Download {section} as CSV",
+            report_sections[section].to_csv(index=False),
+            file_name=f"mexem_{section.lower().replace(' ', '_')}.csv",
+            key=f"download_{section}",
+        )
+
 # --- Raw Data Expander ---
 with st.expander("Show raw data (full table)"):
     st.dataframe(trades_df)
@@ -25,7 +25,7 @@ class DataBuilderAgent:
             "sales": float, "operating_income": float, "net_income": float,
             "interest_charges": float, "preferred_dividends": float,
             "shares_outstanding": float, "current_market_price": float,
-            "eps_3y_avg": float, "earnings_growth_10y": bool, "dividend_history_20y": bool
+            "eps_3y_avg": float
         }}
         RULES:
         1. 'long_term_debt': ONLY FINANCIAL DEBT (Bonds, Notes, Bank Loans). EXCLUDE Leases (Operating/Finance) and Trade Payables.
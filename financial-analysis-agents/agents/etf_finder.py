@@ -1,39 +1,98 @@
 """Modulo ricerca ETF."""
 import json
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional
 import yfinance as yf
+from utils.cache_manager import CacheManager
+from utils.etf_holdings_index import ETFHoldingsIndex
 from .ai_provider import AIProvider
 
 class ETFFinderAgent:
-    """Trova ETF che detengono il titolo."""
+    """
+    Trova ETF che detengono il titolo.
+    Prima consulta l'indice locale delle holdings (nessuna chiamata AI), poi ripiega sulla stima dell'LLM.
+    I metadati degli ETF vengono scaricati in parallelo e tenuti in cache.
+    """
+
+    # I metadati di un ETF (nome, AUM, categoria) cambiano raramente
+    INFO_CACHE_SECONDS = 86400 * 7
+    MAX_RESULTS = 3
+
     def __init__(self, api_key: Optional[str] = None, provider: str = "gemini", model: Optional[str] = None):
         self.provider = AIProvider(api_key, provider, model)
         self.model = self.provider.get_model(json_mode=True)
+        self.cache = CacheManager()
+        self.holdings_index = ETFHoldingsIndex()
+        self._info_memo: Dict[str, Dict[str, Any]] = {}
 
-    def find_etfs_holding_ticker(self, ticker: str, sector: str = "") -> List[Dict[str, Any]]:
-        """Trova ETF statunitensi che probabilmente detengono il titolo specificato."""
+    def _guess_etfs_with_ai(self, ticker: str, sector: str) -> List[Dict[str, Any]]:
+        """Chiede all'LLM gli ETF che probabilmente detengono il titolo."""
         # PROMPT COMPRESSO
         prompt = f"""
         TASK: List 3 major US ETFs likely holding {ticker} ({sector}).
         OUTPUT JSON: [{{ "ticker": "SPY", "estimated_weight": "High/Med/Low" }}]
         """
+        resp = self.model.generate_content(prompt)
+        data = json.loads(resp.text)
+        return [
+            {"etf_ticker": item.get("ticker"), "weight_percentage": item.get("estimated_weight")}
+            for item in data if item.get("ticker")
+        ]
+
+    @staticmethod
+    def _download_info(etf_ticker: str) -> Optional[Dict[str, Any]]:
+        """Scarica i metadati essenziali di un ETF da Yahoo Finance (None se Yahoo non lo conosce)."""
         try:
-            resp = self.model.generate_content(prompt)
-            data = json.loads(resp.text)
-            
+            info = yf.Ticker(etf_ticker).info
+            # Risposta vuota o senza nome: non va in cache, verrà ritentata alla prossima ricerca
+            if not info or not (info.get("shortName") or info.get("longName")):
+                return None
+            return {
+                "etf_name": info.get("shortName") or info.get("longName"),
+                "total_aum": info.get("totalAssets"),
+                "category": info.get("category"),
+            }
+        except Exception: # pylint: disable=broad-exception-caught
+            return None
+
+    def _get_etf_infos(self, etf_tickers: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Metadati per più ETF: memoria -> cache su disco -> download concorrente dei mancanti."""
+        infos: Dict[str, Dict[str, Any]] = {}
+        missing = []
+        for t in etf_tickers:
+            cached = self._info_memo.get(t) or self.cache.get(f"{t}_etfinfo", self.INFO_CACHE_SECONDS)
+            if cached:
+                infos[t] = cached
+            else:
+                missing.append(t)
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=len(missing)) as pool:
+                downloaded = dict(zip(missing, pool.map(self._download_info, missing)))
+            # Scrittura in cache dal thread principale (il file JSON non è thread-safe)
+            for t, info in downloaded.items():
+                if info:
+                    infos[t] = info
+                    self.cache.set(f"{t}_etfinfo", info)
+
+        self._info_memo.update(infos)
+        return infos
+
+    def find_etfs_holding_ticker(self, ticker: str, sector: str = "") -> List[Dict[str, Any]]:
+        """Trova ETF statunitensi che probabilmente detengono il titolo specificato."""
+        try:
+            self.holdings_index.refresh()
+            candidates = self.holdings_index.lookup(ticker)[:self.MAX_RESULTS]
+            if not candidates:
+                candidates = self._guess_etfs_with_ai(ticker, sector)[:self.MAX_RESULTS] # Limitiamo a 3 per velocità
+
+            infos = self._get_etf_infos([c["etf_ticker"] for c in candidates])
+
             results = []
-            for item in data[:3]: # Limitiamo a 3 per velocità
-                t = item.get("ticker")
-                if t:
-                    try:
-                        info = yf.Ticker(t).info
-                        results.append({
-                            "etf_ticker": t,
-                            "etf_name": info.get("shortName", t),
-                            "weight_percentage": item.get("estimated_weight")
-                        })
-                    except Exception: # pylint: disable=broad-exception-caught
-                        continue
+            for c in candidates:
+                info = infos.get(c["etf_ticker"])
+                if info:
+                    results.append({"etf_ticker": c["etf_ticker"], **info, "weight_percentage": c["weight_percentage"]})
             return results
         except Exception: # pylint: disable=broad-exception-caught
-            return []
\ No newline at end of file
+            return []
@@ -2,6 +2,7 @@
 Modulo per l'analisi fondamentale: Integrazione 'L'Investitore Intelligente'.
 """
 from dataclasses import dataclass
+from typing import Any, Dict
 from models.data_schema import FinancialData
 
 @dataclass
@@ -18,8 +19,8 @@ class GrahamAgent:
     def __init__(self, data: FinancialData):
         self.d = data
 
-    def analyze(self) -> str:
-        """Genera il report completo."""
+    def _evaluate(self) -> Dict[str, Any]:
+        """Calcola indicatori e checklist (base comune di report e metriche sintetiche)."""
         
         # --- CALCOLI DI SUPPORTO ---
         equity = self.d.common_stock + self.d.surplus
@@ -81,7 +82,7 @@ class GrahamAgent:
 
         # 3. Stabilità degli Utili 
         # "Alcuni guadagni per le azioni ordinarie in ciascuno degli ultimi dieci anni"
-        earnings_msg = "Nessun deficit rilevato (Check storico AI)"
+        earnings_msg = "Nessun deficit rilevato (Storico locale)"
         if self.d.earnings_years_count > 0:
             earnings_msg = f"Utili positivi in tutti gli anni analizzati ({self.d.earnings_years_count}y disp.)"
             # Se abbiamo meno di 10 anni ma tutti positivi, diamo un giudizio di incoraggiamento
@@ -110,10 +111,19 @@ class GrahamAgent:
 
         # 5. Crescita degli Utili 
         # "Aumento minimo di almeno un terzo dell'utile per azione negli ultimi dieci anni"
+        # Calcolato sullo storico locale EPS (media 3y iniziale vs finale), che cresce ad ogni analisi.
+        if self.d.eps_history_years >= 2:
+            growth_ok = self.d.eps_growth_10y >= 100 / 3
+            growth_msg = f"Crescita EPS: {self.d.eps_growth_10y:+.1f}% su {self.d.eps_history_years} anni (Target > +33%)"
+            if self.d.eps_history_years < 10:
+                growth_msg += " -> ⚠️ Storico locale < 10 anni"
+        else:
+            growth_ok = True # Senza storico non possiamo giudicare: non penalizziamo
+            growth_msg = "Storico EPS insufficiente (si accumula ad ogni analisi)"
         checks.append(GrahamCheck(
             "5. Crescita Utili",
-            True, # Difficile da calcolare preciso senza dati raw di 10 anni fa, assumiamo OK se positivo
-            "Crescita moderata a lungo termine richiesta"
+            growth_ok,
+            growth_msg
         ))
 
         # 6. Rapporto Prezzo/Utili Moderato 
@@ -132,8 +142,42 @@ class GrahamAgent:
             f"P/E * P/B = {graham_number_val:.2f} (Target < 22.5)"
         ))
 
+        ncav_share = (working_capital - self.d.long_term_debt) / self.d.shares_outstanding if self.d.shares_outstanding else 0
+
+        return {
+            "checks": checks,
+            "score": sum(1 for c in checks if c.passed),
+            "pe_ratio": pe_ratio,
+            "pb_ratio": pb_ratio,
+            "graham_number": graham_number_val,
+            "ncav_per_share": ncav_share,
+            "int_coverage": int_coverage,
+            "fin_debt_ratio": fin_debt_ratio,
+        }
+
+    def key_metrics(self) -> Dict[str, Any]:
+        """Metriche sintetiche per tabelle di confronto (punteggio, P/E, P/B, P/E*P/B, NCAV)."""
+        ev = self._evaluate()
+        return {
+            "score": ev["score"],
+            "price": self.d.current_market_price,
+            "pe_ratio": ev["pe_ratio"],
+            "pb_ratio": ev["pb_ratio"],
+            "graham_number": ev["graham_number"],
+            "ncav_per_share": ev["ncav_per_share"],
+            "bargain": 0 < self.d.current_market_price < ev["ncav_per_share"],
+        }
+
+    def analyze(self) -> str:
+        """Genera il report completo."""
+        ev = self._evaluate()
+        checks = ev["checks"]
+        score = ev["score"]
+        int_coverage = ev["int_coverage"]
+        fin_debt_ratio = ev["fin_debt_ratio"]
+        ncav_share = ev["ncav_per_share"]
+
         # --- COSTRUZIONE REPORT ---
-        score = sum(1 for c in checks if c.passed)
         
         report = f"""
         === ANALISI 'L'INVESTITORE INTELLIGENTE' (Ben Graham) ===
@@ -153,10 +197,10 @@ class GrahamAgent:
         Se l'azienda non soddisfa i criteri difensivi (troppo severi), 
         Graham suggerisce di guardare al "Capitale Circolante Netto" (NCAV).
         
-        NCAV per Azione: ${ (working_capital - self.d.long_term_debt) / self.d.shares_outstanding if self.d.shares_outstanding else 0 :.2f}
+        NCAV per Azione: ${ncav_share:.2f}
         Prezzo Attuale:  ${self.d.current_market_price:.2f}
         
-        Giudizio: {"SOTTOVALUTATA (Bargain)" if self.d.current_market_price < ((working_capital - self.d.long_term_debt) / self.d.shares_outstanding) else "Prezzo superiore al valore di liquidazione netto."}
+        Giudizio: {"SOTTOVALUTATA (Bargain)" if self.d.current_market_price < ncav_share else "Prezzo superiore al valore di liquidazione netto."}
         ------------------------------------------------
         
         [STRUTTURA DEL CAPITALE - EXTRA]
@@ -1,10 +1,12 @@
 """Agente Facade ottimizzato per risparmio token."""
-from typing import Optional, Dict, Any, Callable    
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Dict, Any, Callable, Iterator, List, Tuple
 from dataclasses import asdict
 import pandas as pd
 import yfinance as yf
 from models.data_schema import FinancialData
 from utils.cache_manager import CacheManager
+from utils.history_store import FundamentalsHistoryStore
 from .data_builder import DataBuilderAgent
 from .summary import SummaryAgent
 from .review import ReviewAgent
@@ -18,6 +20,7 @@ class MarketDataAgent:
     
     def __init__(self, api_key: Optional[str] = None, provider: str = "gemini", model: str = ""):
         self.cache = CacheManager()
+        self.history = FundamentalsHistoryStore()
         
         # --- MODEL TIERING (Strategia di Risparmio) ---
         # Se usiamo Gemini, usiamo modelli "Flash" (veloci/economici) per task meccanici
@@ -53,10 +56,59 @@ class MarketDataAgent:
             df_reduced = df_reduced.head(max_rows)
         return df_reduced.to_csv(sep="\t", index=True, float_format="%.2f")
 
-    def fetch_from_ticker(self, ticker_symbol: str, audit_mode: str = "quick", callback: Optional[Callable[[str], None]] = None) -> Optional[Dict[str, Any]]:
+    def _update_history(self, ticker_symbol: str, tk: yf.Ticker) -> Dict[str, Any]:
+        """
+        Aggiunge allo storico locale gli anni visti ora su Yahoo Finance e calcola
+        i campi storici di Graham (utili 10y, dividendi 20y, crescita EPS).
+        """
+        inc_stmt = tk.financials
+        current_year = pd.Timestamp.now().year
+        # Ultimo esercizio pubblicato: da lì parte il conteggio degli anni in utile
+        latest_fiscal_year = None
+        if not inc_stmt.empty:
+            latest_fiscal_year = max(pd.Timestamp(col).year for col in inc_stmt.columns)
+            for row, metric in (("Net Income", "net_income"), ("Diluted EPS", "eps"), ("Basic EPS", "eps")):
+                if row in inc_stmt.index:
+                    values = inc_stmt.loc[row].dropna()
+                    self.history.update(ticker_symbol, metric, {ts.year: float(v) for ts, v in values.items()})
+                    if metric == "eps":
+                        break  # Diluted EPS preferito, Basic EPS solo come fallback
+
+        divs = tk.dividends
+        if not divs.empty:
+            # L'anno in corso è incompleto: lo escludiamo per non falsare la serie
+            yearly = divs.groupby(divs.index.year).sum()
+            self.history.update(ticker_symbol, "dividends", {int(y): float(v) for y, v in yearly.items() if y < current_year})
+
+        # Senza bilancio da Yahoo si usa l'ultimo esercizio già nello storico
+        if latest_fiscal_year is None:
+            stored = [self.history.latest_year(ticker_symbol, m) for m in ("eps", "net_income")]
+            stored = [y for y in stored if y is not None]
+            latest_fiscal_year = max(stored) if stored else current_year - 1
+
+        # Utili: preferiamo EPS (più lungo nel tempo), altrimenti Net Income
+        earn_years = max(
+            self.history.consecutive_positive_years(ticker_symbol, "eps", end_year=latest_fiscal_year),
+            self.history.consecutive_positive_years(ticker_symbol, "net_income", end_year=latest_fiscal_year),
+        )
+        # Dividendi: la serie deve arrivare all'ultimo anno concluso
+        div_years = self.history.consecutive_positive_years(ticker_symbol, "dividends", end_year=current_year - 1)
+        eps_growth, eps_years = self.history.eps_growth(ticker_symbol, years=10)
+
+        return {
+            'earnings_years_count': int(earn_years),
+            'dividend_years_count': int(div_years),
+            'earnings_growth_10y': earn_years >= 10,
+            'dividend_history_20y': div_years >= 20,
+            'eps_growth_10y': float(eps_growth),
+            'eps_history_years': int(eps_years),
+        }
+
+    def fetch_from_ticker(self, ticker_symbol: str, audit_mode: str = "quick", callback: Optional[Callable[[str], None]] = None, with_summary: bool = True) -> Optional[Dict[str, Any]]:
         """
         Recupera dati finanziari e summary.
         audit_mode: 'quick' (solo errori ovvi) | 'full' (controllo esteso)
+        with_summary: se False non genera il summary AI (es. tabelle di confronto multi-ticker)
         """
         print(f"📈 Analisi Ottimizzata per {ticker_symbol} (Mode: {audit_mode})...")
         
@@ -70,7 +122,7 @@ class MarketDataAgent:
         
         # Se abbiamo cache financials e summary e siamo in quick, usiamo cache.
         # Se siamo in full, magari vogliamo rinfrescare finviz? Per ora usiamo caché se valida (24h).
-        if cache_fin and cache_sum and audit_mode == "quick":
+        if cache_fin and (cache_sum or not with_summary) and audit_mode == "quick":
             print("🚀 HIT Cache! Zero token usati.")
             # Se abbiamo finviz in cache bene, sennò pace (in quick mode non è critico se non per display)
             return {"financials": cache_fin, "summary": cache_sum, "finviz": cache_fv}
@@ -101,7 +153,7 @@ class MarketDataAgent:
 
             # SUMMARY GENERATION
             final_summary = cache_sum
-            if not final_summary:
+            if not final_summary and with_summary:
                 print("📜 Generazione Summary...")
                 # Per il summary serve un po' più di contesto storico
                 summary_payload = raw_text + f"\nDesc: {tk.info.get('longBusinessSummary','')[:1000]}"
@@ -132,42 +184,17 @@ class MarketDataAgent:
                 if not data_dict: return None
                 
                 # --- ARRICCHIMENTO DATI STORICI (Hard Calculations) ---
-                # Calcoliamo qui la storia dividendi e utili da YF, sovrascrivendo l'LLM se necessario
-                div_years = 0
-                earn_years = 0
+                # Lo storico locale accumula EPS/dividendi/utili ad ogni run: i criteri 10y/20y
+                # vengono calcolati qui, sovrascrivendo i booleani stimati dall'LLM.
+                data_dict.setdefault('earnings_growth_10y', False)
+                data_dict.setdefault('dividend_history_20y', False)
                 try:
-                    # Storia Dividendi
-                    divs = tk.dividends
-                    if not divs.empty:
-                        # Conta anni unici in cui c'è stato un dividendo
-                        div_years = len(divs.index.year.unique())
-                    
-                    # Storia Utili (Annuali disponibili su YF, solitamente 4)
-                    inc_stmt = tk.financials
-                    if not inc_stmt.empty and "Net Income" in inc_stmt.index:
-                        # Conta quanti anni hanno Net Income > 0
-                        net_income_row = inc_stmt.loc["Net Income"]
-                        earn_years = (net_income_row > 0).sum()
-                    
-                    # Aggiorna il dizionario
-                    data_dict['dividend_years_count'] = int(div_years)
-                    data_dict['earnings_years_count'] = int(earn_years)
-                    
-                    # Logica Fallback/Override dei Booleani (L'LLM spesso allucina su 20y se non li vede)
-                    # Se YF ci dà info, usiamo quelle.
-                    # Nota: YF di solito non dà 20 anni di financials, ma dividendi si.
-                    if div_years >= 20: 
-                        data_dict['dividend_history_20y'] = True
-                    elif div_years > 0 and div_years < 20:
-                        # Se ne abbiamo trovati alcuni ma non 20, l'LLM diceva False? 
-                        # Lasciamo l'LLM decidere se ha visto testo aggiuntivo, 
-                        # MA se l'LLM ha detto False e noi abbiamo >20, abbiamo corretto sopra.
-                        pass
-                    
-                except Exception as e:
+                    data_dict.update(self._update_history(ticker_symbol, tk))
+                except Exception as e: # pylint: disable=broad-exception-caught
                     print(f"⚠️ Errore calcolo storico: {e}")
                 
                 fin_obj = FinancialData(**data_dict)
+                fin_dict = asdict(fin_obj)
                 
                 # LAZY EXECUTION: Audit Logic
                 print(f"🧐 Audit {audit_mode.title()}...")
@@ -194,18 +221,51 @@ class MarketDataAgent:
                     # Passiamo finviz_data cachato per evitare doppio download
                     fixes = self.cross_checker.cross_check_fields(
                         ticker_symbol, 
-                        asdict(fin_obj), 
+                        fin_dict, 
                         real_issues, 
                         callback=callback, 
                         external_finviz_data=finviz_data
                     )
-                    if fixes: data_dict.update(fixes)
+                    if fixes:
+                        # Ricostruiamo il record solo se il cross-check ha corretto qualcosa
+                        data_dict.update(fixes)
+                        fin_dict = asdict(FinancialData(**data_dict))
                 
-                final_fin = asdict(FinancialData(**data_dict))
+                final_fin = fin_dict
                 self.cache.set(f"{ticker_symbol}_financials", final_fin)
 
             return {"financials": final_fin, "summary": final_summary, "finviz": finviz_data}
 
         except Exception as e: # pylint: disable=broad-exception-caught
             print(f"❌ Errore: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    def fetch_many(self, tickers: List[str], audit_mode: str = "quick", max_workers: int = 4, with_summary: bool = False) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+        """
+        Analizza più ticker in parallelo e restituisce (ticker, risultato) man mano che completano.
+        In quick mode i ticker già in cache vengono restituiti subito, senza occupare il pool.
+        Un ticker che fallisce restituisce {"error": messaggio} senza interrompere gli altri.
+        """
+        pending = []
+        for ticker in dict.fromkeys(t.strip().upper() for t in tickers if t.strip()):
+            cache_fin = self.cache.get(f"{ticker}_financials", 86400*7) if audit_mode == "quick" else None
+            cache_sum = self.cache.get(f"{ticker}_summary", 86400*30) if cache_fin and with_summary else None
+            if cache_fin and (cache_sum or not with_summary):
+                yield ticker, {"financials": cache_fin, "summary": cache_sum, "finviz": self.cache.get(f"{ticker}_finviz", 86400)}
+            else:
+                pending.append(ticker)
+
+        if not pending:
+            return
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(self.fetch_from_ticker, t, audit_mode=audit_mode, with_summary=with_summary): t
+                for t in pending
+            }
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e: # pylint: disable=broad-exception-caught
+                    print(f"❌ Errore durante l'analisi di {futures[future]}: {e}")
+                    result = {"error": str(e)}
+                yield futures[future], result
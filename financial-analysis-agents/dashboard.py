@@ -3,13 +3,18 @@ Dashboard interattiva Streamlit per Graham AI Analyst.
 Supporta visualizzazione mobile, grafici e selezione multi-provider.
 """
 import os
+import re
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
 import pandas as pd
 import plotly.graph_objects as go
 import streamlit as st
 import yfinance as yf
 from dotenv import load_dotenv
 
-from agents import MarketDataAgent, AIProvider, GrahamAgent, ETFFinderAgent
+from agents import MarketDataAgent, AIProvider, GrahamAgent
 from agents.ai_provider import OLLAMA_AVAILABLE
 from utils.cache_manager import CacheManager
 from models import FinancialData
@@ -36,10 +41,51 @@ def get_ollama_models_list():
     """
     return AIProvider.get_ollama_models()
 
+# Intervallo di polling del job di analisi in background
+POLL_INTERVAL_SECONDS = 0.5
+
+@dataclass
+class AnalysisJob:
+    """Analisi in esecuzione in background: i messaggi di avanzamento arrivano dal thread worker."""
+    ticker: str
+    future: Optional[Future] = None
+    messages: List[str] = field(default_factory=list)
+
+@st.cache_resource(show_spinner=False)
+def get_market_agent(api_key, provider, model):
+    """Agente condiviso tra i rerun (e le sessioni) per la stessa configurazione provider/modello."""
+    return MarketDataAgent(api_key=api_key, provider=provider, model=model)
+
+@st.cache_resource(show_spinner=False)
+def get_cache_manager():
+    """CacheManager condiviso tra i rerun."""
+    return CacheManager()
+
+@st.cache_resource(show_spinner=False)
+def get_job_executor():
+    """Pool di thread per le analisi: il thread dello script Streamlit non attende la rete."""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="graham-job")
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def load_price_history(ticker_symbol):
+    """Storico prezzi a 1 anno (cache 1h)."""
+    return yf.Ticker(ticker_symbol).history(period="1y")
+
+def run_analysis_job(market_agent, ticker_symbol, audit_mode, callback):
+    """
+    Eseguito nel thread worker: dati finanziari + esposizione ETF.
+    Non usa l'API di Streamlit; l'avanzamento passa solo da `callback`.
+    """
+    result_package = market_agent.fetch_from_ticker(ticker_symbol, audit_mode=audit_mode, callback=callback)
+    if result_package:
+        callback("🏦 Ricerca esposizione ETF...")
+        result_package["etfs"] = market_agent.etf_finder.find_etfs_holding_ticker(ticker_symbol)
+    return result_package
+
 def plot_price_chart(ticker_symbol):
     """Crea un grafico a candele interattivo usando Plotly."""
     try:
-        df = yf.Ticker(ticker_symbol).history(period="1y")
+        df = load_price_history(ticker_symbol)
         if df.empty:
             return None
         
@@ -59,6 +105,164 @@ def plot_price_chart(ticker_symbol):
     except Exception: # pylint: disable=broad-exception-caught
         return None
 
+@dataclass
+class WatchlistJob:
+    """Confronto multi-ticker in background: le righe vengono aggiunte man mano che i ticker completano."""
+    tickers: List[str]
+    future: Optional[Future] = None
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+
+def parse_ticker_list(text):
+    """Estrae i ticker (separati da virgole, spazi o a capo) senza duplicati."""
+    return list(dict.fromkeys(t.upper() for t in re.split(r"[\s,;]+", text or "") if t))
+
+def provider_ready(provider, key, model):
+    """Verifica la configurazione del provider e mostra l'errore relativo."""
+    if provider != "ollama" and not key:
+        st.error(f"🔑 API Key mancante per {provider}. Inseriscila nella sidebar.")
+        return False
+    if provider == "ollama" and not model:
+        st.error("❌ Nessun modello locale selezionato o disponibile.")
+        return False
+    return True
+
+def build_watchlist_row(ticker_symbol, result_package):
+    """Riga della tabella di confronto con le metriche di Graham."""
+    if result_package and result_package.get("error"):
+        return {"Ticker": ticker_symbol, "Punteggio": None, "Stato": f"❌ Errore: {result_package['error']}"}
+    if not result_package or not result_package.get("financials"):
+        return {"Ticker": ticker_symbol, "Punteggio": None, "Stato": "❌ Dati non disponibili"}
+    metrics = GrahamAgent(FinancialData(**result_package["financials"])).key_metrics()
+    return {
+        "Ticker": ticker_symbol,
+        "Punteggio": metrics["score"],
+        "Prezzo": metrics["price"],
+        "P/E": metrics["pe_ratio"],
+        "P/B": metrics["pb_ratio"],
+        "P/E x P/B": metrics["graham_number"],
+        "NCAV/Azione": metrics["ncav_per_share"],
+        "Stato": "💎 Bargain (Prezzo < NCAV)" if metrics["bargain"] else "✅",
+    }
+
+def run_watchlist_job(market_agent, tickers, audit_mode, rows):
+    """
+    Eseguito nel thread worker: aggiunge una riga a `rows` per ogni ticker completato.
+    Un ticker in errore diventa una riga con il messaggio, gli altri proseguono.
+    """
+    for ticker_symbol, result_package in market_agent.fetch_many(tickers, audit_mode=audit_mode):
+        try:
+            rows.append(build_watchlist_row(ticker_symbol, result_package))
+        except Exception as e: # pylint: disable=broad-exception-caught
+            rows.append({"Ticker": ticker_symbol, "Punteggio": None, "Stato": f"❌ Errore: {e}"})
+
+def render_analysis(ticker_symbol, result_package, messages):
+    """Disegna il risultato dell'analisi (KPI, report, grafico, ETF, dati grezzi)."""
+    financial_data = result_package.get("financials")
+    summary_text = result_package.get("summary")
+
+    # Creazione oggetti modello
+    fin_obj = FinancialData(**financial_data)
+    graham_agent = GrahamAgent(fin_obj)
+    report_text = graham_agent.analyze()
+
+    # Completamento
+    with st.status("✅ Analisi Completata!", state="complete", expanded=False):
+        for msg in messages:
+            st.write(msg)
+        st.write("3️⃣ Applicazione formule di Benjamin Graham...")
+
+    # --- DASHBOARD VISUALIZZAZIONE ---
+
+    # A. KPI Metrics
+    st.markdown("### ⚡ Indicatori Chiave (TTM)")
+    m1, m2, m3 = st.columns(3)
+
+    m1.metric("Prezzo", f"${fin_obj.current_market_price}")
+
+    pe_ratio = 0.0
+    if fin_obj.net_income > 0:
+        pe_ratio = fin_obj.current_market_price / (fin_obj.net_income / fin_obj.shares_outstanding)
+    m2.metric("P/E Ratio", f"{pe_ratio:.1f}x")
+
+    debt_str = f"${fin_obj.long_term_debt / 1_000_000:.0f}M"
+    m3.metric("Debito LP", debt_str)
+
+    # B. Contenuto a Schede
+    tab_main, tab_story, tab_chart, tab_raw = st.tabs(
+        ["📝 Report Graham", "📜 Storia & Business", "📉 Grafico & ETF", "🔢 Dati Grezzi"]
+    )
+
+    with tab_main:
+        if "SOTTOVALUTATA" in report_text:
+            st.success("💎 VERDETTO: Titolo SOTTOVALUTATO secondo i criteri.")
+        elif "DA VERIFICARE" in report_text:
+            st.warning("⚠️ VERDETTO: Segnali MISTI. Richiede attenzione.")
+
+        st.text_area("Report Dettagliato", report_text, height=600)
+
+    with tab_story:
+        st.markdown("### 🏢 Profilo Aziendale")
+        if summary_text:
+            st.info(summary_text)
+        else:
+            st.warning("Riassunto non disponibile.")
+
+    with tab_chart:
+        price_chart = plot_price_chart(ticker_symbol)
+        if price_chart:
+            st.plotly_chart(price_chart, width="stretch")
+
+        st.markdown("#### 🏦 Esposizione ETF")
+        # Calcolata nel job in background insieme ai dati finanziari
+        etf_list = result_package.get("etfs", [])
+
+        if etf_list:
+            st.dataframe(pd.DataFrame(etf_list), hide_index=True, width="stretch")
+        else:
+            st.caption("Nessun dato ETF rilevante trovato.")
+
+    with tab_raw:
+        st.markdown("### 📊 Confronto Dati Estratti vs Finviz")
+
+        finviz_data_raw = result_package.get("finviz", {})
+
+        # Mappa chiavi Finviz -> Chiavi Nostre
+        FV_MAP = {
+            'Price': 'current_market_price',
+            'P/E': 'pe_ratio', # Calcolato
+            'Income': 'net_income',
+            'Sales': 'sales',
+            'Shs Outstand': 'shares_outstanding',
+            'LTDebt/Eq': None, # Non diretto
+            'Dividend %': 'dividend_yield'
+        }
+
+        # Creiamo confronto
+        comparison_rows = []
+        for k, v in financial_data.items():
+            finviz_val = "N/A"
+            # Cerca reverse mapping o match diretto
+            # Semplificazione: cerchiamo se c'è una chiave Finviz che mappa a k
+            found_fv_key = next((fk for fk, mk in FV_MAP.items() if mk == k), None)
+
+            if found_fv_key and finviz_data_raw:
+                finviz_val = finviz_data_raw.get(found_fv_key, "N/A")
+            elif k == "long_term_debt" and finviz_data_raw:
+                 # Finviz spesso non ha Long Term Debt esplicito in tabella snapshot principale se non come ratio
+                 # Ma proviamo a vedere se c'è qualcosa di simile o se il cross-check lo ha preso da altrove
+                 finviz_val = finviz_data_raw.get('Long Term Debt', "N/A") # A volte non c'è
+
+            comparison_rows.append({"Campo": k, "Valore AI": v, "Valore Finviz": str(finviz_val)})
+
+        st.dataframe(
+            pd.DataFrame(comparison_rows).set_index("Campo"),
+            width="stretch"
+        )
+
+        if finviz_data_raw:
+            with st.expander("Vedi dati grezzi Finviz completi"):
+                st.json(finviz_data_raw)
+
 # --- SIDEBAR: CONFIGURAZIONE ---
 
 st.sidebar.header("🧠 Cervello AI")
@@ -166,7 +370,7 @@ elif "Ollama" in provider_selection:
 
 # --- GESTIONE CACHE ---
 with st.sidebar.expander("🗑️ Gestione Cache", expanded=False):
-    cm = CacheManager()
+    cm = get_cache_manager()
     all_keys = cm.get_all_keys()
     
     # Raggruppa per Ticker
@@ -205,165 +409,139 @@ audit_mode_ui = st.sidebar.radio(
 st.title("🧐 Graham AI Analyst")
 st.caption(f"Analisi fondamentale potenziata da **{provider_code.title()}**")
 
-# Input Ticker e Bottone
-col_input, col_btn = st.columns([3, 1])
-with col_input:
-    ticker_input = st.text_input(
-        "Ticker", 
-        placeholder="Es. AAPL, GME, NVDA...", 
-        label_visibility="collapsed"
-    ).upper()
-    
-with col_btn:
-    run_btn = st.button("Analizza", type="primary", use_container_width=True)
-
-# Logica di Esecuzione
-if run_btn:
-    # Controlli preliminari
-    if not ticker_input:
-        st.warning("Inserisci un simbolo azionario.")
-    elif provider_code != "ollama" and not api_key:
-        st.error(f"🔑 API Key mancante per {provider_code}. Inseriscila nella sidebar.")
-    elif provider_code == "ollama" and not selected_model:
-        st.error("❌ Nessun modello locale selezionato o disponibile.")
-    else:
-        # Avvio Processo
-        status_box = st.status("🕵️‍♂️ Analisi in corso...", expanded=True)
+# Mappatura UI -> Parametro
+audit_param = "full" if "Completo" in audit_mode_ui else "quick"
+
+# Se un job è in corso, a fine script si attende e si ricarica la pagina (polling)
+needs_polling = False
+
+tab_single, tab_watchlist = st.tabs(["🔎 Singolo Titolo", "📋 Watchlist"])
+
+with tab_single:
+    # Input Ticker e Bottone
+    col_input, col_btn = st.columns([3, 1])
+    with col_input:
+        ticker_input = st.text_input(
+            "Ticker", 
+            placeholder="Es. AAPL, GME, NVDA...", 
+            label_visibility="collapsed"
+        ).upper()
         
-        try:
-            # 1. Setup Agente
+    with col_btn:
+        run_btn = st.button("Analizza", type="primary", use_container_width=True)
+
+    # Logica di Esecuzione
+    if run_btn:
+        # Controlli preliminari
+        if not ticker_input:
+            st.warning("Inserisci un simbolo azionario.")
+        elif provider_ready(provider_code, api_key, selected_model):
+            # Avvio Processo in background: lo script Streamlit resta libero e i rerun sono immediati
             model_disp = selected_model or 'Auto'
-            status_box.write(f"1️⃣ Connessione a {provider_code.title()} ({model_disp})...")
-            
-            market_agent = MarketDataAgent(
-                api_key=api_key,
-                provider=provider_code,
-                model=selected_model
-            )
-            
-            # 2. Recupero Dati (Cache o AI)
-            status_box.write(f"2️⃣ Recupero dati ({audit_mode_ui})...")
-            
-            # Mappatura UI -> Parametro
-            audit_param = "full" if "Completo" in audit_mode_ui else "quick"
-            
-            result_package = market_agent.fetch_from_ticker(
-                ticker_input, 
-                audit_mode=audit_param,
-                callback=status_box.write
-            )
-            
-            if result_package:
-                financial_data = result_package.get("financials")
-                summary_text = result_package.get("summary")
-                
-                status_box.write("3️⃣ Applicazione formule di Benjamin Graham...")
-                
-                # Creazione oggetti modello
-                fin_obj = FinancialData(**financial_data)
-                graham_agent = GrahamAgent(fin_obj)
-                report_text = graham_agent.analyze()
-                
-                # Completamento
-                status_box.update(label="✅ Analisi Completata!", state="complete", expanded=False)
-                
-                # --- DASHBOARD VISUALIZZAZIONE ---
-                
-                # A. KPI Metrics
-                st.markdown("### ⚡ Indicatori Chiave (TTM)")
-                m1, m2, m3 = st.columns(3)
-                
-                m1.metric("Prezzo", f"${fin_obj.current_market_price}")
-                
-                pe_ratio = 0.0
-                if fin_obj.net_income > 0:
-                    pe_ratio = fin_obj.current_market_price / (fin_obj.net_income / fin_obj.shares_outstanding)
-                m2.metric("P/E Ratio", f"{pe_ratio:.1f}x")
-                
-                debt_str = f"${fin_obj.long_term_debt / 1_000_000:.0f}M"
-                m3.metric("Debito LP", debt_str)
-                
-                # B. Contenuto a Schede
-                tab_main, tab_story, tab_chart, tab_raw = st.tabs(
-                    ["📝 Report Graham", "📜 Storia & Business", "📉 Grafico & ETF", "🔢 Dati Grezzi"]
+            new_job = AnalysisJob(ticker=ticker_input)
+            new_job.messages.append(f"1️⃣ Connessione a {provider_code.title()} ({model_disp})...")
+            try:
+                market_agent = get_market_agent(api_key, provider_code, selected_model)
+
+                new_job.messages.append(f"2️⃣ Recupero dati ({audit_mode_ui})...")
+                new_job.future = get_job_executor().submit(
+                    run_analysis_job,
+                    market_agent,
+                    ticker_input,
+                    audit_param,
+                    new_job.messages.append
                 )
-                
-                with tab_main:
-                    if "SOTTOVALUTATA" in report_text:
-                        st.success("💎 VERDETTO: Titolo SOTTOVALUTATO secondo i criteri.")
-                    elif "DA VERIFICARE" in report_text:
-                        st.warning("⚠️ VERDETTO: Segnali MISTI. Richiede attenzione.")
-                    
-                    st.text_area("Report Dettagliato", report_text, height=600)
-                    
-                with tab_story:
-                    st.markdown("### 🏢 Profilo Aziendale")
-                    if summary_text:
-                        st.info(summary_text)
-                    else:
-                        st.warning("Riassunto non disponibile.")
-                        
-                with tab_chart:
-                    price_chart = plot_price_chart(ticker_input)
-                    if price_chart:
-                        st.plotly_chart(price_chart, width="stretch")
-                    
-                    st.markdown("#### 🏦 Esposizione ETF")
-                    # Istanziamo un ETF finder dedicato per la UI se necessario
-                    etf_finder = ETFFinderAgent(api_key=api_key, provider=provider_code, model=selected_model)
-                    etf_list = etf_finder.find_etfs_holding_ticker(ticker_input)
-                    
-                    if etf_list:
-                        st.dataframe(pd.DataFrame(etf_list), hide_index=True, width="stretch")
-                    else:
-                        st.caption("Nessun dato ETF rilevante trovato.")
-                        
-                with tab_raw:
-                    st.markdown("### 📊 Confronto Dati Estratti vs Finviz")
-                    
-                    finviz_data_raw = result_package.get("finviz", {})
-                    
-                    # Mappa chiavi Finviz -> Chiavi Nostre
-                    FV_MAP = {
-                        'Price': 'current_market_price',
-                        'P/E': 'pe_ratio', # Calcolato
-                        'Income': 'net_income',
-                        'Sales': 'sales',
-                        'Shs Outstand': 'shares_outstanding',
-                        'LTDebt/Eq': None, # Non diretto
-                        'Dividend %': 'dividend_yield'
-                    }
-                    
-                    # Creiamo confronto
-                    comparison_rows = []
-                    for k, v in financial_data.items():
-                        finviz_val = "N/A"
-                        # Cerca reverse mapping o match diretto
-                        # Semplificazione: cerchiamo se c'è una chiave Finviz che mappa a k
-                        found_fv_key = next((fk for fk, mk in FV_MAP.items() if mk == k), None)
-                        
-                        if found_fv_key and finviz_data_raw:
-                            finviz_val = finviz_data_raw.get(found_fv_key, "N/A")
-                        elif k == "long_term_debt" and finviz_data_raw:
-                             # Finviz spesso non ha Long Term Debt esplicito in tabella snapshot principale se non come ratio
-                             # Ma proviamo a vedere se c'è qualcosa di simile o se il cross-check lo ha preso da altrove
-                             finviz_val = finviz_data_raw.get('Long Term Debt', "N/A") # A volte non c'è
-                        
-                        comparison_rows.append({"Campo": k, "Valore AI": v, "Valore Finviz": str(finviz_val)})
-                        
-                    st.dataframe(
-                        pd.DataFrame(comparison_rows).set_index("Campo"),
-                        width="stretch"
-                    )
-                    
-                    if finviz_data_raw:
-                        with st.expander("Vedi dati grezzi Finviz completi"):
-                            st.json(finviz_data_raw)
+                st.session_state["analysis_job"] = new_job
+                st.session_state.pop("analysis_result", None)
+            except Exception as e: # pylint: disable=broad-exception-caught
+                st.status("❌ Errore Critico", state="error")
+                st.error(f"Si è verificato un errore imprevisto: {e}")
 
-            else:
-                status_box.update(label="❌ Errore Dati", state="error")
-                st.error("Impossibile recuperare o strutturare i dati. Controlla la console.")
-        
-        except Exception as e: # pylint: disable=broad-exception-caught
-            status_box.update(label="❌ Errore Critico", state="error")
-            st.error(f"Si è verificato un errore imprevisto: {e}")
\ No newline at end of file
+    # Polling del job in corso
+    job = st.session_state.get("analysis_job")
+    if job is not None:
+        if not job.future.done():
+            status_box = st.status(f"🕵️‍♂️ Analisi di {job.ticker} in corso...", expanded=True)
+            for msg in list(job.messages):
+                status_box.write(msg)
+            needs_polling = True
+        else:
+            del st.session_state["analysis_job"]
+            try:
+                st.session_state["analysis_result"] = {
+                    "ticker": job.ticker,
+                    "package": job.future.result(),
+                    "messages": list(job.messages),
+                }
+            except Exception as e: # pylint: disable=broad-exception-caught
+                st.session_state["analysis_result"] = {"ticker": job.ticker, "package": None, "error": str(e)}
+
+    # Visualizzazione (solo da session_state: nessuna chiamata di rete ai rerun)
+    analysis = st.session_state.get("analysis_result")
+    if analysis is not None:
+        if analysis.get("error"):
+            st.status("❌ Errore Critico", state="error")
+            st.error(f"Si è verificato un errore imprevisto: {analysis['error']}")
+        elif analysis["package"]:
+            try:
+                render_analysis(analysis["ticker"], analysis["package"], analysis["messages"])
+            except Exception as e: # pylint: disable=broad-exception-caught
+                st.status("❌ Errore Critico", state="error")
+                st.error(f"Si è verificato un errore imprevisto: {e}")
+        else:
+            st.status("❌ Errore Dati", state="error")
+            st.error("Impossibile recuperare o strutturare i dati. Controlla la console.")
+
+with tab_watchlist:
+    st.markdown("### 📋 Confronto Multi-Ticker")
+    st.caption("I ticker già in cache compaiono subito; gli altri vengono analizzati in parallelo (senza summary AI).")
+
+    watchlist_input = st.text_area(
+        "Ticker",
+        placeholder="Es. AAPL, MSFT, KO, JNJ...",
+        label_visibility="collapsed"
+    )
+    compare_btn = st.button("Confronta", type="primary", key="watchlist_btn")
+
+    if compare_btn:
+        watchlist = parse_ticker_list(watchlist_input)
+        if not watchlist:
+            st.warning("Inserisci almeno un simbolo azionario.")
+        elif provider_ready(provider_code, api_key, selected_model):
+            try:
+                market_agent = get_market_agent(api_key, provider_code, selected_model)
+                new_watch_job = WatchlistJob(tickers=watchlist)
+                new_watch_job.future = get_job_executor().submit(
+                    run_watchlist_job, market_agent, watchlist, audit_param, new_watch_job.rows
+                )
+                st.session_state["watchlist_job"] = new_watch_job
+            except Exception as e: # pylint: disable=broad-exception-caught
+                st.error(f"Si è verificato un errore imprevisto: {e}")
+
+    watch_job = st.session_state.get("watchlist_job")
+    if watch_job is not None:
+        rows = list(watch_job.rows)
+        if not watch_job.future.done():
+            st.progress(len(rows) / len(watch_job.tickers), text=f"{len(rows)}/{len(watch_job.tickers)} ticker completati")
+            needs_polling = True
+        elif watch_job.future.exception():
+            st.error(f"Si è verificato un errore imprevisto: {watch_job.future.exception()}")
+
+        if rows:
+            # st.dataframe è ordinabile cliccando sulle intestazioni
+            st.dataframe(
+                pd.DataFrame(rows).sort_values("Punteggio", ascending=False),
+                hide_index=True,
+                width="stretch",
+                column_config={
+                    "P/E": st.column_config.NumberColumn(format="%.1f"),
+                    "P/B": st.column_config.NumberColumn(format="%.2f"),
+                    "P/E x P/B": st.column_config.NumberColumn(format="%.2f"),
+                    "NCAV/Azione": st.column_config.NumberColumn(format="$%.2f"),
+                    "Prezzo": st.column_config.NumberColumn(format="$%.2f"),
+                },
+            )
+
+if needs_polling:
+    time.sleep(POLL_INTERVAL_SECONDS)
+    st.rerun()
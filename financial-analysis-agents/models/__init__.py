@@ -1,6 +1,7 @@
 # models/__init__.py
 
 from .data_schema import FinancialData
+from .financial_table import FinancialDataTable
 
 # Definisce cosa viene esportato quando qualcuno fa "from models import *"
-__all__ = ["FinancialData"]
\ No newline at end of file
+__all__ = ["FinancialData", "FinancialDataTable"]
\ No newline at end of file
@@ -2,10 +2,12 @@
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(slots=True)
 class FinancialData:
     """
     Struttura dati aggiornata per includere metriche storiche di 'L'Investitore Intelligente'.
+    Usa __slots__ (niente __dict__ per istanza): per analizzare molte aziende
+    insieme usare invece la versione colonnare `FinancialDataTable`.
     """
     # Stato Patrimoniale
     total_assets: float
@@ -41,6 +43,8 @@ class FinancialData:
     # Metadati aggiuntivi per reportistica (con default alla fine)
     dividend_years_count: int = 0
     earnings_years_count: int = 0
+    eps_growth_10y: float = 0.0 # Crescita % EPS (media 3y finale vs iniziale), da storico locale
+    eps_history_years: int = 0  # Anni di EPS coperti dallo storico locale
     
     capital_lease_obligations: float = 0.0 # Valore predefinito se non estratto 
 
@@ -0,0 +1,159 @@
+"""
+Versione colonnare di `FinancialData` per analizzare migliaia di aziende insieme.
+I dati sono un array strutturato NumPy (una riga per ticker) salvato in formato .npy
+e riaperto in memory-map: il caricamento non legge né alloca nulla finché le colonne
+non vengono effettivamente usate.
+"""
+import os
+from dataclasses import fields
+from typing import Any, Dict, List, Mapping, Optional, Union
+
+import numpy as np
+
+from .data_schema import FinancialData
+
+# Larghezza minima della colonna ticker: si allarga al ticker più lungo, nessun simbolo viene troncato
+TICKER_MAX_LEN = 16
+
+
+def _numpy_type(py_type: Any) -> Any:
+    """Mappa il tipo del campo dataclass nel tipo NumPy a dimensione fissa."""
+    if py_type is bool:
+        return np.bool_
+    if py_type is int:
+        return np.int32
+    return np.float64
+
+
+class FinancialDataTable:
+    """
+    Tabella colonnare dei fondamentali: una riga per ticker, una colonna per campo di `FinancialData`.
+
+    Input: record `FinancialData` (o dizionari compatibili) indicizzati per ticker.
+    Output: colonne NumPy (`table.column("net_income")`) pronte per screening vettoriale,
+    oppure il singolo record con `table.get("AAPL")`.
+    """
+
+    FIELDS_DTYPE = [(f.name, _numpy_type(f.type)) for f in fields(FinancialData)]
+    DTYPE = np.dtype([("ticker", f"U{TICKER_MAX_LEN}")] + FIELDS_DTYPE)
+
+    @classmethod
+    def dtype_for(cls, ticker_len: int) -> np.dtype:
+        """DTYPE con la colonna ticker larga abbastanza per `ticker_len` caratteri."""
+        return np.dtype([("ticker", f"U{max(ticker_len, TICKER_MAX_LEN)}")] + cls.FIELDS_DTYPE)
+
+    @staticmethod
+    def _ticker_len(array: np.ndarray) -> int:
+        """Caratteri disponibili nella colonna ticker di un array."""
+        return array.dtype["ticker"].itemsize // np.dtype("U1").itemsize
+
+    def __init__(self, array: Optional[np.ndarray] = None):
+        self.array = array if array is not None else np.empty(0, dtype=self.DTYPE)
+        self._index: Optional[Dict[str, int]] = None
+
+    # --- COSTRUZIONE ---
+
+    @classmethod
+    def from_records(cls, records: Mapping[str, Union[FinancialData, Dict[str, Any]]]) -> "FinancialDataTable":
+        """Costruisce la tabella da {ticker: FinancialData | dict}."""
+        array = np.empty(len(records), dtype=cls.dtype_for(max((len(t) for t in records), default=0)))
+        for i, (ticker, record) in enumerate(records.items()):
+            array[i] = cls._to_row(ticker, record)
+        return cls(array)
+
+    @classmethod
+    def _to_row(cls, ticker: str, record: Union[FinancialData, Dict[str, Any]]) -> tuple:
+        """Converte un record in una tupla ordinata secondo DTYPE (normalizzata da __post_init__)."""
+        if not isinstance(record, FinancialData):
+            record = FinancialData(**record)
+        return (ticker.upper(),) + tuple(getattr(record, f.name) for f in fields(FinancialData))
+
+    def upsert(self, ticker: str, record: Union[FinancialData, Dict[str, Any]]) -> "FinancialDataTable":
+        """Inserisce o sostituisce la riga di un ticker. Restituisce una nuova tabella (in RAM)."""
+        dtype = self.dtype_for(max(len(ticker), self._ticker_len(self.array)))
+        row = np.array([self._to_row(ticker, record)], dtype=dtype)
+        pos = self._lookup().get(ticker.upper())
+        if pos is None:
+            return FinancialDataTable(np.concatenate([self.array.astype(dtype), row]))
+        array = self.array.astype(dtype)  # copia: l'originale potrebbe essere un memmap read-only
+        array[pos] = row[0]
+        return FinancialDataTable(array)
+
+    # --- PERSISTENZA ---
+
+    def save(self, path: str):
+        """Salva la tabella su disco in formato .npy."""
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        np.save(path, self.array, allow_pickle=False)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> Optional["FinancialDataTable"]:
+        """
+        Apre una tabella salvata. Con `mmap=True` l'array è mappato in memoria (zero-copy).
+        Se lo schema su disco è diverso da quello attuale, le colonne comuni vengono copiate
+        e quelle nuove restano ai valori di default.
+        """
+        try:
+            array = np.load(path, mmap_mode="r" if mmap else None, allow_pickle=False)
+        except FileNotFoundError:
+            print(f"Errore: Tabella {path} non trovata.")
+            return None
+        except ValueError as e:
+            print(f"Errore nella lettura della tabella {path}: {e}")
+            return None
+
+        ticker_len = cls._ticker_len(array) if "ticker" in (array.dtype.names or ()) else TICKER_MAX_LEN
+        if array.dtype != cls.dtype_for(ticker_len):
+            migrated = np.zeros(len(array), dtype=cls.dtype_for(ticker_len))
+            for name in array.dtype.names or ():
+                if name in cls.DTYPE.names:
+                    migrated[name] = array[name]
+            array = migrated
+        return cls(array)
+
+    # --- ACCESSO ---
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker.upper() in self._lookup()
+
+    def _lookup(self) -> Dict[str, int]:
+        """Indice ticker -> riga, costruito alla prima richiesta."""
+        if self._index is None:
+            self._index = {str(t): i for i, t in enumerate(self.array["ticker"])}
+        return self._index
+
+    @property
+    def tickers(self) -> List[str]:
+        """Elenco dei ticker presenti."""
+        return list(self._lookup().keys())
+
+    def column(self, name: str) -> np.ndarray:
+        """Restituisce una colonna come vista NumPy (nessuna copia)."""
+        return self.array[name]
+
+    def filter(self, mask: np.ndarray) -> "FinancialDataTable":
+        """Sottotabella delle righe selezionate da una maschera booleana."""
+        return FinancialDataTable(self.array[mask])
+
+    def get(self, ticker: str) -> Optional[FinancialData]:
+        """Ricostruisce il singolo record `FinancialData` di un ticker."""
+        row = self.row_dict(ticker)
+        return FinancialData(**row) if row is not None else None
+
+    def row_dict(self, ticker: str) -> Optional[Dict[str, Any]]:
+        """Riga del ticker come dizionario compatibile con `asdict(FinancialData)`."""
+        pos = self._lookup().get(ticker.upper())
+        if pos is None:
+            return None
+        row = self.array[pos]
+        return {f.name: row[f.name].item() for f in fields(FinancialData)}
+
+    def to_records(self) -> Dict[str, Dict[str, Any]]:
+        """Esporta l'intera tabella come {ticker: dict} (equivalente JSON)."""
+        names = [f.name for f in fields(FinancialData)]
+        return {str(row["ticker"]): {n: row[n].item() for n in names} for row in self.array}
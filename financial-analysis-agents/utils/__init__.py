@@ -1,6 +1,8 @@
 # utils/__init__.py
 
-from .loader import load_company_data
+from .loader import load_company_data, build_company_table, load_company_table
 from .cache_manager import CacheManager
+from .history_store import FundamentalsHistoryStore
+from .etf_holdings_index import ETFHoldingsIndex
 
-__all__ = ["load_company_data","CacheManager"]
\ No newline at end of file
+__all__ = ["load_company_data", "build_company_table", "load_company_table", "CacheManager", "FundamentalsHistoryStore", "ETFHoldingsIndex"]
\ No newline at end of file
@@ -3,6 +3,7 @@ Modulo per la gestione della cache locale per risparmiare token AI.
 """
 import json
 import os
+import threading
 import time
 from typing import Optional, Dict, Any
 
@@ -16,6 +17,9 @@ class CacheManager:
     # Durata validità in secondi (es. 10 giorni = 86400 * 10)
     DEFAULT_EXPIRATION = 86400 * 10 
 
+    # Il file è condiviso da tutte le istanze: le letture-modifica-scrittura sono serializzate
+    _LOCK = threading.RLock()
+
     def __init__(self):
         self._ensure_cache_file()
 
@@ -47,7 +51,8 @@ class CacheManager:
             key: Identificativo unico (es. "AAPL_summary", "GME_graham_data")
             max_age_seconds: Tempo massimo di vita del dato (default 10 giorni)
         """
-        cache = self._load_cache()
+        with self._LOCK:
+            cache = self._load_cache()
         entry = cache.get(key)
         
         if not entry:
@@ -66,35 +71,41 @@ class CacheManager:
 
     def set(self, key: str, data: Any):
         """Salva un valore in cache con il timestamp attuale."""
-        cache = self._load_cache()
-        
-        cache[key] = {
-            'timestamp': time.time(),
-            'data': data
-        }
-        
-        self._save_cache(cache)
+        with self._LOCK:
+            cache = self._load_cache()
+            
+            cache[key] = {
+                'timestamp': time.time(),
+                'data': data
+            }
+            
+            self._save_cache(cache)
         print(f"💾 Dato salvato in Cache: '{key}'")
         
     def clear_key(self, key: str):
         """Rimuove una chiave specifica (utile per forzare l'aggiornamento)."""
-        cache = self._load_cache()
-        if key in cache:
+        with self._LOCK:
+            cache = self._load_cache()
+            if key not in cache:
+                return
             del cache[key]
             self._save_cache(cache)
-            print(f"🗑️ Rimossa chiave cache: {key}")
+        print(f"🗑️ Rimossa chiave cache: {key}")
 
     def get_all_keys(self) -> list[str]:
         """Restituisce tutte le chiavi in cache."""
-        return list(self._load_cache().keys())
+        with self._LOCK:
+            cache = self._load_cache()
+        return list(cache.keys())
 
     def delete_keys(self, keys: list[str]):
         """Rimuove una lista di chiavi."""
-        cache = self._load_cache()
-        flushed = False
-        for k in keys:
-            if k in cache:
-                del cache[k]
-                flushed = True
-        if flushed:
-            self._save_cache(cache)
\ No newline at end of file
+        with self._LOCK:
+            cache = self._load_cache()
+            flushed = False
+            for k in keys:
+                if k in cache:
+                    del cache[k]
+                    flushed = True
+            if flushed:
+                self._save_cache(cache)
\ No newline at end of file
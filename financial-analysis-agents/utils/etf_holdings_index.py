@@ -0,0 +1,132 @@
+"""
+Indice inverso titolo -> ETF costruito dai file di holdings salvati in locale.
+I file (es. export CSV di iShares/SPDR/Vanguard) vanno in `data/etf_holdings/<ETF>.csv`:
+il nome del file è il ticker dell'ETF. Solo i file nuovi o modificati vengono riletti.
+"""
+import csv
+import glob
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+class ETFHoldingsIndex:
+    """
+    Reverse index { holding: [(etf, peso %), ...] } persistito su JSON insieme agli mtime dei file sorgente.
+    """
+
+    HOLDINGS_DIR = "data/etf_holdings"
+    INDEX_FILE = "data/etf_holdings_index.json"
+    # Da incrementare quando cambia il parser: gli indici salvati con una versione diversa vengono ricostruiti
+    PARSER_VERSION = 2
+
+    # Intestazioni riconosciute nei vari formati di export
+    TICKER_COLUMNS = ("Ticker", "Symbol", "Holding Ticker", "Ticker Symbol")
+    WEIGHT_COLUMNS = ("Weight (%)", "Weight", "% of Net Assets", "Weighting", "% Weight")
+
+    def __init__(self, holdings_dir: Optional[str] = None, index_file: Optional[str] = None):
+        self.holdings_dir = holdings_dir or self.HOLDINGS_DIR
+        self.index_file = index_file or self.INDEX_FILE
+        self._state = self._load()
+        self._reverse: Optional[Dict[str, List[Dict[str, Any]]]] = None
+
+    def _load(self) -> Dict[str, Any]:
+        """Carica l'indice salvato (file sorgente + holdings per ETF)."""
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get("version") != self.PARSER_VERSION:
+                return {"version": self.PARSER_VERSION, "files": {}, "etfs": {}}
+            return {"version": self.PARSER_VERSION, "files": state.get("files", {}), "etfs": state.get("etfs", {})}
+        except (json.JSONDecodeError, FileNotFoundError):
+            return {"version": self.PARSER_VERSION, "files": {}, "etfs": {}}
+
+    def _save(self):
+        """Salva l'indice su disco."""
+        os.makedirs(os.path.dirname(self.index_file) or ".", exist_ok=True)
+        with open(self.index_file, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, indent=4)
+
+    @classmethod
+    def _parse_weight(cls, text: str) -> Optional[float]:
+        """Converte '6.85', '6,85%' ecc. in float (None se non numerico)."""
+        try:
+            return float(text.replace('%', '').replace(',', '.').strip())
+        except (ValueError, AttributeError):
+            return None
+
+    @classmethod
+    def parse_holdings_file(cls, filepath: str) -> Dict[str, Optional[float]]:
+        """
+        Legge un file di holdings e restituisce {holding: peso %}.
+        Le righe di intestazione extra (nome fondo, data, ecc.) prima della tabella vengono saltate;
+        la tabella finisce alla prima riga con un formato diverso (riga vuota, note legali in fondo,
+        meno colonne dell'intestazione o peso non numerico).
+        """
+        holdings: Dict[str, Optional[float]] = {}
+        with open(filepath, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.reader(f)
+            ticker_col = weight_col = None
+            n_columns = 0
+            for row in reader:
+                cells = [c.strip() for c in row]
+                if ticker_col is None:
+                    # Cerca la riga di intestazione della tabella
+                    ticker_col = next((cells.index(c) for c in cls.TICKER_COLUMNS if c in cells), None)
+                    weight_col = next((cells.index(c) for c in cls.WEIGHT_COLUMNS if c in cells), None)
+                    n_columns = len(cells)
+                    continue
+                # Fine tabella: tutto ciò che segue non sono holdings
+                if len(cells) < n_columns or not any(cells):
+                    break
+                weight = cls._parse_weight(cells[weight_col]) if weight_col is not None else None
+                if weight_col is not None and weight is None:
+                    break
+                if not cells[ticker_col] or cells[ticker_col] == '-':
+                    continue
+                holdings[cells[ticker_col].upper()] = weight
+        return holdings
+
+    def refresh(self) -> int:
+        """
+        Aggiorna l'indice rileggendo solo i file nuovi/modificati e rimuovendo quelli cancellati.
+        Restituisce il numero di file riletti.
+        """
+        current = {
+            os.path.basename(p): os.path.getmtime(p)
+            for p in glob.glob(os.path.join(self.holdings_dir, "*.csv"))
+        }
+        known = self._state["files"]
+        changed = [name for name, mtime in current.items() if known.get(name) != mtime]
+        removed = [name for name in known if name not in current]
+
+        for name in changed:
+            etf = os.path.splitext(name)[0].upper()
+            try:
+                self._state["etfs"][etf] = self.parse_holdings_file(os.path.join(self.holdings_dir, name))
+                known[name] = current[name]
+            except (OSError, csv.Error, UnicodeDecodeError) as e:
+                print(f"⚠️ Holdings non leggibili per {etf}: {e}")
+        for name in removed:
+            self._state["etfs"].pop(os.path.splitext(name)[0].upper(), None)
+            del known[name]
+
+        if changed or removed:
+            self._reverse = None
+            self._save()
+        return len(changed)
+
+    def _reverse_index(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Costruisce (una volta) il dizionario holding -> ETF ordinati per peso decrescente."""
+        if self._reverse is None:
+            reverse: Dict[str, List[Dict[str, Any]]] = {}
+            for etf, holdings in self._state["etfs"].items():
+                for holding, weight in holdings.items():
+                    reverse.setdefault(holding, []).append({"etf_ticker": etf, "weight_percentage": weight})
+            for entries in reverse.values():
+                entries.sort(key=lambda e: e["weight_percentage"] or 0.0, reverse=True)
+            self._reverse = reverse
+        return self._reverse
+
+    def lookup(self, ticker: str) -> List[Dict[str, Any]]:
+        """ETF noti che detengono il ticker, con il peso % letto dai file di holdings."""
+        return list(self._reverse_index().get(ticker.upper(), []))
@@ -0,0 +1,120 @@
+"""
+Modulo per lo storico pluriennale dei fondamentali (EPS, dividendi, utile netto).
+Ogni analisi aggiunge gli anni nuovi: lo storico cresce run dopo run oltre i ~4 anni di Yahoo Finance.
+"""
+import bisect
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+class FundamentalsHistoryStore:
+    """
+    Serie storiche annuali per ticker, salvate su file JSON e indicizzate per anno.
+
+    Struttura su disco: { "AAPL": { "eps": {"2021": 5.61, ...}, "dividends": {...}, "net_income": {...} } }
+    In memoria ogni serie è tenuta come coppia (anni ordinati, valori) per query per intervallo in O(log n).
+    """
+
+    HISTORY_FILE = "data/fundamentals_history.json"
+
+    METRICS = ("eps", "dividends", "net_income")
+
+    def __init__(self, history_file: Optional[str] = None):
+        self.history_file = history_file or self.HISTORY_FILE
+        self._data: Dict[str, Dict[str, Dict[str, float]]] = self._load()
+        self._series: Dict[Tuple[str, str], Tuple[List[int], List[float]]] = {}
+        # Più analisi in parallelo possono aggiornare lo stesso store
+        self._lock = threading.RLock()
+
+    def _load(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """Carica lo storico da disco (vuoto se il file non esiste o è corrotto)."""
+        try:
+            with open(self.history_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError):
+            return {}
+
+    def _save(self):
+        """Salva lo storico su disco."""
+        os.makedirs(os.path.dirname(self.history_file) or ".", exist_ok=True)
+        with open(self.history_file, 'w', encoding='utf-8') as f:
+            json.dump(self._data, f, indent=4)
+
+    def update(self, ticker: str, metric: str, values: Dict[int, float]) -> int:
+        """
+        Unisce nuovi valori annuali allo storico (gli anni già presenti vengono aggiornati).
+        Restituisce il numero di anni nuovi aggiunti.
+        """
+        if metric not in self.METRICS:
+            raise ValueError(f"Metrica non supportata: {metric}. Usare {self.METRICS}")
+        with self._lock:
+            series = self._data.setdefault(ticker.upper(), {}).setdefault(metric, {})
+            added = sum(1 for year in values if str(year) not in series)
+            changed = False
+            for year, value in values.items():
+                if series.get(str(year)) != float(value):
+                    series[str(year)] = float(value)
+                    changed = True
+            if changed:
+                self._series.pop((ticker.upper(), metric), None)
+                self._save()
+        return added
+
+    def _sorted_series(self, ticker: str, metric: str) -> Tuple[List[int], List[float]]:
+        """Serie ordinata per anno (costruita una volta e poi riusata)."""
+        key = (ticker.upper(), metric)
+        with self._lock:
+            if key not in self._series:
+                raw = self._data.get(key[0], {}).get(metric, {})
+                years = sorted(int(y) for y in raw)
+                self._series[key] = (years, [raw[str(y)] for y in years])
+            return self._series[key]
+
+    def get_range(self, ticker: str, metric: str, start_year: Optional[int] = None, end_year: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Restituisce [(anno, valore), ...] con start_year <= anno <= end_year."""
+        years, values = self._sorted_series(ticker, metric)
+        lo = bisect.bisect_left(years, start_year) if start_year is not None else 0
+        hi = bisect.bisect_right(years, end_year) if end_year is not None else len(years)
+        return list(zip(years[lo:hi], values[lo:hi]))
+
+    def latest_year(self, ticker: str, metric: str) -> Optional[int]:
+        """Ultimo anno disponibile per la metrica."""
+        years, _ = self._sorted_series(ticker, metric)
+        return years[-1] if years else None
+
+    def consecutive_positive_years(self, ticker: str, metric: str, end_year: Optional[int] = None) -> int:
+        """
+        Conta gli anni consecutivi (a ritroso da end_year o, se non indicato, dall'ultimo anno) con valore > 0.
+        Un anno mancante interrompe la serie, come un anno in perdita o senza dividendo:
+        se end_year non è nello storico il conteggio è 0 (es. dividendi sospesi da anni).
+        """
+        rows = self.get_range(ticker, metric, end_year=end_year)
+        count = 0
+        expected = end_year if end_year is not None else (rows[-1][0] if rows else None)
+        for year, value in reversed(rows):
+            if year != expected or value <= 0:
+                break
+            count += 1
+            expected = year - 1
+        return count
+
+    def eps_growth(self, ticker: str, years: int = 10) -> Tuple[float, int]:
+        """
+        Crescita dell'EPS secondo Graham: media 3 anni finali vs media 3 anni iniziali della finestra.
+        Con storico corto le medie usano meno anni (metà della finestra disponibile).
+        Restituisce (crescita_percentuale, anni_coperti); (0.0, n) se i dati non bastano.
+        """
+        last = self.latest_year(ticker, "eps")
+        if last is None:
+            return 0.0, 0
+        rows = self.get_range(ticker, "eps", start_year=last - years + 1, end_year=last)
+        span = rows[-1][0] - rows[0][0] + 1
+        k = min(3, len(rows) // 2)
+        if k == 0:
+            return 0.0, span
+        start_avg = sum(v for _, v in rows[:k]) / k
+        end_avg = sum(v for _, v in rows[-k:]) / k
+        if start_avg <= 0:
+            return 0.0, span
+        return (end_avg / start_avg - 1) * 100, span
@@ -1,7 +1,10 @@
 """Modulo per il caricamento dei dati finanziari da file JSON."""
+import glob
 import json
+import os
 from typing import Optional
 from models.data_schema import FinancialData
+from models.financial_table import FinancialDataTable
 
 def load_company_data(filepath: str) -> Optional[FinancialData]:
     """Carica un file JSON e restituisce un oggetto FinancialData."""
@@ -19,4 +22,27 @@ def load_company_data(filepath: str) -> Optional[FinancialData]:
     except TypeError as e:
         # Raised when the dict cannot be unpacked into FinancialData (wrong/missing fields)
         print(f"Errore di tipo durante la conversione in FinancialData: {e}")
-        return None
\ No newline at end of file
+        return None
+
+def build_company_table(json_folder: str, table_path: str) -> FinancialDataTable:
+    """
+    Converte una volta sola tutti i JSON aziendali di `json_folder` (es. `data/AAPL.json`)
+    in una `FinancialDataTable` salvata in `table_path`. Il nome file (senza estensione) è il ticker.
+    I file che non sono dati aziendali (es. la cache) vengono saltati.
+    """
+    records = {}
+    for filepath in sorted(glob.glob(os.path.join(json_folder, "*.json"))):
+        ticker = os.path.splitext(os.path.basename(filepath))[0]
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                records[ticker] = FinancialData(**json.load(f))
+        except (json.JSONDecodeError, TypeError):
+            continue
+    table = FinancialDataTable.from_records(records)
+    table.save(table_path)
+    print(f"💾 Tabella fondamentali salvata: {table_path} ({len(table)} aziende)")
+    return table
+
+def load_company_table(table_path: str) -> Optional[FinancialDataTable]:
+    """Apre in memory-map la tabella colonnare creata da `build_company_table`."""
+    return FinancialDataTable.load(table_path, mmap=True)
\ No newline at end of file
@@ -0,0 +1,194 @@
+##Closed-form compound interest of a savings account with periodic contributions, vectorised over its parameters
+import numpy as np
+import pandas as pd
+
+## Capitalizzazioni per anno di ogni compound_type
+COMPOUND_FREQUENCIES = {"giornaliero": 365, "mensile": 12, "annuale": 1}
+
+
+def periods_per_year(compound_type):
+    """
+    Number of compounding periods per year.
+
+    Parameters
+    ----------
+    compound_type : str or array-like of str
+        "giornaliero", "mensile" or "annuale".
+
+    Returns
+    -------
+    int or np.ndarray
+        365, 12 or 1 (same shape as `compound_type`).
+    """
+    types = np.asarray(compound_type)
+    invalid = set(types.ravel().tolist()) - set(COMPOUND_FREQUENCIES)
+    if invalid:
+        raise ValueError(f"Tipo di compound non valido: {sorted(invalid)}. Usare 'giornaliero', 'mensile', o 'annuale'")
+    frequencies = np.vectorize(COMPOUND_FREQUENCIES.get, otypes=[np.int64])(types)
+    return int(frequencies) if frequencies.ndim == 0 else frequencies
+
+
+def annuity_factor(rate, periods):
+    """
+    Future value of 1 paid at the end of each of `periods` periods: ((1 + rate)^periods - 1) / rate.
+
+    Parameters
+    ----------
+    rate : float or np.ndarray
+        Interest rate per period.
+    periods : int or np.ndarray
+        Number of periods.
+
+    Returns
+    -------
+    np.ndarray
+        The factor (equal to `periods` where the rate is 0).
+    """
+    rate, periods = np.broadcast_arrays(np.asarray(rate, dtype=float), np.asarray(periods, dtype=float))
+    # expm1/log1p restano precisi anche per tassi giornalieri molto piccoli
+    growth = np.expm1(periods * np.log1p(rate))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(rate == 0, periods, growth / np.where(rate == 0, 1, rate))
+
+
+def compound_interest(
+    initial_capital,
+    monthly_contribution,
+    years,
+    gross_rate_perc,
+    tax_perc,
+    declarative_regime=False,
+    compound_type="mensile",
+):
+    """
+    Final balance of a deposit with monthly contributions, in closed form.
+
+    The contributions of a month are spread evenly over its compounding periods
+    (12 * monthly_contribution / frequency each, paid at the end of the period),
+    so A = P (1 + r/n)^(nt) + PMT ((1 + r/n)^(nt) - 1) / (r/n).
+
+    - Regime amministrato (`declarative_regime` False): the tax is withheld on
+      every interest credit, i.e. the balance compounds at the net rate
+      r (1 - tax).
+    - Regime dichiarativo (`declarative_regime` True): the balance compounds at
+      the gross rate during the year and the tax on the year's interest is paid
+      at year end; the yearly step B' = a B + b is linear, so `years` steps are
+      B_t = a^t B_0 + b (a^t - 1) / (a - 1).
+
+    Every numeric argument (and `declarative_regime`, `compound_type`) may be an
+    array: they are broadcast together, so rate x contribution x horizon grids,
+    or the yearly schedule (years=np.arange(n + 1)), take a single call.
+
+    Parameters
+    ----------
+    initial_capital : float or np.ndarray
+        Capital at time 0.
+    monthly_contribution : float or np.ndarray
+        Amount added every month.
+    years : int or np.ndarray
+        Investment horizon in whole years.
+    gross_rate_perc : float or np.ndarray
+        Gross annual interest (2.5 for 2.5%).
+    tax_perc : float or np.ndarray
+        Tax on the interest (26 for 26%).
+    declarative_regime : bool, str or np.ndarray, optional
+        True / "yes" for the declarative regime, default False.
+    compound_type : str or np.ndarray, optional
+        "giornaliero", "mensile" (default) or "annuale".
+
+    Returns
+    -------
+    dict of np.ndarray
+        "final_capital" (net of taxes), "total_contributions", "net_interest",
+        "taxes" and "net_return_perc" (net interest over the capital paid in).
+    """
+    initial_capital = np.asarray(initial_capital, dtype=float)
+    years = np.asarray(years, dtype=float)
+    regime = np.asarray(declarative_regime)
+    declarative = regime == "yes" if regime.dtype.kind in "US" else regime.astype(bool)
+    frequency = periods_per_year(compound_type)
+    gross_rate = np.asarray(gross_rate_perc, dtype=float) / 100 / frequency
+    tax = np.asarray(tax_perc, dtype=float) / 100
+    contribution = np.asarray(monthly_contribution, dtype=float) * 12 / frequency
+
+    # Regime amministrato: capitalizzazione al tasso netto su tutto l'orizzonte
+    net_rate = gross_rate * (1 - tax)
+    administered = initial_capital * (1 + net_rate) ** (frequency * years) + contribution * annuity_factor(
+        net_rate, frequency * years
+    )
+
+    # Regime dichiarativo: un anno lordo, poi le tasse sugli interessi dell'anno
+    yearly_growth = (1 + gross_rate) ** frequency - 1
+    yearly_contributions = contribution * frequency
+    a = 1 + (1 - tax) * yearly_growth
+    b = yearly_contributions + (1 - tax) * (contribution * annuity_factor(gross_rate, frequency) - yearly_contributions)
+    a_t = a**years
+    with np.errstate(invalid="ignore", divide="ignore"):
+        geometric = np.where(a == 1, years, (a_t - 1) / np.where(a == 1, 1, a - 1))
+    declared = a_t * initial_capital + b * geometric
+
+    final_capital = np.where(declarative, declared, administered)
+    total_contributions = initial_capital + 12 * np.asarray(monthly_contribution, dtype=float) * years
+    net_interest = final_capital - total_contributions
+    with np.errstate(invalid="ignore", divide="ignore"):
+        taxes = np.where(tax < 1, net_interest * tax / (1 - tax), np.nan)
+        net_return_perc = net_interest / total_contributions * 100
+    return {
+        "final_capital": final_capital,
+        "total_contributions": np.broadcast_to(total_contributions, final_capital.shape),
+        "net_interest": net_interest,
+        "taxes": np.broadcast_to(taxes, final_capital.shape),
+        "net_return_perc": net_return_perc,
+    }
+
+
+def compound_interest_grid(
+    initial_capital,
+    monthly_contributions,
+    years,
+    gross_rates_perc,
+    tax_perc,
+    declarative_regime=False,
+    compound_type="mensile",
+):
+    """
+    Evaluate `compound_interest` on every (rate x contribution x horizon) combination.
+
+    Parameters
+    ----------
+    initial_capital : float
+        Capital at time 0.
+    monthly_contributions : array-like
+        Monthly contributions to test.
+    years : array-like of int
+        Horizons to test.
+    gross_rates_perc : array-like
+        Gross annual interests to test (2.5 for 2.5%).
+    tax_perc : float
+        Tax on the interest (26 for 26%).
+    declarative_regime : bool or str, optional
+        True / "yes" for the declarative regime, default False.
+    compound_type : str, optional
+        "giornaliero", "mensile" (default) or "annuale".
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per combination: gross_rate_perc, monthly_contribution, years
+        and the columns returned by `compound_interest`.
+    """
+    rates, contributions, horizons = np.meshgrid(
+        np.asarray(gross_rates_perc, dtype=float),
+        np.asarray(monthly_contributions, dtype=float),
+        np.asarray(years),
+        indexing="ij",
+    )
+    result = compound_interest(
+        initial_capital, contributions, horizons, rates, tax_perc, declarative_regime, compound_type
+    )
+    return pd.DataFrame({
+        "gross_rate_perc": rates.ravel(),
+        "monthly_contribution": contributions.ravel(),
+        "years": horizons.ravel(),
+        **{key: np.ravel(value) for key, value in result.items()},
+    })
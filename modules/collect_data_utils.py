@@ -1,5 +1,10 @@
+import fnmatch
+import json
+import re
+
 from modules import general_utils
 from modules.general_utils import Path, glob, os, np, pd, dt
+from modules.stats_utils import cumulative_sum, running_mean, rolling_sum, rolling_mean, ewma
 #import pandas as pd
 
 
@@ -10,12 +15,160 @@ def get_current_user():
 path = ""
 
 
-def collect_file(path, name):
+## Catalogo persistente delle cartelle lette: elenco dei file aggiornato solo quando la cartella cambia
+DEFAULT_CATALOGUE_PATH = os.path.join("data", "file_catalogue.json")
+MONTH_PATTERN = re.compile(r"(20\d{2})[-_ ]?(0[1-9]|1[0-2])")
+
+
+class FileCatalogue:
+    """
+    Persistent listing of directories: path, mtime, size and month parsed from
+    the name of every file.
+
+    A directory is listed again only when its own modification time changes
+    (a file was added, removed or renamed); otherwise the catalogue answers
+    with a single `os.stat` of the directory. Files already known keep their
+    record when their mtime and size did not change. Files rewritten in place
+    do not touch the directory mtime: `matching` re-stats the files it returns
+    (one `os.stat` each), `scan(directory, refresh=True)` re-stats them all.
+
+    Parameters
+    ----------
+    catalogue_path : str, optional
+        JSON file where the catalogue is saved, default DEFAULT_CATALOGUE_PATH.
+    """
+
+    def __init__(self, catalogue_path=DEFAULT_CATALOGUE_PATH):
+        self.catalogue_path = catalogue_path
+        self._directories = self._load()
+
+    def _load(self):
+        try:
+            with open(self.catalogue_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError):
+            return {}
+
+    def _save(self):
+        folder = os.path.dirname(self.catalogue_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(self.catalogue_path, "w", encoding="utf-8") as f:
+            json.dump(self._directories, f, indent=4)
+
+    @staticmethod
+    def parse_month(filename):
+        """First "YYYY-MM" (or YYYYMM, "YYYY_MM") found in a file name, None if absent."""
+        match = MONTH_PATTERN.search(filename)
+        return f"{match.group(1)}-{match.group(2)}" if match else None
+
+    def scan(self, directory, refresh=False):
+        """
+        Records of the files in `directory`, listing it only if it changed.
+
+        Parameters
+        ----------
+        directory : str
+            The directory to scan (not recursive).
+        refresh : bool, optional
+            List the directory and stat every file even if its mtime did not change.
+
+        Returns
+        -------
+        dict
+            file name -> {"mtime", "size", "month"}.
+        """
+        key = os.path.abspath(directory)
+        directory_mtime = os.stat(key).st_mtime_ns
+        entry = self._directories.get(key)
+        if entry is not None and entry["mtime_ns"] == directory_mtime and not refresh:
+            return entry["files"]
+
+        known = entry["files"] if entry is not None else {}
+        files = {}
+        with os.scandir(key) as listing:
+            for item in listing:
+                if not item.is_file():
+                    continue
+                stat = item.stat()
+                record = known.get(item.name)
+                if record is None or record["mtime"] != stat.st_mtime or record["size"] != stat.st_size:
+                    record = {"mtime": stat.st_mtime, "size": stat.st_size, "month": self.parse_month(item.name)}
+                files[item.name] = record
+        self._directories[key] = {"mtime_ns": directory_mtime, "files": files}
+        self._save()
+        return files
+
+    def matching(self, directory, pattern, refresh=False):
+        """
+        Files of `directory` whose name matches a glob `pattern`, newest first.
+
+        Parameters
+        ----------
+        directory : str
+            The directory to scan.
+        pattern : str
+            Shell-style pattern of the file names, e.g. "*202*-Reddito.csv".
+        refresh : bool, optional
+            Force a full rescan of the directory.
+
+        Returns
+        -------
+        list of str
+            The paths, sorted by modification time in descending order.
+        """
+        files = self.scan(directory, refresh=refresh)
+        names = fnmatch.filter(files, pattern)
+        # File riscritti sul posto: la cartella non cambia mtime, si rileggono quelli selezionati
+        changed = False
+        for name in names:
+            try:
+                stat = os.stat(os.path.join(directory, name))
+            except FileNotFoundError:
+                del files[name]
+                changed = True
+                continue
+            record = files[name]
+            if record["mtime"] != stat.st_mtime or record["size"] != stat.st_size:
+                record.update(mtime=stat.st_mtime, size=stat.st_size)
+                changed = True
+        if changed:
+            self._save()
+        names = [name for name in names if name in files]
+        names.sort(key=lambda name: files[name]["mtime"], reverse=True)
+        return [os.path.join(directory, name) for name in names]
+
+    def to_frame(self, directory):
+        """The catalogue of a directory as a DataFrame (path, mtime, size, month)."""
+        files = self.scan(directory)
+        frame = pd.DataFrame.from_dict(files, orient="index", columns=["mtime", "size", "month"])
+        frame.index = [os.path.join(directory, name) for name in frame.index]
+        frame.index.name = "path"
+        frame["mtime"] = pd.to_datetime(frame["mtime"], unit="s")
+        return frame
+
+
+_default_catalogue = None
+
+
+def get_default_file_catalogue():
+    """Return the process-wide FileCatalogue (created on first use)."""
+    global _default_catalogue
+    if _default_catalogue is None:
+        _default_catalogue = FileCatalogue()
+    return _default_catalogue
+
+
+def collect_file(path, name, refresh=False):
     """
     Collect files from the given path that match the given name, 
     sort them by modification time in descending order and return
     the sorted list of files and the number of files found.
 
+    The directory listing comes from the file catalogue, so it is read
+    again only when the directory changes; the matched files are re-stated
+    on every call, so files rewritten in place are ordered by their new mtime.
+
     Parameters
     ----------
 
@@ -23,6 +176,8 @@ def collect_file(path, name):
         The path to the directory containing the files to collect.
     name : str
         The name of the files to collect, without extension.
+    refresh : bool, optional
+        Force a new listing of the directory, default False.
 
     Returns
     -------
@@ -32,11 +187,8 @@ def collect_file(path, name):
     int
         The number of collected files.
     """
-    filenames = glob.iglob(path + f"/*202*-{name}.csv", recursive=True)
-    filenames = sorted(filenames, key=os.path.getmtime, reverse=True)
-    number_sample = sum(1 for _ in filenames)
-    return filenames, number_sample
-
+    filenames = get_default_file_catalogue().matching(path, f"*202*-{name}.csv", refresh=refresh)
+    return filenames, len(filenames)
 
 
 def collect_numb_sample(path,file_name):
@@ -61,11 +213,110 @@ def collect_numb_sample(path,file_name):
     filenames, number_sample = collect_file(path, file_name)
     return number_sample
 
+## Cache dei file di budget già letti: filename -> (mtime_ns, size, Series descrizione -> valore)
+_BUDGET_FILE_CACHE = {}
+
+
+def parse_euro_amounts(values):
+    """
+    Convert Euro-formatted amounts ("1.234,56 €") to floats, in vectorised form.
+
+    Parameters
+    ----------
+
+    values : pd.Series
+        The amounts as strings.
+
+    Returns
+    -------
+
+    pd.Series
+        The amounts as floats, NaN where the string is not a number.
+    """
+    normalized = (
+        values.astype(str)
+        .str.replace("€", "", regex=False)
+        .str.replace(".", "", regex=False)
+        .str.replace(",", ".", regex=False)
+        .str.strip()
+    )
+    return pd.to_numeric(normalized, errors="coerce")
+
+
+def read_budget_file(filename):
+    """
+    Read a budget CSV ("descrizione;valore" with a header line) once and keep it
+    in memory until the file changes (modification time or size).
+
+    Parameters
+    ----------
+
+    filename : str
+        The path of the CSV file.
+
+    Returns
+    -------
+
+    pd.DataFrame
+        Indexed by description (first occurrence kept), with the raw string
+        "text" and the parsed float "value" (NaN if not a number).
+    """
+    stat = os.stat(filename)
+    cached = _BUDGET_FILE_CACHE.get(filename)
+    if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    raw = pd.read_csv(
+        filename,
+        sep=";",
+        skiprows=1,
+        header=None,
+        names=["description", "text"],
+        dtype=str,
+        quoting=3,  # csv.QUOTE_NONE: campi letti così come sono, come nello split(";")
+        keep_default_na=False,
+        encoding="utf-8",
+    )
+    raw["text"] = raw["text"].str.strip()
+    table = raw.drop_duplicates("description", keep="first").set_index("description")
+    table["value"] = parse_euro_amounts(table["text"])
+    _BUDGET_FILE_CACHE[filename] = (stat.st_mtime_ns, stat.st_size, table)
+    return table
+
+
+def collect_budget_table(filenames):
+    """
+    Build the (file, description) -> value table of several budget files,
+    parsing only the files not already cached.
+
+    Parameters
+    ----------
+
+    filenames : list of str
+        The CSV files, in the wanted row order.
+
+    Returns
+    -------
+
+    pd.DataFrame
+        One row per file, one column per description, float values
+        (NaN where the description is missing or not a number).
+    """
+    if not filenames:
+        return pd.DataFrame()
+    return pd.DataFrame(
+        [read_budget_file(filename)["value"] for filename in filenames],
+        index=pd.Index(filenames, name="file"),
+    )
+
+
 def collect_data_from_list_csv(path, multiple_files, file_name, wanted_regexp, scaling_factor):
     """
     Collects data from CSV files in the specified path that match the given file name
     and description, and scales the collected values by the scaling factor.
 
+    Every file is parsed once and cached (see `read_budget_file`), so asking for
+    many descriptions of the same files does not read them again.
+
     Parameters
     ----------
 
@@ -96,25 +347,16 @@ def collect_data_from_list_csv(path, multiple_files, file_name, wanted_regexp, s
         filenames = [file_name] #List of a single file
     
     print(f"{filenames}")
-    
-    data = []
 
+    data = []
     for filename in filenames:
-        with open(filename, "r", encoding="utf-8") as f:
-            next(f)  # Skip header
-            for line in f:
-                desc, value = line.strip().split(";")
-                if desc == wanted_regexp:
-                    value = value.replace("€", "").replace(".", "").replace(",", ".").strip()
-                    try:
-                        value = float(value) * scaling_factor
-                    except ValueError:
-                        print(f"Impossibile convertire {value} in float.")
-                    else:
-                        data.append(value)
-                    break
-            else:
-                print(f"Nessun valore trovato per {wanted_regexp} in {filename}.")
+        table = read_budget_file(filename)
+        if wanted_regexp not in table.index:
+            print(f"Nessun valore trovato per {wanted_regexp} in {filename}.")
+        elif np.isnan(table.at[wanted_regexp, "value"]):
+            print(f"Impossibile convertire {table.at[wanted_regexp, 'text']} in float.")
+        else:
+            data.append(table.at[wanted_regexp, "value"] * scaling_factor)
     return np.array(data)
 
 def collect_data_from_csv(path, multiple_files, file_name, wanted_regexp, scaling_factor=1):
@@ -150,10 +392,27 @@ def collect_data_from_csv(path, multiple_files, file_name, wanted_regexp, scalin
     )
     return data
 
+## Colonne dell'export Bitpanda: posizione -> (nome restituito, dtype)
+BITPANDA_COLUMNS = {
+    0: ("trans_id_collect", "string"),
+    1: ("date_collect", "string"),
+    2: ("trans_type_collect", "category"),
+    4: ("amount_fiat_collect", "float64"),
+    6: ("amount_asset_collect", "float64"),
+    7: ("asset_collect", "category"),
+    8: ("asset_market_price_collect", "float64"),
+    12: ("fee_asset_collect", "float64"),
+}
+
+
 def collect_bitpanda_data(filepath):
     """
     Collects specific data from a Bitpanda CSV file.
 
+    Only the needed columns are read (by position), with their types set at
+    read time: numbers as float64 ("-" and empty cells become NaN), asset and
+    transaction type as categoricals, the timestamp as a UTC datetime.
+
     Parameters
     ----------
 
@@ -163,51 +422,48 @@ def collect_bitpanda_data(filepath):
     Returns
     -------
 
-    dict
-        A dictionary containing the collected data.
+    pd.DataFrame
+        One row per transaction, with the columns of BITPANDA_COLUMNS
+        (empty if the file cannot be read).
     """
+    positions = sorted(BITPANDA_COLUMNS)
+    names = [BITPANDA_COLUMNS[p][0] for p in positions]
+    dtypes = {BITPANDA_COLUMNS[p][0]: BITPANDA_COLUMNS[p][1] for p in positions}
+    read_options = dict(skiprows=7, header=None, usecols=positions, names=names, na_values=["-"])
     try:
-        df = pd.read_csv(filepath, skiprows=6)
+        df = pd.read_csv(filepath, dtype=dtypes, **read_options)
     except pd.errors.EmptyDataError:
         print(f"Error: The file {filepath} does not have enough rows to skip.")
-        return {}
-
-    # Lookup table for column indices
-    column_lut = {
-        "Transaction ID": 0,
-        "Timestamp": 1,
-        "Transaction Type": 2,
-        "Amount Fiat": 4,
-        "Amount Asset": 6,
-        "Asset": 7,
-        "Asset market price": 8,
-        "Fee": 12
-    }
-
-    data_to_retrieve = [
-        ("trans_id_collect", "Transaction ID"),
-        ("date_collect", "Timestamp"),
-        ("trans_type_collect", "Transaction Type"),
-        ("asset_collect", "Asset"),
-        ("amount_fiat_collect", "Amount Fiat"),
-        ("amount_asset_collect", "Amount Asset"),
-        ("asset_market_price_collect", "Asset market price"),
-        ("fee_asset_collect", "Fee"),
-    ]
-    
-    collected_data = {key: [] for key, _ in data_to_retrieve}
-    
-    for _, row in df.iterrows():
-        for key, column_name in data_to_retrieve:
-            column_index = column_lut[column_name]
-            collected_data[key].append(row[column_index])
-    
-    return collected_data
+        return pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in dtypes.items()})
+    except ValueError:
+        # Un valore non numerico inatteso: lettura come testo e conversione forzata
+        df = pd.read_csv(filepath, dtype=str, **read_options)
+        for name, dtype in dtypes.items():
+            if dtype == "float64":
+                df[name] = pd.to_numeric(df[name], errors="coerce")
+        df = df.astype({name: dtype for name, dtype in dtypes.items() if dtype != "float64"})
+
+    df["date_collect"] = pd.to_datetime(df["date_collect"], utc=True, errors="coerce")
+    return df
+
 
 def sort_data_by_asset(data):
-    sorted_data = {key: [] for key in data}
-    sorted_indices = sorted(range(len(data['asset_collect'])), key=lambda k: data['asset_collect'][k])
-    for i in sorted_indices:
-        for key in data:
-            sorted_data[key].append(data[key][i])
-    return sorted_data
+    """
+    Sort the transactions by asset, keeping the original order within each asset.
+
+    Parameters
+    ----------
+
+    data : pd.DataFrame or dict
+        Output of `collect_bitpanda_data` (or a dict of equally long lists).
+
+    Returns
+    -------
+
+    pd.DataFrame or dict
+        The sorted data, of the same type as `data`.
+    """
+    if isinstance(data, pd.DataFrame):
+        return data.sort_values("asset_collect", kind="stable").reset_index(drop=True)
+    ordered = pd.DataFrame(data).sort_values("asset_collect", kind="stable")
+    return {key: ordered[key].tolist() for key in data}
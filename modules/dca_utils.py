@@ -0,0 +1,296 @@
+##Vectorised Dollar Cost Averaging (DCA) backtest on daily price arrays
+import warnings
+
+import numpy as np
+import pandas as pd
+
+
+def ffill_array(values):
+    """
+    Forward-fill NaN values along the first axis of a 1-D or 2-D array.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Array of shape (n_days,) or (n_days, n_series).
+
+    Returns
+    -------
+    np.ndarray
+        A copy where every NaN takes the last valid value above it
+        (leading NaN stay NaN).
+    """
+    values = np.asarray(values, dtype=float)
+    positions = np.arange(values.shape[0]).reshape((-1,) + (1,) * (values.ndim - 1))
+    last_valid = np.where(np.isnan(values), 0, positions)
+    np.maximum.accumulate(last_valid, axis=0, out=last_valid)
+    return np.take_along_axis(values, last_valid, axis=0)
+
+
+def purchase_positions(daily_index, purchase_dates):
+    """
+    Return the positions of the purchase dates inside the daily calendar.
+
+    Parameters
+    ----------
+    daily_index : pd.DatetimeIndex
+        Daily calendar of the backtest.
+    purchase_dates : pd.DatetimeIndex
+        Dates on which a purchase is made.
+
+    Returns
+    -------
+    np.ndarray
+        Integer positions (dates outside the calendar are dropped).
+    """
+    positions = daily_index.get_indexer(purchase_dates)
+    return positions[positions >= 0]
+
+
+def simulate_dca(prices, purchase_mask, purchase_amount):
+    """
+    Backtest a DCA schedule with cumulative sums over the daily price array.
+
+    All inputs broadcast along the first (day) axis, so several schedules,
+    amounts or symbols can be evaluated at once with 2-D arrays.
+
+    Parameters
+    ----------
+    prices : np.ndarray
+        Daily prices, shape (n_days,) or (n_days, n_series).
+    purchase_mask : np.ndarray of bool
+        True on purchase days, broadcastable to `prices`.
+    purchase_amount : float or np.ndarray
+        Capital spent on each purchase, broadcastable to `prices`.
+
+    Returns
+    -------
+    dict of np.ndarray
+        "price", "shares_bought", "total_shares", "total_investment",
+        "average_cost", "market_value", "daily_gain", "daily_gain_perc".
+        Days before the first purchase are NaN.
+    """
+    prices = np.asarray(prices, dtype=float)
+    purchase_mask = np.broadcast_to(purchase_mask, np.broadcast_shapes(np.shape(purchase_mask), prices.shape))
+    amounts = np.where(purchase_mask, purchase_amount, 0.0)
+
+    # Un prezzo mancante o nullo non compra quote, ma il capitale risulta comunque investito
+    can_buy = purchase_mask & (np.nan_to_num(prices) > 0)
+    shares_bought = np.divide(amounts, prices, out=np.zeros(amounts.shape), where=can_buy)
+
+    total_shares = np.cumsum(shares_bought, axis=0)
+    total_investment = np.cumsum(amounts, axis=0)
+    started = np.cumsum(purchase_mask, axis=0) > 0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        average_cost = np.where(total_shares > 0, total_investment / total_shares, 0.0)
+        market_value = ffill_array(prices) * total_shares
+        daily_gain = market_value - total_investment
+        daily_gain_perc = daily_gain / total_investment * 100
+
+    result = {
+        "price": prices,
+        "shares_bought": shares_bought,
+        "total_shares": total_shares,
+        "total_investment": total_investment,
+        "average_cost": average_cost,
+        "market_value": market_value,
+        "daily_gain": daily_gain,
+        "daily_gain_perc": daily_gain_perc,
+    }
+    for key in result:
+        if key not in ("price", "shares_bought"):
+            result[key] = np.where(started, result[key], np.nan)
+    return result
+
+
+def dca_purchase_dates(start_date, end_date, purchase_frequency):
+    """
+    Purchase calendar of a DCA plan (same convention as `pd.date_range`).
+
+    Parameters
+    ----------
+    start_date, end_date : str or datetime-like
+        First and last day of the plan.
+    purchase_frequency : str
+        Pandas frequency string, e.g. "1M", "3M", "W".
+
+    Returns
+    -------
+    pd.DatetimeIndex
+        The purchase dates.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', FutureWarning)
+        return pd.date_range(start_date, end_date, freq=purchase_frequency)
+
+
+def max_drawdown(values):
+    """
+    Maximum drawdown (%) along the first axis, ignoring NaN.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Series of shape (n_days,) or (n_days, n_series).
+
+    Returns
+    -------
+    np.ndarray or float
+        Largest drop from a running peak, in percent (0 = never below the peak).
+    """
+    filled = np.nan_to_num(ffill_array(values), nan=-np.inf)
+    running_peak = np.maximum.accumulate(filled, axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdown = np.where(running_peak > 0, 1 - filled / running_peak, 0.0)
+    return np.nanmax(drawdown, axis=0) * 100
+
+
+def money_weighted_irr(cash_out, days_to_end, final_value, iterations=80):
+    """
+    Annual internal rate of return of a purchase schedule, solved by bisection
+    for every column at once.
+
+    Parameters
+    ----------
+    cash_out : np.ndarray
+        Capital invested on each day, shape (n_days, n_series).
+    days_to_end : np.ndarray
+        Days from each row to the valuation date, shape (n_days,).
+    final_value : np.ndarray
+        Market value at the valuation date, shape (n_series,).
+    iterations : int, optional
+        Bisection steps (80 halves the bracket below float precision).
+
+    Returns
+    -------
+    np.ndarray
+        IRR in percent per year; NaN where nothing was invested, where every
+        payment falls on the valuation date, or where the root lies outside
+        the (-99.99%, +1000%) bracket.
+    """
+    ## Solo i giorni con almeno un versamento contribuiscono alla somma
+    active = cash_out.any(axis=1)
+    cash_out = cash_out[active]
+    years = (np.asarray(days_to_end, dtype=float)[active] / 365.25)[:, None]
+    low = np.full(final_value.shape, -0.9999)
+    high = np.full(final_value.shape, 10.0)
+    # Senza versamenti prima della valutazione, o con f(low) e f(high) dello stesso segno, non c'è radice
+    solvable = ((cash_out > 0) & (years > 0)).any(axis=0)
+    with np.errstate(over="ignore", invalid="ignore"):
+        f_low = (cash_out * (1 + low) ** years).sum(axis=0) - final_value
+        f_high = (cash_out * (1 + high) ** years).sum(axis=0) - final_value
+    solvable &= (f_low <= 0) & (f_high >= 0)
+    # Il valore finale dei versamenti cresce con il tasso: la radice è unica
+    for _ in range(iterations):
+        mid = (low + high) / 2
+        grown = (cash_out * (1 + mid) ** years).sum(axis=0)
+        too_low = grown < final_value
+        low = np.where(too_low, mid, low)
+        high = np.where(too_low, high, mid)
+    irr = (low + high) / 2 * 100
+    return np.where((cash_out.sum(axis=0) > 0) & solvable, irr, np.nan)
+
+
+def sweep_dca_strategies(price_series, frequencies, start_dates, amounts, end_date):
+    """
+    Evaluate every (symbol x frequency x start date x amount) DCA plan in one pass.
+
+    For each symbol the plans become the columns of a 2-D purchase matrix over
+    the daily calendar, so all of them are simulated by a single `simulate_dca` call.
+
+    Parameters
+    ----------
+    price_series : dict
+        symbol -> daily prices (pd.Series, or a DataFrame with a "stock_price" column),
+        indexed by date (DatetimeIndex or "%Y-%m-%d" strings).
+    frequencies : list of str
+        Pandas frequency strings of the purchase calendars.
+    start_dates : list of str
+        First day of each plan.
+    amounts : list of float
+        Total capital of each plan, split evenly across its purchases.
+    end_date : str
+        Valuation date (last day of every plan).
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per plan: symbol, frequency, start_date, amount, n_purchases,
+        final_average_cost, final_shares, final_market_value, total_return_perc,
+        max_drawdown_perc (on market value / invested capital) and irr_perc.
+        Purchases on days without a quote (weekends, holidays) use the last
+        available price; purchases before the first quote are skipped and their
+        capital is not counted as invested.
+    """
+    plans = [(f, s, a) for f in frequencies for s in start_dates for a in amounts]
+    first_day = min(pd.Timestamp(s) for s in start_dates)
+    daily_dates = pd.date_range(first_day, end_date, freq="D")
+    days_to_end = (daily_dates[-1] - daily_dates).days.to_numpy()
+
+    ## Il calendario di acquisto dipende solo da (frequenza, data di inizio)
+    purchase_mask = np.zeros((len(daily_dates), len(plans)), dtype=bool)
+    purchase_amount = np.zeros(len(plans))
+    calendars = {}
+    for col, (freq, start, amount) in enumerate(plans):
+        if (freq, start) not in calendars:
+            calendars[(freq, start)] = purchase_positions(daily_dates, dca_purchase_dates(start, end_date, freq))
+        positions = calendars[(freq, start)]
+        purchase_mask[positions, col] = True
+        purchase_amount[col] = amount / len(positions) if len(positions) else 0.0
+
+    rows = []
+    for symbol, series in price_series.items():
+        if isinstance(series, pd.DataFrame):
+            series = series["stock_price"]
+        if not isinstance(series.index, pd.DatetimeIndex):
+            series = series.set_axis(pd.to_datetime(series.index))
+        # Nei giorni senza quotazione si compra all'ultimo prezzo disponibile
+        series = series.dropna()
+        series = series[~series.index.duplicated(keep="last")].sort_index()
+        prices = series.reindex(daily_dates, method="ffill").to_numpy(dtype=float)
+        symbol_mask = purchase_mask & (np.nan_to_num(prices) > 0)[:, None]
+
+        dca = simulate_dca(prices[:, None], symbol_mask, purchase_amount)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            value_ratio = dca["market_value"] / dca["total_investment"]
+        drawdown = max_drawdown(value_ratio)
+        cash_out = np.where(symbol_mask, purchase_amount, 0.0)
+        irr = money_weighted_irr(cash_out, days_to_end, np.nan_to_num(dca["market_value"][-1]))
+
+        rows.append(pd.DataFrame({
+            "symbol": symbol,
+            "frequency": [p[0] for p in plans],
+            "start_date": [p[1] for p in plans],
+            "amount": [p[2] for p in plans],
+            "n_purchases": symbol_mask.sum(axis=0),
+            "final_average_cost": dca["average_cost"][-1],
+            "final_shares": dca["total_shares"][-1],
+            "final_market_value": dca["market_value"][-1],
+            "total_return_perc": dca["daily_gain_perc"][-1],
+            "max_drawdown_perc": drawdown,
+            "irr_perc": irr,
+        }))
+    return pd.concat(rows, ignore_index=True)
+
+
+def best_strategy_by_symbol(sweep_results, metric="irr_perc", ascending=False):
+    """
+    Pick, for every symbol, the plan with the best value of `metric`.
+
+    Parameters
+    ----------
+    sweep_results : pd.DataFrame
+        Table returned by `sweep_dca_strategies`.
+    metric : str, optional
+        Column to rank by, default "irr_perc".
+    ascending : bool, optional
+        True when lower is better (e.g. "final_average_cost"), default False.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per symbol.
+    """
+    ranked = sweep_results.dropna(subset=[metric]).sort_values(metric, ascending=ascending, kind="stable")
+    return ranked.groupby("symbol", sort=False).head(1).reset_index(drop=True)
@@ -0,0 +1,303 @@
+##Incremental technical indicators (SMA, EMA, OBV) kept next to the cached price series
+import json
+import os
+import re
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from modules.price_store_utils import get_default_price_store, read_frame, write_frame
+
+## Indicator names encode their parameters: "SMA200", "EMA20", "OBV"
+INDICATOR_PATTERN = re.compile(r"^(SMA|EMA)(\d+)$|^OBV$")
+
+
+def parse_indicator(name):
+    """
+    Split an indicator name into (kind, period).
+
+    Parameters
+    ----------
+    name : str
+        "SMA<n>", "EMA<n>" or "OBV".
+
+    Returns
+    -------
+    tuple
+        ("SMA" | "EMA" | "OBV", int or None)
+    """
+    match = INDICATOR_PATTERN.match(name)
+    if match is None:
+        raise ValueError(f"Unsupported indicator: {name}. Use SMA<n>, EMA<n> or OBV")
+    if name == "OBV":
+        return "OBV", None
+    return match.group(1), int(match.group(2))
+
+
+## --- Single-step updates: (new bars, previous state) -> (values, next state) ---
+def sma_update(closes, state, period):
+    """Simple moving average of the new closes, given the last `period - 1` closes."""
+    tail = np.asarray(state.get("tail", []), dtype=float)
+    extended = np.concatenate([tail, closes])
+    values = pd.Series(extended).rolling(window=period).mean().to_numpy()[len(tail):]
+    return values, {"tail": extended[len(extended) - (period - 1):].tolist() if period > 1 else []}
+
+
+def ema_update(closes, state, period):
+    """Exponential moving average (span=period, adjust=False) continued from the last value."""
+    previous = state.get("value")
+    if previous is None:
+        values = pd.Series(closes).ewm(span=period, adjust=False).mean().to_numpy()
+    else:
+        extended = np.concatenate([[previous], closes])
+        values = pd.Series(extended).ewm(span=period, adjust=False).mean().to_numpy()[1:]
+    return values, {"value": float(values[-1]) if len(values) else previous}
+
+
+def obv_update(closes, volumes, state):
+    """Cumulative On Balance Volume continued from the last close and OBV value."""
+    if len(closes) == 0:
+        return np.empty(0), state
+    previous_close = state.get("last_close")
+    extended = np.concatenate([[closes[0] if previous_close is None else previous_close], closes])
+    direction = np.nan_to_num(np.sign(np.diff(extended)))
+    values = state.get("value", 0.0) + np.cumsum(direction * np.nan_to_num(volumes))
+    return values, {"last_close": float(closes[-1]), "value": float(values[-1])}
+
+
+def compute_indicators(bars, indicators, state=None):
+    """
+    Compute indicators over `bars`, continuing from `state` when given.
+
+    Parameters
+    ----------
+    bars : pd.DataFrame
+        OHLCV bars with "Close" and "Volume" columns.
+    indicators : list of str
+        Indicator names ("SMA200", "EMA20", "OBV", ...).
+    state : dict, optional
+        Per-indicator state returned by a previous call on the preceding bars.
+
+    Returns
+    -------
+    (pd.DataFrame, dict)
+        The indicator values indexed like `bars`, and the state after the last bar.
+    """
+    state = state or {}
+    closes = bars["Close"].to_numpy(dtype=float)
+    volumes = bars["Volume"].to_numpy(dtype=float)
+    columns, next_state = {}, {}
+    for name in indicators:
+        kind, period = parse_indicator(name)
+        if kind == "SMA":
+            columns[name], next_state[name] = sma_update(closes, state.get(name, {}), period)
+        elif kind == "EMA":
+            columns[name], next_state[name] = ema_update(closes, state.get(name, {}), period)
+        else:
+            columns[name], next_state[name] = obv_update(closes, volumes, state.get(name, {}))
+    return pd.DataFrame(columns, index=bars.index), next_state
+
+
+def reset_at_gap(state):
+    """State to carry across a hole in the stored history: windows restart, OBV keeps its level."""
+    next_state = {}
+    for name, indicator_state in state.items():
+        if parse_indicator(name)[0] == "OBV":
+            next_state[name] = {"value": indicator_state.get("value", 0.0)}
+        else:
+            next_state[name] = {}
+    return next_state
+
+
+class IndicatorEngine:
+    """
+    Indicators of the symbols held in a PriceStore, updated in O(new bars).
+
+    For each symbol the engine saves the indicator series next to the price file
+    and the rolling state (SMA window tail, last EMA, last close and OBV) reached
+    at the second-to-last bar. An update resumes from that state, so only the
+    new bars plus the last one (today's bar may have been revised) are processed.
+    The state also records the row count and a checksum of the bars up to the
+    resume date: when bars are inserted into an older hole, or the store
+    downloaded the symbol again, everything is recomputed. The same happens when
+    older history is prepended or new indicators are requested.
+
+    Windows never span a hole in the store coverage: at each gap SMA and EMA
+    restart and OBV continues from its last level.
+
+    Parameters
+    ----------
+    price_store : PriceStore, optional
+        Store holding the bars, default the process-wide store.
+    """
+
+    STATE_FILE = "_indicator_state.json"
+    SUFFIX = ".indicators"
+
+    def __init__(self, price_store=None):
+        self.price_store = price_store or get_default_price_store()
+        self._state = self._load_state()
+        self._frames = {}
+
+    def _state_path(self):
+        return os.path.join(self.price_store.store_dir, self.STATE_FILE)
+
+    def _load_state(self):
+        try:
+            with open(self._state_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError):
+            return {}
+
+    def _save_state(self):
+        with open(self._state_path(), "w", encoding="utf-8") as f:
+            json.dump(self._state, f, indent=4)
+
+    def _load_frame(self, symbol):
+        if symbol not in self._frames:
+            path = self.price_store.symbol_path(symbol, self.SUFFIX)
+            self._frames[symbol] = read_frame(path) if os.path.exists(path) else None
+        return self._frames[symbol]
+
+    @staticmethod
+    def _fingerprint(last_bar):
+        """Date, close and volume of a one-row bar frame (to detect a revised last bar)."""
+        return [
+            last_bar.index[0].strftime("%Y-%m-%d"),
+            float(last_bar["Close"].iloc[0]),
+            float(last_bar["Volume"].iloc[0]),
+        ]
+
+    @staticmethod
+    def _checksum(bars):
+        """CRC of the dates, closes and volumes of `bars`."""
+        dates = np.asarray(bars.index.values, dtype="datetime64[ns]").view("i8")
+        crc = zlib.crc32(dates.tobytes())
+        crc = zlib.crc32(bars["Close"].to_numpy(dtype=float).tobytes(), crc)
+        return zlib.crc32(bars["Volume"].to_numpy(dtype=float).tobytes(), crc)
+
+    def _segments(self, symbol, bars):
+        """Label each bar with the run of store coverage it belongs to (a new label after each gap)."""
+        dates = np.asarray(bars.index.values, dtype="datetime64[ns]")
+        breaks = []
+        intervals = self.price_store.covered_intervals(symbol)
+        for (_, hole_start), (hole_end, _) in zip(intervals[:-1], intervals[1:]):
+            ## Un buco di soli weekend non interrompe le finestre
+            if pd.bdate_range(hole_start, hole_end - pd.Timedelta(days=1)).empty:
+                continue
+            ## Il buco cade dove i bar sono più distanti (ai bordi ci sono i bar di sovrapposizione)
+            lo = max(int(np.searchsorted(dates, np.datetime64(hole_start, "ns"))), 1)
+            hi = min(int(np.searchsorted(dates, np.datetime64(hole_end, "ns"))), len(dates) - 1)
+            if lo <= hi:
+                candidates = np.arange(lo, hi + 1)
+                breaks.append(candidates[np.argmax(dates[candidates] - dates[candidates - 1])])
+        segments = np.zeros(len(dates), dtype=int)
+        segments[breaks] = 1
+        return np.cumsum(segments)
+
+    @staticmethod
+    def _compute_segments(bars, segments, names, state, previous_segment):
+        """compute_indicators over `bars`, resetting the state where the coverage segment changes."""
+        if bars.empty:
+            return bars.iloc[:0][[]], state, previous_segment
+        parts = []
+        bounds = [0, *(np.flatnonzero(np.diff(segments)) + 1), len(bars)]
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            if previous_segment is not None and segments[start] != previous_segment:
+                state = reset_at_gap(state)
+            values, state = compute_indicators(bars.iloc[start:stop], names, state)
+            parts.append(values)
+            previous_segment = segments[start]
+        return pd.concat(parts), state, previous_segment
+
+    def update(self, symbol, indicators=("SMA200", "OBV")):
+        """
+        Bring the indicators of `symbol` up to date with its stored bars.
+
+        Parameters
+        ----------
+        symbol : str
+            The ticker symbol (its bars must already be in the price store).
+        indicators : iterable of str, optional
+            Indicator names, default ("SMA200", "OBV").
+
+        Returns
+        -------
+        pd.DataFrame
+            The requested indicators over the whole stored history.
+        """
+        indicators = list(indicators)
+        bars = self.price_store.load(symbol)
+        if bars.empty:
+            return pd.DataFrame(columns=indicators, index=bars.index, dtype=float)
+
+        entry = self._state.get(symbol)
+        frame = self._load_frame(symbol)
+        first_date = bars.index[0].strftime("%Y-%m-%d")
+        segments = self._segments(symbol, bars)
+        resumable = (
+            entry is not None
+            and frame is not None
+            and entry["first_date"] == first_date
+            and set(indicators) <= set(entry["indicators"])
+            and "rows" in entry
+        )
+        if resumable:
+            committed = pd.Timestamp(entry["resume_date"])
+            rows = int((bars.index <= committed).sum())
+            ## Barre inserite o riscaricate prima di resume_date: lo stato non vale più
+            resumable = rows == entry["rows"] and self._checksum(bars.iloc[:rows]) == entry["checksum"]
+        if resumable:
+            names = entry["indicators"]
+            kept = frame.loc[frame.index <= committed]
+            new_bars = bars.iloc[rows:]
+            new_segments = segments[rows:]
+            state = entry["state"]
+            previous_segment = segments[rows - 1]
+            ## Nessun bar nuovo e ultimo bar invariato: nulla da ricalcolare
+            if len(new_bars) == 1 and entry.get("last_bar") == self._fingerprint(new_bars):
+                return frame[indicators]
+        else:
+            names = sorted(set(indicators) | set(entry["indicators"] if entry else []))
+            kept, new_bars, new_segments, state, previous_segment = None, bars, segments, {}, None
+
+        if not new_bars.empty:
+            ## Lo stato salvato si ferma al penultimo bar: l'ultimo può ancora cambiare
+            settled, state, previous_segment = self._compute_segments(
+                new_bars.iloc[:-1], new_segments[:-1], names, state, previous_segment
+            )
+            last, _, _ = self._compute_segments(new_bars.iloc[-1:], new_segments[-1:], names, state, previous_segment)
+            parts = [p for p in (kept, settled, last) if p is not None and not p.empty]
+            frame = pd.concat(parts)
+            resume_date = settled.index[-1] if not settled.empty else (kept.index[-1] if kept is not None and not kept.empty else None)
+
+            write_frame(frame, self.price_store.symbol_path(symbol, self.SUFFIX))
+            self._frames[symbol] = frame
+            if resume_date is None:
+                ## Un solo bar in tutto lo storico: nessuno stato da riprendere
+                self._state.pop(symbol, None)
+            else:
+                rows = int((bars.index <= resume_date).sum())
+                self._state[symbol] = {
+                    "first_date": first_date,
+                    "resume_date": resume_date.strftime("%Y-%m-%d"),
+                    "rows": rows,
+                    "checksum": self._checksum(bars.iloc[:rows]),
+                    "indicators": names,
+                    "state": state,
+                    "last_bar": self._fingerprint(new_bars.iloc[-1:]),
+                }
+            self._save_state()
+        return frame[indicators]
+
+
+_default_engine = None
+
+
+def get_default_indicator_engine():
+    """Return the process-wide IndicatorEngine on the default PriceStore (created on first use)."""
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = IndicatorEngine()
+    return _default_engine
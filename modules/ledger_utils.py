@@ -0,0 +1,334 @@
+##Persistent per-asset cost-basis ledger (FIFO and average cost) fed incrementally by broker exports
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from modules.price_store_utils import read_frame, write_frame, FRAME_EXTENSION
+
+DEFAULT_LEDGER_DIR = os.path.join("data", "ledger")
+## Schema comune delle transazioni, qualunque sia il broker
+TRANSACTION_COLUMNS = ["transaction_id", "timestamp", "asset", "side", "quantity", "amount", "source"]
+## "deposit" entra come un acquisto al prezzo indicato, "withdrawal" esce al costo (nessun realizzo)
+LEDGER_SIDES = ("buy", "sell", "deposit", "withdrawal")
+## Residui di quantità sotto questa soglia sono errori di arrotondamento
+QUANTITY_EPSILON = 1e-12
+
+## Colonne della sezione "Dettaglio eseguiti" (report italiano) e "Trades" (report inglese) di MEXEM/IBKR
+MEXEM_TRADE_COLUMNS = {
+    "discriminator": ("DataDiscriminator",),
+    "asset": ("Simbolo", "Symbol"),
+    "timestamp": ("Data/Ora", "Date/Time"),
+    "quantity": ("Quantità", "Quantity"),
+    "price": ("Prezzo T.", "T. Price"),
+    "fee": ("Comm/Tariffa", "Comm/Fee"),
+    "category": ("Categoria asset", "Asset Category"),
+}
+## Categorie di asset che non sono posizioni (conversioni di valuta)
+MEXEM_EXCLUDED_CATEGORIES = ("Forex", "Valute")
+
+
+def _to_utc_naive(values):
+    """Timestamps as naive UTC datetimes (naive input is taken as UTC)."""
+    return pd.to_datetime(values, utc=True, errors="coerce").dt.tz_convert(None)
+
+
+def bitpanda_transactions(bitpanda_data, deposit_prices=None):
+    """
+    Normalise a Bitpanda export to the ledger schema.
+
+    Parameters
+    ----------
+    bitpanda_data : pd.DataFrame
+        Output of `collect_data_utils.collect_bitpanda_data`.
+    deposit_prices : dict, optional
+        asset -> unit cost of the coins deposited from outside (bought elsewhere);
+        by default their market price at the deposit time.
+
+    Returns
+    -------
+    pd.DataFrame
+        Transactions with the TRANSACTION_COLUMNS (stake/transfer rows dropped).
+    """
+    deposit_prices = deposit_prices or {}
+    data = bitpanda_data[bitpanda_data["trans_type_collect"].isin(LEDGER_SIDES)]
+    side = data["trans_type_collect"].astype(str)
+    asset = data["asset_collect"].astype(str)
+    quantity = data["amount_asset_collect"].abs()
+    amount = data["amount_fiat_collect"].abs()
+    # I depositi di monete non hanno controvalore fiat: costo al prezzo indicato o di mercato
+    deposit_price = asset.map(deposit_prices).astype(float).fillna(data["asset_market_price_collect"])
+    amount = amount.where(side != "deposit", quantity * deposit_price)
+    return pd.DataFrame({
+        "transaction_id": "bitpanda:" + data["trans_id_collect"].astype(str),
+        "timestamp": _to_utc_naive(data["date_collect"]),
+        "asset": asset,
+        "side": side,
+        "quantity": quantity,
+        "amount": amount,
+        "source": "bitpanda",
+    }).dropna(subset=["timestamp", "quantity", "amount"]).reset_index(drop=True)
+
+
+def mexem_transactions(trades, columns=MEXEM_TRADE_COLUMNS):
+    """
+    Normalise the executed trades of a MEXEM/IBKR report to the ledger schema.
+
+    IBKR trades carry no ID: it is derived from symbol, time, quantity, price
+    and the occurrence of that combination in the report (identical partial
+    fills stay distinct), so overlapping reports imported twice are deduplicated.
+    Forex conversions (category "Forex" or symbols like "EUR.USD") are dropped.
+
+    Parameters
+    ----------
+    trades : pd.DataFrame
+        The trades section ("Dettaglio eseguiti" / "Trades") as text columns.
+    columns : dict, optional
+        Field -> candidate column names, default MEXEM_TRADE_COLUMNS.
+
+    Returns
+    -------
+    pd.DataFrame
+        Transactions with the TRANSACTION_COLUMNS (sub-total rows dropped).
+        Buys cost quantity * price + commission, sells yield quantity * price - commission.
+    """
+    def column(field, required=True):
+        for name in columns.get(field, ()):
+            if name in trades.columns:
+                return trades[name]
+        if required:
+            raise KeyError(f"None of {columns[field]} in the trades section")
+        return None
+
+    def number(field):
+        return pd.to_numeric(column(field).astype(str).str.replace(",", "", regex=False), errors="coerce")
+
+    orders = column("discriminator").astype(str).str.strip() == "Order"
+    symbols = column("asset").astype(str).str.strip()
+    orders &= ~symbols.str.fullmatch(r"[A-Z]{3}\.[A-Z]{3}")
+    category = column("category", required=False)
+    if category is not None:
+        orders &= ~category.astype(str).str.strip().isin(MEXEM_EXCLUDED_CATEGORIES)
+    quantity, price, fee = number("quantity")[orders], number("price")[orders], number("fee")[orders].fillna(0).abs()
+    asset = symbols[orders]
+    raw_time = column("timestamp")[orders].astype(str).str.replace(",", "", regex=False)
+    gross = quantity.abs() * price
+    # Formato canonico dei numeri: lo stesso eseguito dà la stessa chiave qualunque sia il dtype del report
+    keys = asset + "|" + raw_time + "|" + quantity.map(lambda x: f"{x:.10g}") + "|" + price.map(lambda x: f"{x:.10g}")
+    keys = keys + "|" + keys.groupby(keys).cumcount().astype(str)
+    return pd.DataFrame({
+        "transaction_id": "mexem:" + keys.map(lambda key: hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]),
+        "timestamp": _to_utc_naive(raw_time),
+        "asset": asset,
+        "side": np.where(quantity >= 0, "buy", "sell"),
+        "quantity": quantity.abs(),
+        "amount": np.where(quantity >= 0, gross + fee, gross - fee),
+        "source": "mexem",
+    }).dropna(subset=["timestamp", "quantity", "amount"]).reset_index(drop=True)
+
+
+def _new_position():
+    return {
+        "quantity": 0.0,
+        "average_cost_basis": 0.0,
+        "fifo_cost_basis": 0.0,
+        "fifo_lots": [],
+        "realized_average": 0.0,
+        "realized_fifo": 0.0,
+        "invested": 0.0,
+        "last_timestamp": None,
+    }
+
+
+def apply_transaction(position, side, quantity, amount, timestamp):
+    """
+    Update a position in place with one transaction, for both cost methods.
+
+    Parameters
+    ----------
+    position : dict
+        State of the asset (see `_new_position`).
+    side : str
+        One of LEDGER_SIDES.
+    quantity : float
+        Units moved (positive).
+    amount : float
+        Fiat cost (buy/deposit) or proceeds (sell); ignored for withdrawals.
+    timestamp : str
+        ISO time of the transaction.
+    """
+    if side in ("buy", "deposit"):
+        position["quantity"] += quantity
+        position["average_cost_basis"] += amount
+        position["fifo_cost_basis"] += amount
+        position["invested"] += amount
+        position["fifo_lots"].append([quantity, amount / quantity if quantity else 0.0, timestamp])
+    else:
+        held = position["quantity"]
+        if quantity > held + QUANTITY_EPSILON:
+            print(f"Attenzione: uscita di {quantity} oltre la quantità detenuta ({held}) il {timestamp}")
+            # Solo la quota detenuta esce dal ledger: i proventi sono ridotti in proporzione
+            amount = amount * held / quantity if quantity else 0.0
+            quantity = held
+        average_cost = position["average_cost_basis"] / held if held > QUANTITY_EPSILON else 0.0
+        average_removed = average_cost * quantity
+
+        fifo_removed, remaining = 0.0, quantity
+        lots = position["fifo_lots"]
+        while remaining > QUANTITY_EPSILON and lots:
+            lot = lots[0]
+            taken = min(lot[0], remaining)
+            fifo_removed += taken * lot[1]
+            lot[0] -= taken
+            remaining -= taken
+            if lot[0] <= QUANTITY_EPSILON:
+                lots.pop(0)
+
+        position["quantity"] = max(held - quantity, 0.0)
+        position["average_cost_basis"] -= average_removed
+        position["fifo_cost_basis"] -= fifo_removed
+        if position["quantity"] <= QUANTITY_EPSILON:
+            position.update(quantity=0.0, average_cost_basis=0.0, fifo_cost_basis=0.0, fifo_lots=[])
+        if side == "sell":
+            position["realized_average"] += amount - average_removed
+            position["realized_fifo"] += amount - fifo_removed
+    position["last_timestamp"] = timestamp
+
+
+class CostBasisLedger:
+    """
+    Per-asset holdings and cost basis (FIFO lots and average cost), kept on disk
+    and updated only with the transactions not seen before.
+
+    The state holds, for each asset, the open FIFO lots and the running totals,
+    so `holdings()` costs O(assets) whatever the history length. Transactions are
+    deduplicated by ID and appended to a journal; a transaction older than the
+    last one applied to its asset triggers a replay of that asset only.
+
+    Parameters
+    ----------
+    ledger_dir : str, optional
+        Directory of the state and of the journal, default DEFAULT_LEDGER_DIR.
+    """
+
+    STATE_FILE = "_ledger_state.json"
+    JOURNAL_FILE = "journal"
+
+    def __init__(self, ledger_dir=DEFAULT_LEDGER_DIR):
+        self.ledger_dir = ledger_dir
+        os.makedirs(self.ledger_dir, exist_ok=True)
+        state = self._load_state()
+        self.positions = state.get("positions", {})
+        self.seen_ids = set(state.get("seen_ids", []))
+
+    ## --- Persistence ---
+    def _state_path(self):
+        return os.path.join(self.ledger_dir, self.STATE_FILE)
+
+    def _journal_path(self):
+        return os.path.join(self.ledger_dir, f"{self.JOURNAL_FILE}{FRAME_EXTENSION}")
+
+    def _load_state(self):
+        try:
+            with open(self._state_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError):
+            return {}
+
+    def _save_state(self):
+        with open(self._state_path(), "w", encoding="utf-8") as f:
+            json.dump({"positions": self.positions, "seen_ids": sorted(self.seen_ids)}, f, indent=4)
+
+    def journal(self):
+        """All the transactions applied so far (TRANSACTION_COLUMNS)."""
+        path = self._journal_path()
+        if os.path.exists(path):
+            return read_frame(path)
+        return pd.DataFrame(columns=TRANSACTION_COLUMNS)
+
+    ## --- Updates ---
+    def ingest(self, transactions):
+        """
+        Apply the transactions whose ID is not in the ledger yet.
+
+        Parameters
+        ----------
+        transactions : pd.DataFrame
+            Transactions with the TRANSACTION_COLUMNS (e.g. from
+            `bitpanda_transactions` or `mexem_transactions`).
+
+        Returns
+        -------
+        int
+            Number of new transactions applied.
+        """
+        new = transactions[~transactions["transaction_id"].isin(self.seen_ids)]
+        new = new.drop_duplicates("transaction_id")
+        new = new[new["side"].isin(LEDGER_SIDES)].sort_values("timestamp", kind="stable")
+        if new.empty:
+            return 0
+
+        journal = self.journal()
+        backdated = set()
+        for asset, rows in new.groupby("asset", sort=False):
+            last = self.positions.get(asset, {}).get("last_timestamp")
+            if last is not None and rows["timestamp"].min() < pd.Timestamp(last):
+                backdated.add(asset)
+                continue
+            position = self.positions.setdefault(asset, _new_position())
+            for row in rows.itertuples(index=False):
+                apply_transaction(position, row.side, row.quantity, row.amount, row.timestamp.isoformat())
+
+        if journal.empty:
+            journal = new[TRANSACTION_COLUMNS].reset_index(drop=True)
+        else:
+            journal = pd.concat([journal, new[TRANSACTION_COLUMNS]], ignore_index=True)
+        ## Transazioni retrodatate: si ricalcola solo l'asset coinvolto dal giornale
+        for asset in backdated:
+            position = self.positions[asset] = _new_position()
+            rows = journal[journal["asset"] == asset].sort_values("timestamp", kind="stable")
+            for row in rows.itertuples(index=False):
+                apply_transaction(position, row.side, row.quantity, row.amount, row.timestamp.isoformat())
+
+        write_frame(journal, self._journal_path())
+        self.seen_ids.update(new["transaction_id"])
+        self._save_state()
+        return len(new)
+
+    ## --- Queries ---
+    def holdings(self, prices=None):
+        """
+        Current holdings and cost basis of every asset.
+
+        Parameters
+        ----------
+        prices : dict, optional
+            asset -> current price, to add market value and unrealized gains.
+
+        Returns
+        -------
+        pd.DataFrame
+            Indexed by asset: quantity, average_cost, average_cost_basis,
+            fifo_cost_basis, realized_average, realized_fifo, invested
+            (and market_value, unrealized_average, unrealized_fifo with `prices`).
+        """
+        columns = ["quantity", "average_cost_basis", "fifo_cost_basis", "realized_average", "realized_fifo", "invested"]
+        table = pd.DataFrame(
+            [[p[c] for c in columns] for p in self.positions.values()],
+            index=pd.Index(list(self.positions), name="asset"),
+            columns=columns,
+        )
+        with np.errstate(invalid="ignore", divide="ignore"):
+            table.insert(1, "average_cost", np.where(table["quantity"] > 0, table["average_cost_basis"] / table["quantity"], np.nan))
+        if prices is not None:
+            table["market_value"] = table["quantity"] * table.index.map(prices).astype(float)
+            table["unrealized_average"] = table["market_value"] - table["average_cost_basis"]
+            table["unrealized_fifo"] = table["market_value"] - table["fifo_cost_basis"]
+        return table
+
+    def lots(self, asset):
+        """Open FIFO lots of an asset: quantity, unit_cost, timestamp (oldest first)."""
+        lots = self.positions.get(asset, _new_position())["fifo_lots"]
+        return pd.DataFrame(lots, columns=["quantity", "unit_cost", "timestamp"])
@@ -0,0 +1,437 @@
+##Vectorised, memory-bounded Monte Carlo simulation of price paths (geometric Brownian motion)
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from modules.stats_utils import RunningMoments, StreamingHistogram, freedman_diaconis_bins
+
+DEFAULT_CHUNK_SIZE = 10_000
+DEFAULT_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+## Log-spaced bins of the streaming histograms (relative resolution ~ range / 8192)
+DEFAULT_HISTOGRAM_BINS = 8192
+
+
+def estimate_drift_volatility(prices):
+    """
+    Drift and volatility of the daily logarithmic returns.
+
+    Parameters
+    ----------
+    prices : pd.Series or array-like
+        Historical prices.
+
+    Returns
+    -------
+    (float, float)
+        drift = mean(dlr) - var(dlr) / 2 and sigma = std(dlr).
+    """
+    prices = pd.Series(np.asarray(prices, dtype=float)).dropna()
+    logret = np.log(prices / prices.shift(1)).dropna()
+    return float(logret.mean() - logret.var(ddof=0) / 2), float(logret.std(ddof=0))
+
+
+def draw_shocks(rng, shape, distribution="normal", dtype=np.float32):
+    """
+    Random shocks Z: standard normal, or uniform in [-1, 1].
+
+    Parameters
+    ----------
+    rng : np.random.Generator
+        Source of randomness.
+    shape : tuple
+        Output shape.
+    distribution : str, optional
+        "normal" (default) or "uniform".
+    dtype : np.dtype, optional
+        Output type, default float32.
+
+    Returns
+    -------
+    np.ndarray
+        The shocks.
+    """
+    if distribution == "uniform":
+        return rng.uniform(-1, 1, shape).astype(dtype, copy=False)
+    return rng.standard_normal(shape, dtype=dtype)
+
+
+def estimation_error(sigma, number_simulation, distribution="normal"):
+    """Error of the Monte Carlo estimate: 3 sigma / sqrt(N) (normal), sigma / sqrt(N) (uniform)."""
+    factor = 1 if distribution == "uniform" else 3
+    return factor * sigma / np.sqrt(number_simulation)
+
+
+def _chunk_generators(seed, n_chunks):
+    """One independent generator per chunk: results do not depend on how chunks are scheduled."""
+    return [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(n_chunks)]
+
+
+def simulate_path_chunk(last_price, drift, sigma, days, n_paths, rng, distribution="normal", dtype=np.float32):
+    """
+    Simulate `n_paths` price paths with a cumulative sum of log returns.
+
+    Parameters
+    ----------
+    last_price : float
+        Price at day 0.
+    drift, sigma : float
+        Parameters of the daily log returns.
+    days : int
+        Days to simulate.
+    n_paths : int
+        Paths in the chunk.
+    rng : np.random.Generator
+        Source of randomness.
+    distribution : str, optional
+        "normal" (default) or "uniform".
+    dtype : np.dtype, optional
+        Computation type, default float32.
+
+    Returns
+    -------
+    np.ndarray
+        Prices of shape (days + 1, n_paths); row 0 is `last_price`.
+    """
+    log_returns = draw_shocks(rng, (days, n_paths), distribution, dtype)
+    log_returns *= dtype(sigma)
+    log_returns += dtype(drift)
+    paths = np.empty((days + 1, n_paths), dtype=dtype)
+    paths[0] = 0
+    np.cumsum(log_returns, axis=0, out=paths[1:])
+    np.exp(paths, out=paths)
+    paths *= dtype(last_price)
+    return paths
+
+
+def price_range(last_price, drift, sigma, days, distribution="normal", width=8):
+    """
+    Range holding practically every simulated price up to `days`:
+    `width` standard deviations of the cumulative log return around the drift.
+
+    Parameters
+    ----------
+    last_price : float
+        Price at day 0.
+    drift, sigma : float
+        Parameters of the daily log returns.
+    days : int
+        Days simulated.
+    distribution : str, optional
+        "normal" (default) or "uniform" (shocks of variance 1/3).
+    width : float, optional
+        Standard deviations on each side, default 8.
+
+    Returns
+    -------
+    (float, float)
+        Lowest and highest price of the range (never empty: a flat series,
+        sigma = drift = 0, gets last_price * (1 -/+ 1e-9)).
+    """
+    shock_std = np.sqrt(1 / 3) if distribution == "uniform" else 1.0
+    spread = width * sigma * shock_std * np.sqrt(days)
+    lo = last_price * np.exp(min(0.0, drift * days) - spread)
+    hi = last_price * np.exp(max(0.0, drift * days) + spread)
+    # Serie piatta: tutti i prezzi coincidono, l'istogramma ha comunque bisogno di un intervallo
+    if not hi > lo * (1 + 1e-9):
+        lo, hi = min(lo, last_price) * (1 - 1e-9), max(hi, last_price) * (1 + 1e-9)
+    return lo, hi
+
+
+def _run_chunk(args):
+    """Simulate one chunk and reduce it to streaming accumulators and per-day sums."""
+    last_price, drift, sigma, days, n_paths, rng, distribution, n_keep, bounds, n_bins, keep_samples = args
+    paths = simulate_path_chunk(last_price, drift, sigma, days, n_paths, rng, distribution)
+    final_prices = paths[-1]
+    path_means = paths.mean(axis=0, dtype=np.float64)
+    result = {
+        "final_moments": RunningMoments().update(final_prices),
+        "final_histogram": StreamingHistogram(*bounds, n_bins, log_scale=True).update(final_prices),
+        "mean_moments": RunningMoments().update(path_means),
+        "mean_histogram": StreamingHistogram(*bounds, n_bins, log_scale=True).update(path_means),
+        "above_last_price": int((path_means >= last_price).sum()),
+        "daily_sum": paths.sum(axis=1, dtype=np.float64),
+        "sample_paths": paths[:, :n_keep].copy(),
+    }
+    if keep_samples:
+        result["final_prices"] = final_prices.copy()
+        result["path_means"] = path_means.astype(np.float32)
+    return result
+
+
+def simulate_price_paths(
+    last_price,
+    drift,
+    sigma,
+    days,
+    number_simulation,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    distribution="normal",
+    seed=None,
+    n_jobs=1,
+    quantiles=DEFAULT_QUANTILES,
+    n_sample_paths=100,
+    keep_samples=False,
+    n_bins=DEFAULT_HISTOGRAM_BINS,
+):
+    """
+    Monte Carlo simulation of future prices, computed chunk by chunk.
+
+    Only a (days + 1, chunk_size) float32 block is alive per worker; each chunk
+    is reduced to running moments and log-spaced fixed-bin histograms of the
+    final prices and of the mean price of each path, which are merged as the
+    chunks complete. Memory therefore depends on `chunk_size` and `n_bins`,
+    not on `number_simulation`, unless `keep_samples` is set.
+
+    Parameters
+    ----------
+    last_price : float
+        Latest known price.
+    drift, sigma : float
+        Parameters of the daily log returns (see `estimate_drift_volatility`).
+    days : int
+        Days to predict.
+    number_simulation : int
+        Number of simulated paths.
+    chunk_size : int, optional
+        Paths simulated per block, default DEFAULT_CHUNK_SIZE.
+    distribution : str, optional
+        "normal" (default) or "uniform".
+    seed : int, optional
+        Seed of the `np.random.Generator`s (same result for any `n_jobs`).
+    n_jobs : int, optional
+        Processes used for the chunks (1 = no pool, -1 = all CPUs).
+    quantiles : tuple of float, optional
+        Quantiles of the final price to report.
+    n_sample_paths : int, optional
+        Paths kept in full for plotting.
+    keep_samples : bool, optional
+        Also return every final price and path mean (O(number_simulation) memory)
+        and compute quantiles and counts exactly from them. Default False.
+    n_bins : int, optional
+        Bins of the streaming histograms, default DEFAULT_HISTOGRAM_BINS.
+
+    Returns
+    -------
+    dict
+        "mean_path" (expected price per day), "sample_paths",
+        "final_histogram"/"mean_histogram" (`StreamingHistogram`),
+        "final_moments"/"mean_moments" (`RunningMoments`), "final_quantiles",
+        "estimated_average_price", "sims_above_average"/"sims_below_average",
+        "sims_above_last_price"/"sims_below_last_price", "gain_perc", "est_error";
+        "final_prices" and "path_means" only with `keep_samples`.
+        Without `keep_samples` the quantiles and the counts against the average
+        are read from the histograms (error below one bin).
+    """
+    bounds = price_range(last_price, drift, sigma, days, distribution)
+    chunk_sizes = [min(chunk_size, number_simulation - start) for start in range(0, number_simulation, chunk_size)]
+    generators = _chunk_generators(seed, len(chunk_sizes))
+    tasks = []
+    kept = 0
+    for n_paths, rng in zip(chunk_sizes, generators):
+        n_keep = min(n_paths, n_sample_paths - kept)
+        kept += n_keep
+        tasks.append((last_price, drift, sigma, days, n_paths, rng, distribution, n_keep, bounds, n_bins, keep_samples))
+
+    final_moments, mean_moments = RunningMoments(), RunningMoments()
+    final_histogram = StreamingHistogram(*bounds, n_bins, log_scale=True)
+    mean_histogram = StreamingHistogram(*bounds, n_bins, log_scale=True)
+    daily_sum = np.zeros(days + 1)
+    above_last_price = 0
+    sample_paths, final_prices, path_means = [], [], []
+
+    def _accumulate(chunk):
+        nonlocal daily_sum, above_last_price
+        final_moments.merge(chunk["final_moments"])
+        mean_moments.merge(chunk["mean_moments"])
+        final_histogram.merge(chunk["final_histogram"])
+        mean_histogram.merge(chunk["mean_histogram"])
+        daily_sum += chunk["daily_sum"]
+        above_last_price += chunk["above_last_price"]
+        sample_paths.append(chunk["sample_paths"])
+        if keep_samples:
+            final_prices.append(chunk["final_prices"])
+            path_means.append(chunk["path_means"])
+
+    ## I risultati di ogni chunk vengono fusi appena arrivano e poi scartati
+    if n_jobs == 1 or len(tasks) == 1:
+        for task in tasks:
+            _accumulate(_run_chunk(task))
+    else:
+        workers = os.cpu_count() if n_jobs == -1 else n_jobs
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk in pool.map(_run_chunk, tasks):
+                _accumulate(chunk)
+
+    estimated_average_price = float(mean_moments.mean)
+    result = {
+        "mean_path": daily_sum / number_simulation,
+        "sample_paths": np.concatenate(sample_paths, axis=1),
+        "final_histogram": final_histogram,
+        "final_moments": final_moments,
+        "mean_histogram": mean_histogram,
+        "mean_moments": mean_moments,
+        "estimated_average_price": estimated_average_price,
+        "sims_above_last_price": above_last_price,
+        "sims_below_last_price": number_simulation - above_last_price,
+        "gain_perc": (estimated_average_price - last_price) / last_price * 100,
+        "est_error": estimation_error(sigma, number_simulation, distribution),
+    }
+    if keep_samples:
+        result["final_prices"] = np.concatenate(final_prices)
+        result["path_means"] = np.concatenate(path_means)
+        result["final_quantiles"] = dict(zip(quantiles, np.quantile(result["final_prices"], quantiles)))
+        above_average = int((result["path_means"] >= estimated_average_price).sum())
+    else:
+        result["final_quantiles"] = dict(zip(quantiles, final_histogram.quantile(quantiles)))
+        above_average = int(round(number_simulation - float(mean_histogram.count_below(estimated_average_price))))
+    result["sims_above_average"] = above_average
+    result["sims_below_average"] = number_simulation - above_average
+    return result
+
+
+def freedman_diaconis_histogram(histogram, moments):
+    """
+    Re-bin a streaming histogram with the Freedman–Diaconis rule.
+
+    Parameters
+    ----------
+    histogram : StreamingHistogram
+        Fine histogram of a stream (e.g. `simulate_price_paths(...)["final_histogram"]`).
+    moments : RunningMoments
+        Moments of the same stream (count, min and max).
+
+    Returns
+    -------
+    (np.ndarray, np.ndarray)
+        Counts and bin edges, ready for `plt.stairs`.
+    """
+    q25, q75 = histogram.quantile([0.25, 0.75])
+    bins = freedman_diaconis_bins(q25, q75, int(moments.count), float(moments.min), float(moments.max))
+    return histogram.histogram(np.linspace(float(moments.min), float(moments.max), bins + 1))
+
+
+def estimate_next_price(last_price, drift, sigma, number_simulation, chunk_size=10**6, distribution="normal", seed=None):
+    """
+    Expected price of the next day from `number_simulation` one-step samples,
+    drawn in chunks (10**8 samples need ~4 MB at a time instead of 800 MB).
+
+    Parameters
+    ----------
+    last_price : float
+        Latest known price.
+    drift, sigma : float
+        Parameters of the daily log returns.
+    number_simulation : int
+        Number of samples.
+    chunk_size : int, optional
+        Samples drawn per block, default 10**6.
+    distribution : str, optional
+        "normal" (default) or "uniform".
+    seed : int, optional
+        Seed of the random generator.
+
+    Returns
+    -------
+    (float, float)
+        The estimated price and the estimation error of the log return.
+    """
+    rng = np.random.default_rng(seed)
+    total = 0.0
+    for start in range(0, number_simulation, chunk_size):
+        shocks = draw_shocks(rng, min(chunk_size, number_simulation - start), distribution)
+        total += np.exp(drift + sigma * shocks, dtype=np.float32).sum(dtype=np.float64)
+    return last_price * total / number_simulation, estimation_error(sigma, number_simulation, distribution)
+
+
+## Purchases per year of each DCA frequency
+SPREAD_FREQUENCIES = {"weekly": 52, "monthly": 12, "quarterly": 4, "annual": 1}
+
+
+def simulate_spread_costs(
+    bid_reference_price,
+    ask_reference_price,
+    annual_investment,
+    number_simulation=10**4,
+    frequencies=SPREAD_FREQUENCIES,
+    price_volatility=0.01,
+    spread_volatility=0.25,
+    seed=None,
+):
+    """
+    Annual bid/ask spread cost of a DCA plan for several purchase frequencies.
+
+    Every purchase of every scenario draws a mid price (log-normal around the
+    reference mid) and a spread (log-normal around the reference spread, so
+    ask >= bid always holds); all frequencies are laid side by side in one
+    (number_simulation, total purchases) array and reduced per frequency.
+    The cost of a purchase is (ask - bid) * shares bought at the ask.
+
+    Parameters
+    ----------
+    bid_reference_price, ask_reference_price : float
+        Typical quotes of the instrument.
+    annual_investment : float
+        Capital invested per year, split evenly across the purchases.
+    number_simulation : int, optional
+        Number of simulated years, default 10**4.
+    frequencies : dict, optional
+        name -> purchases per year, default SPREAD_FREQUENCIES.
+    price_volatility : float, optional
+        Std of the log mid price between purchases, default 0.01.
+    spread_volatility : float, optional
+        Std of the log spread, default 0.25.
+    seed : int, optional
+        Seed of the random generator.
+
+    Returns
+    -------
+    pd.DataFrame
+        One column per frequency, one row per simulated year: total spread cost.
+    """
+    if ask_reference_price < bid_reference_price:
+        raise ValueError("ask_reference_price must be >= bid_reference_price")
+    rng = np.random.default_rng(seed)
+    purchases = np.array(list(frequencies.values()))
+    total_purchases = int(purchases.sum())
+
+    mid = (bid_reference_price + ask_reference_price) / 2 * np.exp(
+        price_volatility * rng.standard_normal((number_simulation, total_purchases))
+    )
+    spread = (ask_reference_price - bid_reference_price) * np.exp(
+        spread_volatility * rng.standard_normal((number_simulation, total_purchases))
+    )
+    ask = mid + spread / 2
+
+    ## Importo di ogni acquisto: il capitale annuale diviso per il numero di acquisti della sua frequenza
+    amount_per_purchase = np.repeat(annual_investment / purchases, purchases)
+    cost = spread * amount_per_purchase / ask
+    starts = np.concatenate([[0], np.cumsum(purchases)[:-1]])
+    return pd.DataFrame(np.add.reduceat(cost, starts, axis=1), columns=list(frequencies))
+
+
+def spread_cost_summary(spread_costs, percentiles=(5, 25, 50, 75, 95)):
+    """
+    Mean and percentiles of the simulated spread costs of each frequency.
+
+    Parameters
+    ----------
+    spread_costs : pd.DataFrame
+        Output of `simulate_spread_costs`.
+    percentiles : tuple of float, optional
+        Percentiles to report.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per frequency with "mean" and "p<k>" columns.
+    """
+    values = spread_costs.to_numpy()
+    summary = pd.DataFrame(
+        np.percentile(values, percentiles, axis=0).T,
+        index=spread_costs.columns,
+        columns=[f"p{p:g}" for p in percentiles],
+    )
+    summary.insert(0, "mean", values.mean(axis=0))
+    return summary
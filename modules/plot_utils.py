@@ -0,0 +1,247 @@
+##Fast plotting of long time series: down-sampling (LTTB / min-max) and WebGL traces
+import numpy as np
+import pandas as pd
+
+import plotly.graph_objects as go
+
+## Above these sizes a trace is down-sampled / drawn with WebGL
+MAX_POINTS_PER_TRACE = 2000
+WEBGL_THRESHOLD = 5000
+
+
+def _as_numeric(x):
+    """
+    Numeric view of an x axis: datetimes (or date strings) as int64 nanoseconds,
+    numbers as float, anything else as its position.
+    """
+    values = x if isinstance(x, (pd.Index, pd.Series)) else pd.Index(x)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return pd.DatetimeIndex(values).as_unit("ns").asi8.astype(float)
+    if pd.api.types.is_numeric_dtype(values):
+        return np.asarray(values, dtype=float)
+    try:
+        return pd.DatetimeIndex(pd.to_datetime(values, format="%Y-%m-%d")).as_unit("ns").asi8.astype(float)
+    except (ValueError, TypeError):
+        return np.arange(len(values), dtype=float)
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets down-sampling.
+
+    Parameters
+    ----------
+    x, y : np.ndarray
+        Numeric coordinates (finite values, x increasing).
+    n_out : int
+        Number of points to keep (first and last are always kept).
+
+    Returns
+    -------
+    np.ndarray
+        Sorted indices of the selected points.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        # Media del bucket successivo (l'ultimo punto per l'ultimo bucket)
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[stop:next_stop].mean(), y[stop:next_stop].mean()
+        bx, by = x[start:stop], y[start:stop]
+        area = np.abs((x[previous] - avg_x) * (by - y[previous]) - (x[previous] - bx) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def minmax_indices(y, n_out):
+    """
+    Min-max down-sampling: the minimum and the maximum of each bucket.
+
+    Parameters
+    ----------
+    y : np.ndarray
+        Values (finite).
+    n_out : int
+        Approximate number of points to keep.
+
+    Returns
+    -------
+    np.ndarray
+        Sorted indices of the selected points.
+    """
+    n = len(y)
+    n_buckets = n_out // 2
+    if n_buckets < 1 or n <= n_out:
+        return np.arange(n)
+    bucket = n // n_buckets
+    usable = bucket * n_buckets
+    blocks = y[:usable].reshape(n_buckets, bucket)
+    offsets = np.arange(n_buckets) * bucket
+    picks = np.concatenate([offsets + blocks.argmin(axis=1), offsets + blocks.argmax(axis=1), np.arange(usable, n)])
+    return np.unique(np.concatenate([[0, n - 1], picks]))
+
+
+def downsample(x, y, max_points=MAX_POINTS_PER_TRACE, method="lttb"):
+    """
+    Reduce a series to about `max_points` points keeping its visual shape.
+
+    Parameters
+    ----------
+    x : array-like
+        X values (dates, date strings or numbers).
+    y : array-like
+        Y values; NaN points are dropped.
+    max_points : int, optional
+        Maximum number of points, default MAX_POINTS_PER_TRACE.
+    method : str, optional
+        "lttb" (default) or "minmax".
+
+    Returns
+    -------
+    (array-like, np.ndarray)
+        The selected x and y values.
+    """
+    x = x if isinstance(x, (pd.Index, pd.Series)) else pd.Index(x)
+    y = np.asarray(y, dtype=float)
+    finite = np.flatnonzero(np.isfinite(y))
+    if len(finite) <= max_points:
+        keep = finite
+    elif method == "minmax":
+        keep = finite[minmax_indices(y[finite], max_points)]
+    else:
+        keep = finite[lttb_indices(_as_numeric(x)[finite], y[finite], max_points)]
+    x_values = x.iloc[keep] if isinstance(x, pd.Series) else x[keep]
+    return x_values, y[keep]
+
+
+def line_trace(x, y, name, mode="lines", max_points=MAX_POINTS_PER_TRACE, webgl_threshold=WEBGL_THRESHOLD, **kwargs):
+    """
+    Build a line trace that stays light for long series.
+
+    Series longer than `max_points` are down-sampled with LTTB, and traces
+    whose original length exceeds `webgl_threshold` use `go.Scattergl`;
+    markers and text are dropped on down-sampled traces.
+
+    Parameters
+    ----------
+    x, y : array-like
+        Data of the trace.
+    name : str
+        Trace name.
+    mode : str, optional
+        Plotly mode for short series, default "lines".
+    max_points : int, optional
+        Maximum number of points drawn (None keeps every point).
+    webgl_threshold : int, optional
+        Length above which the trace is drawn with WebGL.
+    **kwargs
+        Other properties passed to the trace.
+
+    Returns
+    -------
+    go.Scatter or go.Scattergl
+        The trace.
+    """
+    n = len(y)
+    if max_points is not None and n > max_points:
+        x, y = downsample(x, y, max_points)
+        mode = "lines"
+    trace_class = go.Scattergl if n > webgl_threshold else go.Scatter
+    return trace_class(x=x, y=y, mode=mode, name=name, **kwargs)
+
+
+def downsample_range(x, y, x_range, max_points=MAX_POINTS_PER_TRACE):
+    """
+    Down-sample only the part of a series inside an x range.
+
+    Parameters
+    ----------
+    x, y : array-like
+        Full-resolution data (x increasing).
+    x_range : list or None
+        [start, end] as reported by plotly (None = whole series).
+    max_points : int, optional
+        Points to keep inside the range.
+
+    Returns
+    -------
+    (array-like, np.ndarray)
+        The selected x and y values.
+    """
+    x = x if isinstance(x, (pd.Index, pd.Series)) else pd.Index(x)
+    y = np.asarray(y, dtype=float)
+    if x_range is not None:
+        numeric_x = _as_numeric(x)
+        if pd.api.types.is_numeric_dtype(x):
+            lo, hi = float(x_range[0]), float(x_range[1])
+        else:
+            lo, hi = (float(pd.Timestamp(b).as_unit("ns").value) for b in x_range)
+        visible = slice(max(np.searchsorted(numeric_x, lo) - 1, 0), np.searchsorted(numeric_x, hi) + 1)
+        x = x.iloc[visible] if isinstance(x, pd.Series) else x[visible]
+        y = y[visible]
+    return downsample(x, y, max_points)
+
+
+def resample_traces(fig_widget, full_data, x_range, max_points=MAX_POINTS_PER_TRACE):
+    """
+    Re-sample the traces of a `go.FigureWidget` from their full data inside an x range.
+
+    Parameters
+    ----------
+    fig_widget : go.FigureWidget
+        The displayed figure.
+    full_data : list or dict of (x, y)
+        Full-resolution data: one pair per trace of `fig_widget.data`, or
+        trace position -> pair.
+    x_range : list or None
+        [start, end] as reported by plotly (None = whole series).
+    max_points : int, optional
+        Points per trace inside the visible range.
+
+    Returns
+    -------
+    list of int
+        Positions of the re-sampled traces (hidden traces, visible=False, are skipped).
+    """
+    items = full_data.items() if isinstance(full_data, dict) else enumerate(full_data)
+    resampled = []
+    with fig_widget.batch_update():
+        for position, (x, y) in list(items):
+            trace = fig_widget.data[position]
+            if trace.visible is False:
+                continue
+            trace.x, trace.y = downsample_range(x, y, x_range, max_points)
+            resampled.append(position)
+    return resampled
+
+
+def enable_zoom_resampling(fig_widget, full_data, max_points=MAX_POINTS_PER_TRACE, on_resample=None):
+    """
+    Keep full resolution on zoom: when the x range of a `go.FigureWidget`
+    changes, every visible trace is re-sampled from its full data inside the new range.
+
+    Parameters
+    ----------
+    fig_widget : go.FigureWidget
+        The displayed figure.
+    full_data : list or dict of (x, y)
+        Full-resolution data (see `resample_traces`); it is read at every
+        zoom, so traces added later can be registered by updating it in place.
+    max_points : int, optional
+        Points per trace inside the visible range.
+    on_resample : callable, optional
+        Called as on_resample(x_range, positions) after every re-sampling.
+    """
+    def _on_range(layout, x_range):
+        resampled = resample_traces(fig_widget, full_data, x_range, max_points)
+        if on_resample is not None:
+            on_resample(x_range, resampled)
+
+    fig_widget.layout.xaxis.on_change(_on_range, "range")
@@ -0,0 +1,383 @@
+##Persistent local store for daily OHLCV bars --> avoid re-downloading years of history
+import datetime as dt
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+##Parquet is optional: fall back to pickle when no parquet engine is installed
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+DEFAULT_STORE_DIR = os.path.join("data", "price_store")
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+FRAME_EXTENSION = ".parquet" if PARQUET_AVAILABLE else ".pkl"
+## Giorni già salvati riscaricati attorno a ogni buco, per confrontarli con quelli nuovi
+OVERLAP_DAYS = 7
+## Scarto relativo sul Close oltre il quale Yahoo ha ricalcolato lo storico aggiustato (split o dividendo)
+REBASE_RTOL = 1e-5
+
+
+def read_frame(path):
+    """Read a DataFrame written by `write_frame` (Parquet or pickle)."""
+    return pd.read_parquet(path) if PARQUET_AVAILABLE else pd.read_pickle(path)
+
+
+def write_frame(frame, path):
+    """Write a DataFrame as Parquet when available, as pickle otherwise."""
+    if PARQUET_AVAILABLE:
+        frame.to_parquet(path)
+    else:
+        frame.to_pickle(path)
+
+
+def _merge_intervals(intervals):
+    """Sort [start, end) intervals and merge the overlapping or adjacent ones."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class PriceStore:
+    """
+    Local columnar store of daily OHLCV bars, one file per symbol.
+
+    For each symbol the store remembers which date intervals have already been
+    downloaded; a request only fetches the holes between them and appends the
+    new bars to the symbol file. The bar of the current day is never
+    considered settled: it is refreshed at most every `intraday_max_age` seconds.
+
+    Bars are split- and dividend-adjusted by Yahoo, which re-bases the whole
+    history after every corporate action (even the "Close" of
+    `auto_adjust=False` is split-adjusted, so unadjusted bars cannot be
+    stored). Each download therefore overlaps `OVERLAP_DAYS` of stored bars:
+    when the overlapping closes differ, the stored bars are on an older base
+    and the symbol is downloaded again from scratch.
+
+    Parameters
+    ----------
+    store_dir : str, optional
+        Directory holding the symbol files and the coverage metadata.
+    intraday_max_age : int, optional
+        Seconds after which the bar of the current day is downloaded again.
+    """
+
+    META_FILE = "_coverage.json"
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR, intraday_max_age=3600):
+        self.store_dir = store_dir
+        self.intraday_max_age = intraday_max_age
+        os.makedirs(self.store_dir, exist_ok=True)
+        self._meta = self._load_meta()
+        self._frames = {}
+
+    ## --- Persistence ---
+    def _meta_path(self):
+        return os.path.join(self.store_dir, self.META_FILE)
+
+    def _load_meta(self):
+        try:
+            with open(self._meta_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError):
+            return {}
+
+    def _save_meta(self):
+        with open(self._meta_path(), "w", encoding="utf-8") as f:
+            json.dump(self._meta, f, indent=4)
+
+    def symbol_path(self, symbol, suffix=""):
+        """Path of the file holding the bars (or derived data, via `suffix`) of a symbol."""
+        safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in symbol)
+        return os.path.join(self.store_dir, f"{safe}{suffix}{FRAME_EXTENSION}")
+
+    def load(self, symbol):
+        """
+        Return every stored bar of `symbol` (empty DataFrame if nothing is stored).
+
+        Parameters
+        ----------
+        symbol : str
+            The ticker symbol.
+
+        Returns
+        -------
+        pd.DataFrame
+            OHLCV bars indexed by a tz-naive daily DatetimeIndex.
+        """
+        if symbol not in self._frames:
+            path = self.symbol_path(symbol)
+            if os.path.exists(path):
+                df = read_frame(path)
+            else:
+                df = pd.DataFrame(columns=PRICE_COLUMNS, index=pd.DatetimeIndex([], name="Date"))
+            self._frames[symbol] = df
+        return self._frames[symbol]
+
+    def _append(self, symbol, new_bars, fetched_start, fetched_end):
+        """
+        Merge freshly downloaded bars and add the fetched range to the covered intervals.
+
+        An empty download is recorded as covered only when the range holds no
+        weekday (weekends): otherwise it may be a transient Yahoo failure or a
+        rate limit, and the range stays missing so that the next request retries it.
+
+        Returns
+        -------
+        bool or None
+            True if the stored bars were on an older adjustment base and have
+            been dropped, False if the overlapping bars matched, None if there
+            was no settled stored bar to compare with.
+        """
+        rebased = self._check_base(symbol, new_bars)
+        if rebased:
+            self.reset(symbol)
+        stored = self.load(symbol)
+        if not new_bars.empty:
+            merged = pd.concat([stored, new_bars]) if not stored.empty else new_bars
+            merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+            write_frame(merged, self.symbol_path(symbol))
+            self._frames[symbol] = merged
+
+        ## Today's bar may still change: the settled coverage stops at today
+        today = pd.Timestamp(dt.date.today())
+        settled_end = min(fetched_end, today)
+        entry = self._meta.get(symbol, {})
+        intervals = self._covered_intervals(entry)
+        if fetched_start < settled_end:
+            in_range = new_bars.loc[(new_bars.index >= fetched_start) & (new_bars.index < fetched_end)]
+            weekdays = pd.bdate_range(fetched_start, settled_end - pd.Timedelta(days=1))
+            if not in_range.empty or weekdays.empty:
+                intervals.append((fetched_start, settled_end))
+        entry = {
+            "intervals": [[s.strftime("%Y-%m-%d"), e.strftime("%Y-%m-%d")] for s, e in _merge_intervals(intervals)],
+            "fetched_at": time.time(),
+        }
+        self._meta[symbol] = entry
+        self._save_meta()
+        return rebased
+
+    def reset(self, symbol):
+        """Forget every stored bar of `symbol` (file and coverage)."""
+        path = self.symbol_path(symbol)
+        if os.path.exists(path):
+            os.remove(path)
+        self._frames.pop(symbol, None)
+        self._meta.pop(symbol, None)
+        self._save_meta()
+
+    ## --- Adjustment base ---
+    def _check_base(self, symbol, new_bars):
+        """
+        Compare the settled stored bars with the same dates just downloaded.
+
+        Returns
+        -------
+        bool or None
+            True if the closes differ (Yahoo re-based the adjusted history),
+            False if they match, None if no date can be compared.
+        """
+        stored = self.load(symbol)
+        if stored.empty or new_bars.empty:
+            return None
+        common = stored.index.intersection(new_bars.index)
+        settled = np.zeros(len(common), dtype=bool)
+        for covered_start, covered_end in self.covered_intervals(symbol):
+            settled |= (common >= covered_start) & (common < covered_end)
+        common = common[settled]
+        if common.empty:
+            return None
+        old = stored.loc[common, "Close"].to_numpy(dtype=float)
+        new = new_bars.loc[common, "Close"].to_numpy(dtype=float)
+        if np.allclose(old, new, rtol=REBASE_RTOL, equal_nan=True):
+            return False
+        print(f"{symbol}: storico aggiustato ricalcolato da Yahoo (split/dividendo), le barre salvate vengono riscaricate")
+        return True
+
+    def _verify_base(self, symbol, ticker):
+        """Download the last settled week of `symbol` and drop its bars if Yahoo re-based them."""
+        intervals = self.covered_intervals(symbol)
+        if not intervals:
+            return False
+        covered_end = intervals[-1][1]
+        probe = self._normalize_bars(
+            ticker.history(start=covered_end - pd.Timedelta(days=OVERLAP_DAYS), end=covered_end, auto_adjust=True)
+        )
+        if self._check_base(symbol, probe):
+            self.reset(symbol)
+            return True
+        return False
+
+    ## --- Coverage ---
+    def missing_ranges(self, symbol, start_date, end_date):
+        """
+        Return the [start, end) date ranges not yet stored for `symbol`.
+
+        Parameters
+        ----------
+        symbol : str
+            The ticker symbol.
+        start_date, end_date : str or datetime-like
+            Requested range, end excluded (same convention as yfinance).
+
+        Returns
+        -------
+        list of tuple(pd.Timestamp, pd.Timestamp)
+            The ranges that must be downloaded.
+        """
+        start, end = pd.Timestamp(start_date).normalize(), pd.Timestamp(end_date).normalize()
+        entry = self._meta.get(symbol)
+        if entry is None:
+            return [(start, end)] if start < end else []
+
+        ## Buchi tra gli intervalli già scaricati, dentro [start, end)
+        ranges, cursor = [], start
+        for covered_start, covered_end in self._covered_intervals(entry):
+            if covered_end <= cursor:
+                continue
+            if covered_start >= end:
+                break
+            if cursor < covered_start:
+                ranges.append((cursor, covered_start))
+            cursor = max(cursor, covered_end)
+        if cursor < end:
+            recently_fetched = time.time() - entry.get("fetched_at", 0) < self.intraday_max_age
+            only_today_missing = cursor >= pd.Timestamp(dt.date.today())
+            if not (only_today_missing and recently_fetched):
+                ranges.append((cursor, end))
+        return [(s, e) for s, e in ranges if s < e]
+
+    def covered_intervals(self, symbol):
+        """Sorted, disjoint [start, end) date intervals already stored for `symbol`."""
+        return self._covered_intervals(self._meta.get(symbol, {}))
+
+    @staticmethod
+    def _covered_intervals(entry):
+        """Sorted, disjoint [start, end) intervals already stored (older entries hold a single start/end)."""
+        if "intervals" in entry:
+            raw = entry["intervals"]
+        elif "start" in entry:
+            raw = [[entry["start"], entry["end"]]]
+        else:
+            raw = []
+        return _merge_intervals([(pd.Timestamp(s), pd.Timestamp(e)) for s, e in raw])
+
+    ## --- Download ---
+    @staticmethod
+    def _normalize_bars(hist_data):
+        """Keep OHLCV columns and use a tz-naive daily index."""
+        if hist_data is None or hist_data.empty:
+            return pd.DataFrame(columns=PRICE_COLUMNS, index=pd.DatetimeIndex([], name="Date"))
+        bars = hist_data[[c for c in PRICE_COLUMNS if c in hist_data.columns]].dropna(how="all")
+        index = pd.DatetimeIndex(bars.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        bars.index = index.normalize().rename("Date")
+        return bars
+
+    def get_history(self, symbol, start_date, end_date, stock_data=None):
+        """
+        Return the daily bars of `symbol` in [start_date, end_date), downloading only what is missing.
+
+        Parameters
+        ----------
+        symbol : str
+            The ticker symbol.
+        start_date, end_date : str or datetime-like
+            Requested range, end excluded.
+        stock_data : yf.Ticker, optional
+            Ticker object to reuse for the download.
+
+        Returns
+        -------
+        pd.DataFrame
+            OHLCV bars indexed by a tz-naive daily DatetimeIndex.
+        """
+        overlap = pd.Timedelta(days=OVERLAP_DAYS)
+        ticker = None
+        ## Secondo giro solo se lo storico salvato è stato scartato perché ri-basato
+        for _ in range(2):
+            ranges = self.missing_ranges(symbol, start_date, end_date)
+            if not ranges:
+                break
+            if ticker is None:
+                ticker = stock_data if isinstance(stock_data, yf.Ticker) else yf.Ticker(symbol)
+            had_bars = bool(self.covered_intervals(symbol))
+            compared = rebased = False
+            for range_start, range_end in ranges:
+                new_bars = self._normalize_bars(
+                    ticker.history(start=range_start - overlap, end=range_end + overlap, auto_adjust=True)
+                )
+                status = self._append(symbol, new_bars, range_start, range_end)
+                if status:
+                    rebased = True
+                    break
+                compared = compared or status is not None
+            if rebased:
+                continue
+            # Buco lontano dalle barre salvate: nessuna sovrapposizione, si verifica l'ultima settimana
+            if had_bars and not compared and self._verify_base(symbol, ticker):
+                continue
+            break
+        stored = self.load(symbol)
+        return stored.loc[(stored.index >= pd.Timestamp(start_date)) & (stored.index < pd.Timestamp(end_date))]
+
+    def get_many(self, symbols, start_date, end_date):
+        """
+        Return the daily bars of many symbols, using a single bulk `yf.download` for the missing ones.
+
+        Parameters
+        ----------
+        symbols : list of str
+            The ticker symbols.
+        start_date, end_date : str or datetime-like
+            Requested range, end excluded.
+
+        Returns
+        -------
+        dict
+            symbol -> OHLCV DataFrame indexed by a tz-naive daily DatetimeIndex.
+        """
+        to_fetch = {s: self.missing_ranges(s, start_date, end_date) for s in symbols}
+        to_fetch = {s: r for s, r in to_fetch.items() if r}
+        if to_fetch:
+            ## One request covering the union of all the missing ranges
+            bulk_start = min(r[0][0] for r in to_fetch.values())
+            bulk_end = max(r[-1][1] for r in to_fetch.values())
+            overlap = pd.Timedelta(days=OVERLAP_DAYS)
+            bulk = yf.download(
+                list(to_fetch), start=bulk_start - overlap, end=bulk_end + overlap,
+                group_by="ticker", auto_adjust=True, threads=True, progress=False,
+            )
+            for symbol in to_fetch:
+                if isinstance(bulk.columns, pd.MultiIndex):
+                    symbol_bars = bulk[symbol] if symbol in bulk.columns.get_level_values(0) else None
+                else:
+                    symbol_bars = bulk
+                had_bars = bool(self.covered_intervals(symbol))
+                status = self._append(symbol, self._normalize_bars(symbol_bars), bulk_start, bulk_end)
+                # Senza sovrapposizione con le barre salvate la base si verifica a parte
+                if status is None and had_bars:
+                    self._verify_base(symbol, yf.Ticker(symbol))
+        return {s: self.get_history(s, start_date, end_date) for s in symbols}
+
+
+_default_store = None
+
+
+def get_default_price_store():
+    """Return the process-wide PriceStore rooted at DEFAULT_STORE_DIR (created on first use)."""
+    global _default_store
+    if _default_store is None:
+        _default_store = PriceStore()
+    return _default_store
@@ -0,0 +1,338 @@
+##Streaming statistics: running moments and fixed-bin histograms fed chunk by chunk, running sums/means over series
+import numpy as np
+import pandas as pd
+
+
+class RunningMoments:
+    """
+    Count, mean, variance, min and max of a stream, updated one chunk at a time
+    (Chan et al. parallel update, numerically stable like Welford).
+
+    Parameters
+    ----------
+    n_series : int, optional
+        Number of independent series updated together (values of shape
+        (n_series, k)); None for a single 1-D stream.
+    """
+
+    def __init__(self, n_series=None):
+        shape = () if n_series is None else (n_series,)
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+        self.min = np.full(shape, np.inf)
+        self.max = np.full(shape, -np.inf)
+
+    def update(self, values):
+        """Add a chunk of values (1-D, or (n_series, k))."""
+        values = np.asarray(values, dtype=np.float64)
+        n = values.shape[-1]
+        if n == 0:
+            return self
+        chunk_mean = values.mean(axis=-1)
+        chunk_m2 = ((values - chunk_mean[..., None]) ** 2).sum(axis=-1)
+        self._combine(n, chunk_mean, chunk_m2, values.min(axis=-1), values.max(axis=-1))
+        return self
+
+    def merge(self, other):
+        """Combine with the moments of another stream (e.g. from another process)."""
+        self._combine(other.count, other.mean, other.m2, other.min, other.max)
+        return self
+
+    def _combine(self, n, mean, m2, vmin, vmax):
+        total = self.count + n
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = mean - self.mean
+            self.mean = np.where(total > 0, self.mean + delta * n / total, 0.0)
+            self.m2 = np.where(total > 0, self.m2 + m2 + delta**2 * self.count * n / total, 0.0)
+        self.count = total
+        self.min = np.minimum(self.min, vmin)
+        self.max = np.maximum(self.max, vmax)
+
+    @property
+    def variance(self):
+        """Population variance (ddof=0)."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.count > 0, self.m2 / self.count, np.nan)
+
+    @property
+    def std(self):
+        """Population standard deviation (ddof=0)."""
+        return np.sqrt(self.variance)
+
+
+class StreamingHistogram:
+    """
+    Fixed-bin histogram over [lo, hi) with underflow/overflow counters,
+    updated one chunk at a time; quantiles are read from the cumulative
+    counts with linear interpolation inside the bin (error below one bin width).
+
+    Memory is n_bins counters per series, whatever the number of samples.
+
+    Parameters
+    ----------
+    lo, hi : float or np.ndarray
+        Range of the bins (one range per series when arrays).
+    n_bins : int, optional
+        Number of bins, default 2048.
+    n_series : int, optional
+        Number of independent series updated together (values of shape
+        (n_series, k)); None for a single 1-D stream.
+    log_scale : bool, optional
+        Bins evenly spaced in log(value) (positive data such as prices): the
+        error of the quantiles is then relative to the value, not absolute.
+    """
+
+    def __init__(self, lo, hi, n_bins=2048, n_series=None, log_scale=False):
+        self.n_series = n_series
+        self.log_scale = log_scale
+        rows = 1 if n_series is None else n_series
+        self.lo = self._forward(np.broadcast_to(np.asarray(lo, dtype=np.float64), (rows,)).copy())
+        self.hi = self._forward(np.broadcast_to(np.asarray(hi, dtype=np.float64), (rows,)).copy())
+        if np.any(self.hi <= self.lo):
+            raise ValueError("hi must be greater than lo")
+        self.n_bins = n_bins
+        ## Colonna 0 = underflow, colonne 1..n_bins = bin, ultima = overflow
+        self.counts = np.zeros((rows, n_bins + 2), dtype=np.int64)
+
+    @classmethod
+    def from_sample(cls, values, n_bins=2048, margin=0.5):
+        """
+        Histogram whose range covers a first sample widened by `margin` times its span.
+
+        Parameters
+        ----------
+        values : np.ndarray
+            First chunk of a 1-D stream (it is not added to the counts).
+        n_bins : int, optional
+            Number of bins.
+        margin : float, optional
+            Fraction of the sample span added on each side.
+        """
+        vmin, vmax = float(np.min(values)), float(np.max(values))
+        span = (vmax - vmin) or abs(vmax) or 1.0
+        return cls(vmin - margin * span, vmax + margin * span, n_bins)
+
+    def _forward(self, values):
+        return np.log(values) if self.log_scale else values
+
+    def _inverse(self, values):
+        return np.exp(values) if self.log_scale else values
+
+    @property
+    def bin_width(self):
+        return (self.hi - self.lo) / self.n_bins
+
+    def _edges(self):
+        return self.lo[:, None] + self.bin_width[:, None] * np.arange(self.n_bins + 1)
+
+    def update(self, values):
+        """Add a chunk of values (1-D, or (n_series, k))."""
+        values = self._forward(np.atleast_2d(np.asarray(values, dtype=np.float64)))
+        scaled = (values - self.lo[:, None]) / self.bin_width[:, None]
+        columns = np.clip(np.floor(scaled), -1, self.n_bins).astype(np.int64) + 1
+        rows = np.arange(columns.shape[0])[:, None] * (self.n_bins + 2)
+        self.counts += np.bincount((rows + columns).ravel(), minlength=self.counts.size).reshape(self.counts.shape)
+        return self
+
+    def merge(self, other):
+        """Add the counts of a histogram with the same bins."""
+        self.counts += other.counts
+        return self
+
+    @property
+    def total(self):
+        total = self.counts.sum(axis=1)
+        return total[0] if self.n_series is None else total
+
+    def quantile(self, q):
+        """
+        Approximate quantile(s) of the stream.
+
+        Parameters
+        ----------
+        q : float or array-like
+            Probabilities in [0, 1].
+
+        Returns
+        -------
+        float or np.ndarray
+            Shape of `q` for a single stream, (n_series,) + shape of `q` otherwise.
+            Quantiles falling in the underflow/overflow counters are clamped to lo/hi.
+        """
+        q = np.asarray(q, dtype=np.float64)
+        cumulative = np.cumsum(self.counts, axis=1)
+        targets = q.reshape(1, -1) * cumulative[:, -1:]
+        edges = self._edges()
+        ## Conteggio cumulativo a ogni bordo dei bin (il primo bordo include l'underflow)
+        at_edges = cumulative[:, :-1]
+        upper = np.stack([np.searchsorted(at_edges[row], targets[row]) for row in range(len(at_edges))])
+        upper = np.clip(upper, 1, self.n_bins)
+        below = np.take_along_axis(at_edges, upper - 1, axis=1)
+        in_bin = np.take_along_axis(at_edges, upper, axis=1) - below
+        with np.errstate(invalid="ignore", divide="ignore"):
+            fraction = np.clip(np.where(in_bin > 0, (targets - below) / in_bin, 0.0), 0, 1)
+        result = np.take_along_axis(edges, upper - 1, axis=1) + fraction * self.bin_width[:, None]
+        result = self._inverse(result).reshape((-1,) + q.shape)
+        return result[0] if self.n_series is None else result
+
+    def count_below(self, values):
+        """
+        Approximate number of values < each of `values` (single stream),
+        interpolating linearly inside the bin.
+        """
+        cumulative = np.cumsum(self.counts[0])
+        return np.interp(self._forward(np.asarray(values, dtype=np.float64)), self._edges()[0], cumulative[:-1])
+
+    def histogram(self, bins=None):
+        """
+        Counts of a single stream, without underflow/overflow.
+
+        Parameters
+        ----------
+        bins : int or np.ndarray, optional
+            None for the native bins, a number of equal-width bins between the
+            observed range of the counts, or explicit bin edges. Coarser bins
+            are re-binned from the cumulative counts.
+
+        Returns
+        -------
+        (np.ndarray, np.ndarray)
+            The counts and the bin edges.
+        """
+        if bins is None:
+            return self.counts[0, 1:-1], self._inverse(self._edges()[0])
+        if np.ndim(bins) == 0:
+            filled = np.flatnonzero(self.counts[0, 1:-1])
+            if len(filled) == 0:
+                return np.zeros(int(bins)), self._inverse(np.linspace(self.lo[0], self.hi[0], int(bins) + 1))
+            edges = self._edges()[0]
+            bins = np.linspace(self._inverse(edges[filled[0]]), self._inverse(edges[filled[-1] + 1]), int(bins) + 1)
+        return np.diff(self.count_below(bins)), np.asarray(bins, dtype=np.float64)
+
+
+def freedman_diaconis_bins(q25, q75, count, vmin, vmax):
+    """
+    Number of histogram bins from the Freedman–Diaconis rule (width = 2 IQR n^(-1/3)).
+
+    Parameters
+    ----------
+    q25, q75 : float
+        First and third quartile.
+    count : int
+        Number of samples.
+    vmin, vmax : float
+        Range of the data.
+
+    Returns
+    -------
+    int
+        The number of bins (at least 1).
+    """
+    width = 2 * (q75 - q25) * count ** (-1 / 3)
+    if width <= 0:
+        return 1
+    return max(1, int(np.ceil((vmax - vmin) / width)))
+
+
+## --- Running statistics over a whole series, O(n) with cumulative sums ---
+def cumulative_sum(values):
+    """
+    Running total of a series.
+
+    Parameters
+    ----------
+    values : array-like
+        The values, in order.
+
+    Returns
+    -------
+    (np.ndarray, float)
+        The cumulative sums and the final total (0 for an empty series).
+    """
+    running = np.cumsum(np.asarray(values, dtype=float))
+    return running, float(running[-1]) if len(running) else 0.0
+
+
+def running_mean(values):
+    """
+    Mean of the first 1, 2, ..., n values (expanding mean).
+
+    Parameters
+    ----------
+    values : array-like
+        The values, in order.
+
+    Returns
+    -------
+    np.ndarray
+        The running means.
+    """
+    values = np.asarray(values, dtype=float)
+    return np.cumsum(values) / np.arange(1, len(values) + 1)
+
+
+def rolling_sum(values, window):
+    """
+    Sum of the last `window` values (NaN until `window` values are available).
+
+    Parameters
+    ----------
+    values : array-like
+        The values, in order.
+    window : int
+        Number of values in the window.
+
+    Returns
+    -------
+    np.ndarray
+        The rolling sums.
+    """
+    values = np.asarray(values, dtype=float)
+    result = np.full(len(values), np.nan)
+    if window > len(values):
+        return result
+    running = np.concatenate([[0.0], np.cumsum(values)])
+    result[window - 1:] = running[window:] - running[:len(running) - window]
+    return result
+
+
+def rolling_mean(values, window):
+    """
+    Mean of the last `window` values (NaN until `window` values are available),
+    e.g. window=12 on monthly data for the mean of the last year.
+
+    Parameters
+    ----------
+    values : array-like
+        The values, in order.
+    window : int
+        Number of values in the window.
+
+    Returns
+    -------
+    np.ndarray
+        The rolling means.
+    """
+    return rolling_sum(values, window) / window
+
+
+def ewma(values, span=None, alpha=None):
+    """
+    Exponentially weighted moving average (adjust=False: y_t = a x_t + (1 - a) y_{t-1}).
+
+    Parameters
+    ----------
+    values : array-like
+        The values, in order.
+    span : float, optional
+        Span of the average, alpha = 2 / (span + 1).
+    alpha : float, optional
+        Smoothing factor in (0, 1], used when `span` is not given.
+
+    Returns
+    -------
+    np.ndarray
+        The smoothed values.
+    """
+    return pd.Series(np.asarray(values, dtype=float)).ewm(span=span, alpha=alpha, adjust=False).mean().to_numpy()
@@ -1,5 +1,12 @@
 ##Generic library for Array and Data-time format
 import datetime as dt
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import pandas as pd
 
@@ -11,7 +18,18 @@ from ipywidgets import interactive, HBox, VBox, widgets, Layout, ToggleButton, f
 ##Generic library to retrieve stock-Data
 import yfinance as yf
 import requests
-from io import StringIO
+from io import BytesIO
+from modules.price_store_utils import DEFAULT_STORE_DIR, get_default_price_store
+from modules.indicator_utils import compute_indicators, get_default_indicator_engine
+from modules.plot_utils import (
+    MAX_POINTS_PER_TRACE,
+    WEBGL_THRESHOLD,
+    downsample_range,
+    enable_zoom_resampling,
+    line_trace,
+    resample_traces,
+)
+from modules.dca_utils import dca_purchase_dates, purchase_positions, simulate_dca
 
 ##Return the yfinance.Ticker object that stores all the relevant stock informations
 from pandas import DataFrame
@@ -34,32 +52,123 @@ def month_year():
     now = dt.datetime.now()
     return now.day, now.month, now.year
     
-def collect_data_from_github(github_raw_url):
+##Local mirror of the GitHub-hosted CSV files, revalidated with ETag / If-None-Match
+GITHUB_MIRROR_DIR = os.path.join("data", "github_mirror")
+
+
+def _mirror_paths(github_raw_url, mirror_dir):
+    key = hashlib.sha1(github_raw_url.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(mirror_dir, f"{key}.csv"), os.path.join(mirror_dir, f"{key}.json")
+
+
+def _read_mirror_meta(meta_path):
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, FileNotFoundError):
+        return None
+
+
+def _replace_file(path, content):
+    """Write `content` (bytes) to a temporary file next to `path`, then swap it in atomically."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _revalidate_mirror(github_raw_url, mirror_dir):
+    """
+    Conditional GET of the raw file: on 200 the mirror is rewritten, on 304
+    only its timestamp is refreshed. Files are replaced atomically, so a
+    concurrent reader sees either the old or the new mirror. Returns the file
+    content as bytes.
+    """
+    csv_path, meta_path = _mirror_paths(github_raw_url, mirror_dir)
+    meta = _read_mirror_meta(meta_path) if os.path.exists(csv_path) else None
+    headers = {}
+    if meta and meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta and meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    response = requests.get(github_raw_url, headers=headers, timeout=10)
+    if response.status_code == 304 and meta is not None:
+        meta["fetched_at"] = time.time()
+        with open(csv_path, "rb") as f:
+            content = f.read()
+    else:
+        response.raise_for_status()  # Solleva un errore se la risposta non è 200
+        content = response.content
+        meta = {
+            "url": github_raw_url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+        }
+        _replace_file(csv_path, content)
+    _replace_file(meta_path, json.dumps(meta, indent=4).encode("utf-8"))
+    return content
+
+
+def _revalidate_in_background(github_raw_url, mirror_dir):
+    try:
+        _revalidate_mirror(github_raw_url, mirror_dir)
+    except Exception as e:
+        print(f"Warning: background refresh of {github_raw_url} failed: {e}")
+
+
+def collect_data_from_github(github_raw_url, max_age=0, stale_while_revalidate=False, mirror_dir=GITHUB_MIRROR_DIR):
     """
     Collect data from a GitHub raw URL into a pandas DataFrame.
 
+    The file is mirrored locally: a mirror younger than `max_age` seconds is
+    used without any request, otherwise it is revalidated with a conditional
+    GET (one 304 round trip when unchanged). When the network is unavailable
+    the last mirrored copy is used.
+
     Parameters
     ----------
     github_raw_url : str
         The URL of the raw file on GitHub.
+    max_age : int, optional
+        Seconds during which the mirror is used without revalidation, default 0.
+    stale_while_revalidate : bool, optional
+        If True and a mirror exists, return it immediately and revalidate it
+        in a background thread for the next call, default False.
+    mirror_dir : str, optional
+        Directory of the local mirror, default GITHUB_MIRROR_DIR.
 
     Returns
     -------
     pd.DataFrame or None
         The DataFrame loaded from the file, or None if an error occurred.
     """
+    csv_path, meta_path = _mirror_paths(github_raw_url, mirror_dir)
+    meta = _read_mirror_meta(meta_path) if os.path.exists(csv_path) else None
     try:
-        # L'URL del contenuto raw su GitHub (senza token nell'URL)
-        # Esegui la richiesta GET
-        response = requests.get(github_raw_url)
-        response.raise_for_status()  # Solleva un errore se la risposta non è 200
-
-        # Leggi il contenuto del file come CSV
-        csvfile = StringIO(response.text)
-        df = pd.read_csv(csvfile, sep=';', header=0)
-        
-        # Ritorna il DataFrame
-        return df
+        if meta is not None and time.time() - meta.get("fetched_at", 0) < max_age:
+            return pd.read_csv(csv_path, sep=';', header=0)
+        if meta is not None and stale_while_revalidate:
+            # Prima si legge la copia locale, poi parte l'aggiornamento per la prossima chiamata
+            data = pd.read_csv(csv_path, sep=';', header=0)
+            threading.Thread(target=_revalidate_in_background, args=(github_raw_url, mirror_dir), daemon=True).start()
+            return data
+        try:
+            content = _revalidate_mirror(github_raw_url, mirror_dir)
+        except requests.RequestException as e:
+            if meta is None:
+                raise
+            print(f"Warning: {e}. Using the local copy of {github_raw_url}")
+            return pd.read_csv(csv_path, sep=';', header=0)
+        # Leggi il contenuto del file come CSV direttamente dai bytes
+        return pd.read_csv(BytesIO(content), sep=';', header=0)
     except Exception as e:
         print(f"Error: {e}")
         return None
@@ -78,15 +187,290 @@ def get_stock_data(isin_string):
         return None
 
 
+##Portfolio metadata cache: name/currency/type change rarely, last prices come from one bulk request
+PORTFOLIO_INFO_CACHE = os.path.join(DEFAULT_STORE_DIR, "_info_cache.json")
+PORTFOLIO_INFO_FIELDS = ["shortName", "currency", "quoteType"]
+
+
+def _load_info_cache():
+    try:
+        with open(PORTFOLIO_INFO_CACHE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, FileNotFoundError):
+        return {}
+
+
+def _save_info_cache(cache):
+    os.makedirs(os.path.dirname(PORTFOLIO_INFO_CACHE), exist_ok=True)
+    with open(PORTFOLIO_INFO_CACHE, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=4)
+
+
+def _download_info(symbol):
+    """Essential metadata of a symbol, or None if Yahoo Finance does not know it."""
+    try:
+        info = yf.Ticker(symbol).info
+        if not info or info.get("quoteType") in (None, "NONE"):
+            return None
+        return {field: info.get(field) for field in PORTFOLIO_INFO_FIELDS}
+    except Exception:
+        return None
+
+
+def get_last_prices(symbols):
+    """
+    Return the last available close of every symbol with a single bulk download.
+
+    Parameters
+    ----------
+    symbols : list of str
+        The ticker symbols.
+
+    Returns
+    -------
+    pd.Series
+        symbol -> last close (NaN for symbols without recent data).
+    """
+    symbols = list(symbols)
+    try:
+        bulk = yf.download(symbols, period="5d", group_by="ticker", auto_adjust=True, threads=True, progress=False)
+    except Exception as e:
+        print(f"Error: {e}")
+        return pd.Series(np.nan, index=symbols, dtype=float)
+    last_prices = {}
+    for symbol in symbols:
+        if isinstance(bulk.columns, pd.MultiIndex):
+            closes = bulk[symbol]["Close"] if symbol in bulk.columns.get_level_values(0) else pd.Series(dtype=float)
+        else:
+            closes = bulk["Close"]
+        closes = closes.dropna()
+        last_prices[symbol] = float(closes.iloc[-1]) if not closes.empty else np.nan
+    return pd.Series(last_prices, dtype=float)
+
+
+def load_portfolio(symbols, max_workers=8, info_max_age=86400):
+    """
+    Validate a list of symbols and collect their metadata and last price.
+
+    Last prices come from one bulk `yf.download`; metadata are read from a
+    local cache (valid `info_max_age` seconds) and only the missing ones are
+    downloaded, concurrently.
+
+    Parameters
+    ----------
+    symbols : iterable of str
+        The ticker symbols (e.g. the "Symbol" column of My_Portfolio.csv).
+    max_workers : int, optional
+        Threads used for the metadata requests, default 8.
+    info_max_age : int, optional
+        Validity of the cached metadata in seconds, default one day.
+
+    Returns
+    -------
+    stock_data_object : dict
+        symbol -> yf.Ticker, only for the valid symbols.
+    portfolio_info : pd.DataFrame
+        Indexed by symbol, with the PORTFOLIO_INFO_FIELDS columns and "last_price".
+    """
+    symbols = list(dict.fromkeys(s for s in symbols if pd.notna(s)))
+    last_prices = get_last_prices(symbols)
+
+    cache = _load_info_cache()
+    now = time.time()
+    infos = {s: cache[s]["data"] for s in symbols if s in cache and now - cache[s]["timestamp"] < info_max_age}
+    missing = [s for s in symbols if s not in infos]
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as pool:
+            downloaded = dict(zip(missing, pool.map(_download_info, missing)))
+        for symbol, info in downloaded.items():
+            if info is not None:
+                infos[symbol] = info
+                cache[symbol] = {"timestamp": now, "data": info}
+        _save_info_cache(cache)
+
+    valid = [s for s in symbols if s in infos or pd.notna(last_prices.get(s))]
+    for symbol in symbols:
+        if symbol not in valid:
+            print(f"Errore nel recuperare i dati per {symbol}: simbolo non trovato")
+
+    portfolio_info = pd.DataFrame(
+        [{**{f: infos.get(s, {}).get(f) for f in PORTFOLIO_INFO_FIELDS}, "last_price": last_prices.get(s)} for s in valid],
+        index=pd.Index(valid, name="symbol"),
+    )
+    return {s: yf.Ticker(s) for s in valid}, portfolio_info
+
+
+def prefetch_price_history(symbols, start_date, end_date):
+    """
+    Download in one bulk request the daily bars still missing from the local
+    price store, so that the following `get_stock_with_date_index_data` calls
+    are served from disk.
+
+    Parameters
+    ----------
+    symbols : list of str
+        The ticker symbols of the portfolio.
+    start_date : str
+        The first date of the price history.
+    end_date : str
+        The last date of the price history (excluded).
+
+    Returns
+    -------
+    dict
+        symbol -> DataFrame with the OHLCV bars, or None if an error occurred.
+    """
+    try:
+        return get_default_price_store().get_many(list(symbols), start_date, end_date)
+    except Exception as e:
+        print(f"Error: {e}")
+        return None
+
+##Return the hystorical data with a native DatetimeIndex and compact dtypes --> Suitable for multi-symbol analysis
+PRICE_FRAME_COLUMNS = ["symbol", "category", "stock_price", "volume", "MA200", "OBV"]
+
+
+def _empty_price_frame(full_date_range):
+    """Typed empty frame returned when the price history cannot be retrieved."""
+    return pd.DataFrame(
+        {
+            "symbol": pd.Categorical([None] * len(full_date_range)),
+            "category": pd.Categorical([None] * len(full_date_range)),
+            "stock_price": np.full(len(full_date_range), np.nan, dtype="float32"),
+            "volume": np.zeros(len(full_date_range), dtype="int64"),
+            "MA200": np.full(len(full_date_range), np.nan, dtype="float32"),
+            "OBV": np.zeros(len(full_date_range), dtype="int64"),
+        },
+        index=full_date_range,
+    )
+
+
+def get_stock_price_frame(
+    stock_data, category, start_date, end_date, ma_period=200, use_price_store=True
+) -> DataFrame:
+    """
+    Restituisce la storia giornaliera dei prezzi di un titolo indicizzata
+    per data (DatetimeIndex), con colonne a tipo compatto:
+    "stock_price"/"MA200" float32, "volume"/"OBV" int64,
+    "symbol"/"category" categoriche.
+
+    MA e OBV (cumulato) sono calcolati sulle sedute di contrattazione, sull'intero
+    storico disponibile; i giorni senza contrattazione (weekend, festivi)
+    riportano l'ultimo prezzo, volume e indicatore noti.
+
+    Parameters
+    ----------
+    stock_data : yf.Ticker
+        L'oggetto Ticker di YahooFinance
+    category : str
+        La categoria del titolo
+    start_date : str or datetime-like
+        La data di inizio della storia dei prezzi
+    end_date : str or datetime-like
+        La data di fine della storia dei prezzi
+    ma_period : int, optional
+        Il numero di periodi per la Moving Average, default 200
+    use_price_store : bool, optional
+        Se True i prezzi vengono letti dallo store locale (data/price_store)
+        e scaricati solo per le date mancanti, default True
+
+    Returns
+    -------
+    pd.DataFrame
+        Il DataFrame indicizzato per data con le colonne PRICE_FRAME_COLUMNS
+    """
+    full_date_range = pd.date_range(start=start_date, end=end_date, freq="D", name="Date")
+    try:
+        if not isinstance(stock_data, yf.Ticker):
+            raise ValueError(f"stock_data must be a yf.Ticker object, got {type(stock_data)} instead.")
+        indicator_names = [f"SMA{ma_period}", "OBV"]
+        if use_price_store:
+            hist_data = get_default_price_store().get_history(
+                stock_data.ticker, start_date, end_date, stock_data=stock_data
+            )
+            # Indicatori sull'intero storico salvato, aggiornati solo sui bar nuovi
+            indicators = get_default_indicator_engine().update(stock_data.ticker, indicator_names)
+        else:
+            hist_data = stock_data.history(start=start_date, end=end_date)
+            if hist_data.index.tz is not None:
+                hist_data.index = hist_data.index.tz_localize(None)
+            hist_data.index = hist_data.index.normalize()
+            indicators, _ = compute_indicators(hist_data, indicator_names)
+
+        # Giorni di calendario: weekend e festivi riportano l'ultimo valore noto
+        stock_price = hist_data["Close"].reindex(full_date_range).ffill().astype("float32")
+        volume = hist_data["Volume"].reindex(full_date_range).ffill().fillna(0).astype("int64")
+        indicators = indicators.reindex(hist_data.index).reindex(full_date_range).ffill()
 
-##Return the hystorical data with date expressed as string --> Suitable for calculations
+        hist_data_to_return = pd.DataFrame(
+            {
+                "symbol": pd.Categorical([stock_data.ticker] * len(full_date_range)),
+                "category": pd.Categorical([category] * len(full_date_range)),
+                "stock_price": stock_price,
+                "volume": volume,
+                # Media mobile sulle ultime ma_period sedute di contrattazione
+                "MA200": indicators[f"SMA{ma_period}"].astype("float32"),
+                # Indicatore OBV cumulato
+                "OBV": indicators["OBV"].fillna(0).astype("int64"),
+            },
+            index=full_date_range,
+        )
+        return hist_data_to_return
+    except Exception as e:
+        print(f"Error: {e}")
+        return _empty_price_frame(full_date_range)
+
+
+def concat_price_frames(price_frames):
+    """
+    Stack the frames of several symbols keeping "symbol" and "category" categorical.
+
+    Parameters
+    ----------
+    price_frames : iterable of pd.DataFrame
+        Frames returned by `get_stock_price_frame`.
+
+    Returns
+    -------
+    pd.DataFrame
+        One long frame indexed by date, one block of rows per symbol.
+    """
+    # pd.concat falls back to object dtype when the categories differ
+    return pd.concat(list(price_frames)).astype({"symbol": "category", "category": "category"})
+
+
+def to_string_date_index(price_frame):
+    """
+    Convert a frame returned by `get_stock_price_frame` to the legacy layout:
+    "%Y-%m-%d" string index, float64 numeric columns and object symbol/category.
+
+    Parameters
+    ----------
+    price_frame : pd.DataFrame
+        Frame indexed by a DatetimeIndex.
+
+    Returns
+    -------
+    pd.DataFrame
+        The same data indexed by date strings.
+    """
+    legacy = price_frame.astype(
+        {"symbol": object, "category": object, "stock_price": "float64", "volume": "float64", "MA200": "float64", "OBV": "float64"}
+    )
+    legacy.index = price_frame.index.strftime("%Y-%m-%d")
+    return legacy
+
+
+##Return the hystorical data with date expressed as string --> Kept for the existing notebooks
 def get_stock_with_date_index_data(
-    stock_data, category, start_date, end_date, ma_period=200
+    stock_data, category, start_date, end_date, ma_period=200, use_price_store=True
 ) -> DataFrame | DataFrame:
     """
     Restituisce un DataFrame con la storia dei prezzi di un titolo
     e relativi volumi, insieme a due indicatori tecnici calcolati
-    (Moving Average a 200 periodi e On Balance Volume)
+    (Moving Average a 200 periodi e On Balance Volume).
+    Indice con le date in formato stringa "%Y-%m-%d": per nuove analisi
+    usare `get_stock_price_frame`, che mantiene il DatetimeIndex.
 
     Parameters
     ----------
@@ -100,6 +484,9 @@ def get_stock_with_date_index_data(
         La data di fine della storia dei prezzi
     ma_period : int, optional
         Il numero di periodi per la Moving Average, default 200
+    use_price_store : bool, optional
+        Se True i prezzi vengono letti dallo store locale (data/price_store)
+        e scaricati solo per le date mancanti, default True
 
     Returns
     -------
@@ -107,126 +494,66 @@ def get_stock_with_date_index_data(
         Il DataFrame con la storia dei prezzi e relativi volumi,
         insieme alle due colonne "MA200" e "OBV"
     """
-    full_date_range = pd.date_range(start=start_date, end=end_date, freq="D")
-    try:
-        if isinstance(stock_data, yf.Ticker):
-            hist_data = stock_data.history(start=start_date, end=end_date)
-            hist_data.index = hist_data.index.strftime("%Y-%m-%d")
-            hist_data = hist_data.reindex(full_date_range.strftime("%Y-%m-%d"))
-            hist_data.infer_objects().ffill(inplace=True)
-
-            hist_data_to_return = pd.DataFrame(
-                index=full_date_range.strftime("%Y-%m-%d"),
-                columns=["symbol","category","stock_price", "volume", "MA200", "OBV"],
-            )
-            hist_data_to_return["stock_price"] = hist_data["Close"]
-            hist_data_to_return["volume"] = hist_data["Volume"]
-            hist_data_to_return["category"] = category
-            hist_data_to_return["symbol"] = stock_data.ticker
-            hist_data_to_return["MA200"] = (
-                hist_data_to_return["stock_price"].rolling(window=ma_period).mean()
-            )
-
-            # Calcolo dell'indicatore OBV
-            hist_data_to_return["OBV"] = np.where(
-                hist_data_to_return["stock_price"].diff() > 0,  # type: ignore
-                hist_data_to_return["volume"],
-                -hist_data_to_return["volume"],
-            )
-            with warnings.catch_warnings():
-                warnings.simplefilter('ignore', FutureWarning)
-                hist_data_to_return.ffill(inplace=True)
-            return hist_data_to_return
-        else:
-            raise ValueError(f"stock_data must be a yf.Ticker object, got {type(stock_data)} instead.")
-    except Exception as e:
-        print(f"Error: {e}")
-        hist_data_to_return = pd.DataFrame(
-            index=full_date_range.strftime("%Y-%m-%d"),
-            columns=["symbol","stock_price", "volume", "MA200", "OBV"],
+    return to_string_date_index(
+        get_stock_price_frame(
+            stock_data, category, start_date, end_date, ma_period=ma_period, use_price_store=use_price_store
         )
-        return hist_data_to_return
+    )
 
 def get_info_investment(
     stock_data, invested_capital, start_date, end_date, purchase_frequency
 ):
+    """
+    Simula un piano di accumulo (DCA) sul prezzo giornaliero del titolo.
+
+    Il capitale è diviso in parti uguali tra le date di acquisto generate da
+    `purchase_frequency`; quote, costo medio e valore di mercato sono calcolati
+    in forma vettoriale da `dca_utils.simulate_dca`.
+
+    Parameters
+    ----------
+    stock_data : pd.DataFrame
+        Storia dei prezzi (da `get_stock_price_frame` o `get_stock_with_date_index_data`)
+    invested_capital : float
+        Il capitale totale da investire
+    start_date : str
+        La data del primo acquisto possibile
+    end_date : str
+        La data di fine del piano
+    purchase_frequency : str
+        La frequenza di acquisto in formato pandas (es. "1M", "3M")
+
+    Returns
+    -------
+    dict
+        Serie giornaliere "average_cost", "market_value", "daily_gain",
+        "daily_gain_perc", "total_shares", "total_investment" (stesso tipo di
+        indice di `stock_data`), più "symbol", "category" e la lista "purchase_dates".
+    """
     # Crea un intervallo di date dal start_date al end_date con purchase_frequency interval
-    with warnings.catch_warnings():
-        warnings.simplefilter('ignore', FutureWarning)
-        purchase_dates = (
-            pd.date_range(start_date, end_date, freq=purchase_frequency)
-            ).strftime("%Y-%m-%d")
-    # Crea un DataFrame vuoto che coprirà ogni giorno tra start_date e end_date
-    daily_investment_df = pd.DataFrame(
-        index=(pd.date_range(start=start_date, end=end_date, freq="D")).strftime(
-            "%Y-%m-%d"
-        ),
-        columns=[
-            "price",
-            "shares_bought",
-            "average_cost",
-            "total_investment",
-            "total_shares",
-            "daily_stock_price",
-            "purchase_dates",
-        ],
-    )
-    ##To suppress some Pandas Warnings
-    total_investment = 0
-    total_shares = 0
-
-    # Ciclo attraverso ogni data di acquisto
-    for date in purchase_dates:
-        purchase_amount = invested_capital / len(purchase_dates)
-        total_investment += purchase_amount
-        daily_stock_price = stock_data.loc[date, "stock_price"]
-        shares_bought = purchase_amount / daily_stock_price if daily_stock_price else 0
-        total_shares += shares_bought
-        # Imposta i valori per il giorno di acquisto
-        daily_investment_df.loc[date] = [
-            daily_stock_price,
-            shares_bought,
-            total_investment / total_shares if total_shares else 0,
-            total_investment,
-            total_shares,
-            daily_stock_price,
-            purchase_dates,
-        ]
-
-    # Riempie in avanti i giorni senza acquisti con i valori dell'ultimo acquisto noto
-    with warnings.catch_warnings():
-        warnings.simplefilter('ignore', FutureWarning)
-        daily_investment_df.ffill(inplace=True)
-
-    # Stock price between purchase_dates
-    daily_investment_df["daily_stock_price"] = stock_data["stock_price"]
-
-    # Calcola i valori di mercato giornalieri e i guadagni
-    daily_investment_df["market_value"] = (
-        daily_investment_df["daily_stock_price"] * daily_investment_df["total_shares"]
-    )
-    daily_investment_df["daily_gain"] = (
-        daily_investment_df["market_value"] - daily_investment_df["total_investment"]
-    )
-    daily_investment_df["daily_gain_perc"] = (
-        daily_investment_df["daily_gain"] / daily_investment_df["total_investment"]
-    ) * 100
+    purchase_dates = dca_purchase_dates(start_date, end_date, purchase_frequency)
+    daily_dates = pd.date_range(start=start_date, end=end_date, freq="D")
+
+    string_index = not isinstance(stock_data.index, pd.DatetimeIndex)
+    index = daily_dates.strftime("%Y-%m-%d") if string_index else daily_dates
+    prices = stock_data["stock_price"].reindex(index).to_numpy(dtype=float)
+
+    purchase_mask = np.zeros(len(daily_dates), dtype=bool)
+    purchase_mask[purchase_positions(daily_dates, purchase_dates)] = True
+    purchase_amount = invested_capital / len(purchase_dates) if len(purchase_dates) else 0.0
 
-    # Riempe in NAN
-    with warnings.catch_warnings():
-        warnings.simplefilter('ignore', FutureWarning)
-        daily_investment_df.ffill(inplace=True)
+    dca = simulate_dca(prices, purchase_mask, purchase_amount)
 
     final_data = {
         "symbol": stock_data["symbol"],
         "category": stock_data["category"],
-        "average_cost": daily_investment_df["average_cost"],
-        "market_value": daily_investment_df["market_value"],
-        "daily_gain": daily_investment_df["daily_gain"],
-        "daily_gain_perc": daily_investment_df["daily_gain_perc"],
-        "total_shares": daily_investment_df["total_shares"],
-        "total_investment": daily_investment_df["total_investment"],
-        "purchase_dates": daily_investment_df["purchase_dates"].to_list(),
+        "average_cost": pd.Series(dca["average_cost"], index=index),
+        "market_value": pd.Series(dca["market_value"], index=index),
+        "daily_gain": pd.Series(dca["daily_gain"], index=index),
+        "daily_gain_perc": pd.Series(dca["daily_gain_perc"], index=index),
+        "total_shares": pd.Series(dca["total_shares"], index=index),
+        "total_investment": pd.Series(dca["total_investment"], index=index),
+        "purchase_dates": purchase_dates.strftime("%Y-%m-%d").to_list(),
     }
 
     return final_data
@@ -262,7 +589,7 @@ def get_best_investment_strategy(results):
     for freq, result in results.items():
         average_cost = result["average_cost"].iloc[-1]
         number_shares = result["total_shares"].iloc[-1]
-        last_date_purchase = result["purchase_dates"][-1]  ##It is a list
+        last_date_purchase = result["purchase_dates"][-1] if result["purchase_dates"] else None
         final_return_value = result["daily_gain"].iloc[-1]
         market_value = result["market_value"].iloc[-1]
 
@@ -279,6 +606,128 @@ def get_best_investment_strategy(results):
     print(f"The final market value at is : {best_market_value} USD")
     return (best_strategy, best_average_cost, best_number_shares, best_market_value)
 
+##Which day of the week shows the weekly minimum / maximum price --> Suitable for a whole portfolio
+WEEKDAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def _weekly_price_blocks(price_series):
+    """
+    Lay the daily prices of several symbols on a common Monday-to-Sunday calendar.
+
+    Returns
+    -------
+    (list of str, pd.DatetimeIndex, np.ndarray)
+        The symbols, the Monday of each week and the prices reshaped to
+        (n_symbols, n_weeks, 7), NaN where no price is available.
+    """
+    if isinstance(price_series, pd.DataFrame):
+        price_series = {symbol: frame for symbol, frame in price_series.groupby("symbol", observed=True, sort=False)}
+    series = {}
+    for symbol, values in price_series.items():
+        if isinstance(values, pd.DataFrame):
+            values = values["stock_price"]
+        if not isinstance(values.index, pd.DatetimeIndex):
+            values = values.set_axis(pd.to_datetime(values.index))
+        series[symbol] = values.astype(float)
+
+    first_day = min(s.index.min() for s in series.values()).normalize()
+    last_day = max(s.index.max() for s in series.values()).normalize()
+    # Il calendario parte da un lunedì e finisce di domenica: ogni riga della matrice è una settimana
+    first_monday = first_day - pd.Timedelta(days=first_day.weekday())
+    last_sunday = last_day + pd.Timedelta(days=6 - last_day.weekday())
+    calendar = pd.date_range(first_monday, last_sunday, freq="D")
+
+    prices = np.stack([s.reindex(calendar).to_numpy() for s in series.values()])
+    return list(series), calendar[::7], prices.reshape(len(series), -1, 7)
+
+
+def get_weekday_extremum_distribution(price_series, n_bootstrap=1000, confidence=0.95, seed=None):
+    """
+    Frequenza con cui ogni giorno della settimana registra il prezzo minimo
+    e massimo della settimana, per più titoli insieme.
+
+    I prezzi sono disposti in una matrice (titoli, settimane, 7) e il giorno
+    dell'estremo è l'argmin/argmax di ogni riga (a parità di prezzo vince il
+    primo giorno, come `idxmin`). Gli intervalli di confidenza sono ottenuti per
+    bootstrap sulle settimane, campionando dalla multinomiale dei conteggi osservati.
+
+    Parameters
+    ----------
+    price_series : dict or pd.DataFrame
+        symbol -> prezzi giornalieri (pd.Series, o DataFrame con la colonna
+        "stock_price") indicizzati per data, oppure un unico DataFrame con la
+        colonna "symbol" (es. da `concat_price_frames`)
+    n_bootstrap : int, optional
+        Numero di campioni bootstrap, default 1000 (0 = nessun intervallo)
+    confidence : float, optional
+        Livello degli intervalli di confidenza, default 0.95
+    seed : int, optional
+        Seme del generatore casuale
+
+    Returns
+    -------
+    pd.DataFrame
+        Una riga per (symbol, extremum, weekday): "weekday_code" (0 = lunedì),
+        "count" (settimane in cui il giorno è l'estremo), "n_weeks", "frequency"
+        e gli estremi "ci_low"/"ci_high" dell'intervallo sulla frequenza.
+    """
+    symbols, weeks, prices = _weekly_price_blocks(price_series)
+    valid_weeks = ~np.all(np.isnan(prices), axis=2)
+    n_weeks = valid_weeks.sum(axis=1)
+    rng = np.random.default_rng(seed)
+    alpha = (1 - confidence) / 2
+
+    rows = []
+    for extremum, fill, arg in (("min", np.inf, np.argmin), ("max", -np.inf, np.argmax)):
+        codes = arg(np.where(np.isnan(prices), fill, prices), axis=2)
+        # Conteggio per (titolo, giorno) delle sole settimane con almeno un prezzo
+        counts = np.stack([np.bincount(c[v], minlength=7) for c, v in zip(codes, valid_weeks)])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            frequency = counts / n_weeks[:, None]
+        if n_bootstrap:
+            ## Ricampionare le settimane equivale a estrarre dalla multinomiale (n_weeks, frequency)
+            draws = rng.multinomial(n_weeks, np.nan_to_num(frequency), size=(n_bootstrap, len(symbols)))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                boot_frequency = draws / n_weeks[:, None]
+            ci_low, ci_high = np.quantile(boot_frequency, [alpha, 1 - alpha], axis=0)
+        else:
+            ci_low = ci_high = np.full(counts.shape, np.nan)
+        rows.append(pd.DataFrame({
+            "symbol": np.repeat(symbols, 7),
+            "extremum": extremum,
+            "weekday_code": np.tile(np.arange(7), len(symbols)),
+            "count": counts.ravel(),
+            "n_weeks": np.repeat(n_weeks, 7),
+            "frequency": frequency.ravel(),
+            "ci_low": ci_low.ravel(),
+            "ci_high": ci_high.ravel(),
+        }))
+
+    distribution = pd.concat(rows, ignore_index=True)
+    distribution.insert(3, "weekday", pd.Categorical.from_codes(distribution["weekday_code"], categories=WEEKDAY_NAMES, ordered=True))
+    return distribution.astype({"symbol": "category", "extremum": "category"})
+
+
+def get_best_weekday(distribution, extremum="min"):
+    """
+    Giorno della settimana che registra più spesso l'estremo indicato, per ogni titolo.
+
+    Parameters
+    ----------
+    distribution : pd.DataFrame
+        Tabella restituita da `get_weekday_extremum_distribution`
+    extremum : str, optional
+        "min" (miglior giorno per comprare, default) o "max"
+
+    Returns
+    -------
+    pd.DataFrame
+        Una riga per titolo con weekday, count, frequency e intervallo di confidenza.
+    """
+    selected = distribution[distribution["extremum"] == extremum]
+    ranked = selected.sort_values(["count", "weekday_code"], ascending=[False, True], kind="stable")
+    return ranked.groupby("symbol", observed=True, sort=False).head(1).set_index("symbol")
+
 ##To be used in order to plot the stock behavior along two dates that you choose
 def plot_stock_data(ticker, stock_data, start_date, end_date):   
     """
@@ -296,7 +745,7 @@ def plot_stock_data(ticker, stock_data, start_date, end_date):
     try:
         ## hist_data = stock_data.history(start=start_date, end=end_date)
         fig = go.Figure(
-            data=[go.Scatter(x=stock_data.index, y=stock_data["stock_price"])]
+            data=[line_trace(stock_data.index, stock_data["stock_price"], name=ticker)]
         )
         fig.update_layout(
             title=f"stock <b>{ticker}</b> Price History",
@@ -325,14 +774,7 @@ def create_plot(x, y, name_trace, name_graph, xaxis_title, yaxis_title):
     """
     fig = go.Figure()
     for x_list, y_list, name in zip(x, y, name_trace):
-        fig.add_trace(
-            go.Scatter(
-                x=x_list,
-                y=y_list,
-                mode="lines+markers+text",
-                name=name,
-            )
-        )
+        fig.add_trace(line_trace(x_list, y_list, name=name, mode="lines+markers+text"))
     fig.update_layout(
         title=name_graph,
         xaxis_title=xaxis_title,
@@ -382,24 +824,18 @@ def create_interactive_plot(stock_data_df_or_dict,results,field,exception_field_
             if field == exception_field_string:
                 y_data = exception_field_array[freq]
                 x_data = exception_field_array[freq].index
-                traces.append(go.Scatter(
-                        x=x_data, y=y_data, mode='lines', name=f"{freq} {field}"
-                    ))
+                traces.append(line_trace(x_data, y_data, name=f"{freq} {field}"))
             else:
                 for symbol, stock_df in stock_data_df_or_dict.items():
                     if freq in results and symbol in results[freq]:
                         # Aggiungi il dato di questa stock alla lista 'y'
                         y_data = results[freq][symbol][field] 
                         x_data = results[freq][symbol][field].index
-                        traces.append(go.Scatter(
-                            x=x_data, y=y_data, mode='lines', name=f"{symbol} {freq} {field}"
-                        ))
+                        traces.append(line_trace(x_data, y_data, name=f"{symbol} {freq} {field}"))
         else:
             # Aggiungi il dato di questa stock alla lista 'y'
                 y_data = results[freq][field]
-                traces.append(go.Scatter(
-                x=results[freq][field].index, y=y_data, mode='lines', name=f"{freq} {field}"
-                ))
+                traces.append(line_trace(results[freq][field].index, y_data, name=f"{freq} {field}"))
             # Aggiorna o configura il grafico con le trace attuali
         for trace in traces:
             global_fig.add_trace(trace)
@@ -411,6 +847,101 @@ def create_interactive_plot(stock_data_df_or_dict,results,field,exception_field_
             )
         global_fig.show()
 
+class InteractivePlotController:
+    """
+    Interactive DCA chart built once as a `go.FigureWidget`.
+
+    Unlike `create_interactive_plot`, which rebuilds a new figure on every
+    widget interaction, the controller adds the trace of a (symbol, frequency,
+    field) series the first time it is requested and afterwards only toggles
+    trace visibility, inside one batched update. Zooming re-samples the
+    visible traces from their full-resolution data.
+
+    Parameters
+    ----------
+    stock_data_df_or_dict : dict or pandas.DataFrame
+        A dictionary or DataFrame containing stock data.
+    results : dict
+        A dictionary containing stock data results.
+    exception_field_string : str
+        The string for the exception field.
+    exception_field_array : dict
+        A dictionary containing exception field data.
+    max_points : int, optional
+        Points drawn per trace, default MAX_POINTS_PER_TRACE.
+
+    Example
+    -------
+    controller = InteractivePlotController(stock_data_dca_values, results, "global_market_values", global_market_values)
+    display(VBox([interactive(controller.update, field=field_selector, freq=freq_selector), controller.widget]))
+    """
+
+    def __init__(self, stock_data_df_or_dict, results, exception_field_string, exception_field_array, max_points=MAX_POINTS_PER_TRACE):
+        self.stock_data_df_or_dict = stock_data_df_or_dict
+        self.results = results
+        self.exception_field_string = exception_field_string
+        self.exception_field_array = exception_field_array
+        self.max_points = max_points
+        self.widget = go.FigureWidget(layout={"xaxis": {"title": "Date"}, "hovermode": "closest"})
+        self._trace_position = {}
+        ## Posizione della traccia -> dati completi / intervallo su cui è stata campionata
+        self._full_data = {}
+        self._sampled_range = {}
+        self._x_range = None
+        enable_zoom_resampling(self.widget, self._full_data, max_points, on_resample=self._on_resampled)
+
+    def _series(self, field, freq):
+        """(trace name, series) pairs to show: same selection as `create_interactive_plot`."""
+        if isinstance(self.stock_data_df_or_dict, dict):
+            if field == self.exception_field_string:
+                return [(f"{freq} {field}", self.exception_field_array[freq])]
+            return [
+                (f"{symbol} {freq} {field}", self.results[freq][symbol][field])
+                for symbol in self.stock_data_df_or_dict
+                if freq in self.results and symbol in self.results[freq]
+            ]
+        return [(f"{freq} {field}", self.results[freq][field])]
+
+    def update(self, field, freq):
+        """Show the traces of (field, freq), creating only the missing ones."""
+        wanted = set()
+        with self.widget.batch_update():
+            for name, series in self._series(field, freq):
+                wanted.add(name)
+                if name not in self._trace_position:
+                    full_data = (series.index, series.to_numpy(dtype=float))
+                    x, y = downsample_range(*full_data, self._x_range, self.max_points)
+                    trace_class = go.Scattergl if len(series) > WEBGL_THRESHOLD else go.Scatter
+                    self.widget.add_trace(trace_class(x=x, y=y, mode="lines", name=name))
+                    position = self._trace_position[name] = len(self.widget.data) - 1
+                    self._full_data[position] = full_data
+                    self._sampled_range[position] = self._x_range
+            for name, position in self._trace_position.items():
+                self.widget.data[position].visible = name in wanted
+            # Tracce rimaste nascoste durante uno zoom: ricampionate sull'intervallo attuale
+            stale = {
+                position: self._full_data[position]
+                for name, position in self._trace_position.items()
+                if name in wanted and self._sampled_range.get(position) != self._x_range
+            }
+            if stale:
+                self._on_resampled(self._x_range, resample_traces(self.widget, stale, self._x_range, self.max_points))
+            self.widget.layout.title = f"{field.title()} over Time ({freq})"
+            self.widget.layout.yaxis.title = field.title()
+
+    def reset(self):
+        """Drop every trace (e.g. after `results` has been recomputed)."""
+        self.widget.data = []
+        self._trace_position.clear()
+        self._full_data.clear()
+        self._sampled_range.clear()
+
+    def _on_resampled(self, x_range, positions):
+        """Remember the x range on which the traces at `positions` are now sampled."""
+        self._x_range = x_range
+        for position in positions:
+            self._sampled_range[position] = x_range
+
 # Visualizzazione della tabella
 def show_table(df):
     # Crea una lista di liste, una per ogni colonna del DataFrame